@@ -0,0 +1,96 @@
+# Agendador único para os cinco produtos do site
+#
+# Em vez de um interpretador novo a cada disparo do cron, um só processo roda
+# todos os scripts nos seus horários. As bibliotecas pesadas são importadas uma
+# vez e os módulos compartilhados continuam vivos entre as execuções: a sessão
+# HTTP do api_clima, o cache de respostas e a figura do painel de 24 h.
+# Uma falha em um produto é registrada e não afeta os demais.
+#
+# Uso: python agendador.py                 (roda continuamente)
+#      python agendador.py --uma-vez       (roda cada produto uma vez e sai)
+#      python agendador.py --produtos graph radar
+import argparse
+import asyncio
+import os
+import runpy
+import time
+import traceback
+from datetime import datetime, timedelta
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import pandas  # Importado na partida para que nenhum produto pague esse custo
+import pytz
+
+brasilia_tz = pytz.timezone("America/Sao_Paulo")
+
+# Produtos e agendas (horário de Brasília), equivalentes aos workflows:
+# 'intervalo' e 'deslocamento' em minutos a partir da meia-noite, ou 'horarios' fixos
+PRODUTOS = {
+    'graph': {'script': 'atualizaCSV.py', 'intervalo': 15, 'deslocamento': 8},
+    'radar': {'script': 'update_radar.py', 'intervalo': 15, 'deslocamento': 8},
+    'mapa': {'script': 'mapa_estacoes.py', 'intervalo': 60, 'deslocamento': 0},
+    'previsao': {'script': 'previsaoTempo.py', 'horarios': ['03:00', '19:00']},
+    'extremos': {'script': 'extremes.py', 'horarios': ['01:00']},
+}
+
+# Bibliotecas opcionais, usadas só por alguns produtos, carregadas na partida
+for modulo in ['geopandas', 'contextily', 'cartopy.crs', 'cartopy.feature']:
+    try:
+        __import__(modulo)
+    except ImportError:
+        pass
+
+# Próximo horário de execução de um produto depois de agora
+def proxima_execucao(produto, agora):
+    if 'horarios' in produto:
+        minutos = sorted(int(h[:2]) * 60 + int(h[3:]) for h in produto['horarios'])
+    else:
+        minutos = range(produto['deslocamento'], 24 * 60, produto['intervalo'])
+    hoje = agora.replace(tzinfo=None, hour=0, minute=0, second=0, microsecond=0)
+    candidatos = (hoje + timedelta(days=dias, minutes=m) for dias in (0, 1) for m in minutos)
+    return next(c for c in map(brasilia_tz.localize, candidatos) if c > agora)
+
+# Roda um script no próprio processo, como se fosse "python script"
+def executar(nome):
+    script = PRODUTOS[nome]['script']
+    inicio = time.perf_counter()
+    try:
+        runpy.run_path(script, run_name='__main__')
+        situacao = 'ok'
+    except SystemExit as e:
+        situacao = 'ok' if e.code in (None, 0) else f'saída {e.code}'
+    except Exception:
+        traceback.print_exc()
+        situacao = 'erro'
+    finally:
+        plt.close('all')  # Figuras que o script deixou abertas após uma falha
+    print(f"[{datetime.now(brasilia_tz):%d/%m %H:%M:%S}] {nome}: {situacao} em {time.perf_counter() - inicio:.1f} s", flush=True)
+    return situacao
+
+# Laço de um produto. O pyplot não é seguro entre threads, então as execuções
+# compartilham uma trava e nunca se sobrepõem.
+async def ciclo(nome, trava):
+    while True:
+        agora = datetime.now(brasilia_tz)
+        proxima = proxima_execucao(PRODUTOS[nome], agora)
+        await asyncio.sleep((proxima - agora).total_seconds())
+        async with trava:
+            await asyncio.to_thread(executar, nome)
+
+async def principal(nomes, uma_vez):
+    trava = asyncio.Lock()
+    if uma_vez:
+        for nome in nomes:
+            async with trava:
+                await asyncio.to_thread(executar, nome)
+        return
+    await asyncio.gather(*(ciclo(nome, trava) for nome in nomes))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Roda os produtos do site nos seus horários em um único processo.")
+    parser.add_argument('--produtos', nargs='+', choices=list(PRODUTOS), default=list(PRODUTOS))
+    parser.add_argument('--uma-vez', action='store_true', help="roda cada produto uma vez e sai")
+    args = parser.parse_args()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))  # Os scripts usam caminhos relativos
+    asyncio.run(principal(args.produtos, args.uma_vez))
@@ -0,0 +1,163 @@
+# Cliente HTTP compartilhado para as APIs usadas pelos scripts
+# (Weather.com / Weather Underground, Open-Meteo e RainViewer)
+import os
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from cache_http import CacheHTTP, chave_requisicao
+
+WU_API_BASE = os.getenv('WU_API_BASE', "https://api.weather.com")  # Outra base (API falsa local) nos testes
+OPEN_METEO_AR = "https://air-quality-api.open-meteo.com/v1/air-quality"
+RAINVIEWER_MAPAS = "https://api.rainviewer.com/public/weather-maps.json"
+RAINVIEWER_TILES = "https://tilecache.rainviewer.com"
+RAINVIEWER_CORES = "https://www.rainviewer.com/files/rainviewer_api_colors_table.csv"
+
+TIMEOUT = (5, 15)  # Timeout de conexão e de leitura (s) de cada tentativa
+TENTATIVAS = 3  # Novas tentativas após a primeira falha
+MAX_CONEXOES = int(os.getenv('MAX_CONEXOES', 8))  # Conexões keep-alive por host
+
+# Observações atuais não usam o cache (TTL 0), a não ser que WU_TTL_OBSERVACOES
+# diga o contrário: o servico_render.py as baixa antes de abrir os processos de
+# desenho, que então as leem do cache em disco em vez de repetir a requisição.
+TTL_OBSERVACOES = int(os.getenv('WU_TTL_OBSERVACOES', 0))
+
+# Tempo de validade (s) das respostas no cache, pelo prefixo da URL.
+# Endpoints fora da lista nunca usam o cache.
+TTL_ENDPOINTS = [
+    (f"{WU_API_BASE}/v2/pws/observations/current", TTL_OBSERVACOES),
+    (f"{WU_API_BASE}/v3/wx/forecast", 30 * 60),
+    (OPEN_METEO_AR, 60 * 60),
+    (RAINVIEWER_MAPAS, 5 * 60),
+    (RAINVIEWER_TILES, 7 * 24 * 3600),  # A imagem de cada quadro (path) não muda
+    (RAINVIEWER_CORES, 30 * 24 * 3600),
+]
+
+_sessao = None
+_cache = None
+
+# Cria uma sessão com pool de conexões, gzip e novas tentativas limitadas.
+# O backoff exponencial com jitter evita que execuções simultâneas repitam
+# as requisições no mesmo instante. O pior caso de cada chamada fica limitado
+# a (TENTATIVAS + 1) * (timeout de conexão + timeout de leitura) mais o backoff.
+def criar_sessao(max_conexoes=MAX_CONEXOES):
+    retry = Retry(
+        total=TENTATIVAS,
+        backoff_factor=0.5,
+        backoff_jitter=0.5,
+        backoff_max=10,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({'GET', 'HEAD'}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_conexoes, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({'Accept-Encoding': 'gzip, deflate', 'User-Agent': 'meteo-curitiba'})
+    return session
+
+# Sessão única do processo, criada na primeira chamada
+def sessao():
+    global _sessao
+    if _sessao is None:
+        _sessao = criar_sessao()
+    return _sessao
+
+# Cache de respostas do processo. Nos testes, usar_cache aponta para um diretório local.
+def cache():
+    global _cache
+    if _cache is None:
+        _cache = CacheHTTP()
+    return _cache
+
+def usar_cache(diretorio, **kwargs):
+    global _cache
+    _cache = CacheHTTP(diretorio, **kwargs)
+    return _cache
+
+def ttl_para(url):
+    for prefixo, ttl in TTL_ENDPOINTS:
+        if url.startswith(prefixo):
+            return ttl
+    return 0
+
+# Monta uma resposta a partir do conteúdo guardado no cache
+def _resposta_do_cache(url, entrada, conteudo):
+    response = requests.Response()
+    response.status_code = 200
+    response.url = url
+    response._content = conteudo
+    response.headers['Content-Type'] = entrada.get('tipo') or ''
+    return response
+
+# GET com timeout obrigatório; devolve a resposta sem verificar o status.
+# Dentro do TTL a resposta vem do cache sem acessar a rede. Depois dele, a
+# requisição é condicional (ETag / Last-Modified) e um 304 reaproveita o cache.
+def get(url, params=None, timeout=TIMEOUT, ttl=None):
+    ttl = ttl_para(url) if ttl is None else ttl
+    if ttl <= 0:
+        return sessao().get(url, params=params, timeout=timeout)
+
+    chave = chave_requisicao(url, params)
+    entrada = cache().buscar(chave)
+    if entrada is not None and CacheHTTP.fresca(entrada, ttl):
+        return _resposta_do_cache(url, entrada, cache().ler(chave, entrada))
+
+    headers = {}
+    if entrada is not None and entrada.get('etag'):
+        headers['If-None-Match'] = entrada['etag']
+    if entrada is not None and entrada.get('last_modified'):
+        headers['If-Modified-Since'] = entrada['last_modified']
+    response = sessao().get(url, params=params, timeout=timeout, headers=headers)
+    if response.status_code == 304 and entrada is not None:
+        cache().renovar(chave)
+        return _resposta_do_cache(url, entrada, cache().ler(chave, entrada))
+    if response.status_code == 200:
+        cache().salvar(chave, response.content, response.headers)
+    return response
+
+# GET que exige sucesso e devolve o JSON ({} quando a API responde 204 sem conteúdo,
+# como o WU faz para estações offline)
+def get_json(url, params=None, timeout=TIMEOUT):
+    response = get(url, params, timeout)
+    response.raise_for_status()
+    if response.status_code == 204:
+        return {}
+    return response.json()
+
+# Requisição à API do Weather.com com os parâmetros comuns a todos os scripts
+def wu(endpoint, **params):
+    params = {'format': 'json', 'units': 'm', **params, 'apiKey': os.getenv('API_KEY')} # JAMAIS COMPARTILHAR ESSA API KEY
+    return get_json(f"{WU_API_BASE}/{endpoint}", params)
+
+# Observação atual de uma estação (PWS)
+def observacao_atual(station_id):
+    return wu('v2/pws/observations/current', stationId=station_id, numericPrecision='decimal')
+
+# Resumo diário de uma estação; data no formato YYYYMMDD
+def historico_diario(station_id, data):
+    return wu('v2/pws/history/daily', stationId=station_id, numericPrecision='decimal', date=data)
+
+# Todas as observações (~5 min) de uma estação num dia; data no formato YYYYMMDD
+def historico_completo(station_id, data):
+    return wu('v2/pws/history/all', stationId=station_id, numericPrecision='decimal', date=data)
+
+# Previsão de 5 dias para um ponto
+def previsao_5dias(latitude, longitude, idioma='pt'):
+    return wu('v3/wx/forecast/daily/5day', geocode=f"{latitude},{longitude}", language=idioma)
+
+# Série horária de qualidade do ar do Open-Meteo, no horário de Brasília
+def qualidade_ar(latitude, longitude, variaveis='pm2_5'):
+    return get_json(OPEN_METEO_AR, {'latitude': latitude, 'longitude': longitude,
+                                    'hourly': variaveis, 'timezone': 'America/Sao_Paulo'})
+
+# Índice de quadros de radar disponíveis no RainViewer
+def mapas_rainviewer():
+    return get_json(RAINVIEWER_MAPAS)
+
+# Tabela de cores (dBZ → cor de cada esquema) do RainViewer, em CSV
+def tabela_cores_rainviewer():
+    response = get(RAINVIEWER_CORES)
+    response.raise_for_status()
+    return response.text
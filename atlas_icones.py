@@ -0,0 +1,74 @@
+# Atlas dos ícones da previsão (iconesPrevisao)
+#
+# Cada gráfico de previsão abria e redimensionava os ícones dos dias a partir dos
+# PNGs. Aqui todos os ícones são decodificados e redimensionados uma única vez e
+# empacotados num só array RGBA (ícone, linha, coluna, canal), com o tamanho de
+# cada um e um índice pelo código do ícone do WU. O atlas é salvo em CACHE_DIR como
+# um único .npz sem compressão (uma leitura de arquivo) e reconstruído sozinho
+# quando algum PNG ou a escala mudam.
+import hashlib
+import os
+import numpy as np
+from PIL import Image
+
+CACHE_DIR = os.getenv('ATLAS_ICONES_DIR', os.path.join('.cache', 'atlas_icones'))
+DIRETORIO = 'iconesPrevisao'
+ESCALA = 0.5  # Tamanho dos ícones no gráfico, em relação aos PNGs
+ICONE_PADRAO = 44  # Usado para códigos sem ícone
+
+class AtlasIcones:
+    def __init__(self, codigos, tamanhos, icones):
+        self.codigos = codigos
+        self.tamanhos = tamanhos
+        self.icones = icones
+        self.indice = {int(c): i for i, c in enumerate(codigos)}
+
+    # Lê e redimensiona os PNGs e os empacota, alinhados no canto superior esquerdo
+    @classmethod
+    def construir(cls, diretorio=DIRETORIO, escala=ESCALA):
+        codigos, imagens = [], []
+        for nome in sorted(os.listdir(diretorio), key=lambda n: int(os.path.splitext(n)[0])):
+            img = Image.open(os.path.join(diretorio, nome)).convert('RGBA')
+            imagens.append(np.asarray(img.resize((int(img.width * escala), int(img.height * escala)))))
+            codigos.append(int(os.path.splitext(nome)[0]))
+        tamanhos = np.array([im.shape[:2] for im in imagens], dtype=np.int32)
+        icones = np.zeros((len(imagens), tamanhos[:, 0].max(), tamanhos[:, 1].max(), 4), dtype=np.uint8)
+        for i, im in enumerate(imagens):
+            icones[i, :im.shape[0], :im.shape[1]] = im
+        return cls(np.array(codigos, dtype=np.int32), tamanhos, icones)
+
+    def salvar(self, arquivo):
+        os.makedirs(os.path.dirname(arquivo) or '.', exist_ok=True)
+        np.savez(arquivo, codigos=self.codigos, tamanhos=self.tamanhos, icones=self.icones)
+
+    @classmethod
+    def carregar(cls, arquivo):
+        with np.load(arquivo) as dados:
+            return cls(dados['codigos'], dados['tamanhos'], dados['icones'])
+
+    # Imagem RGBA (view do atlas) do ícone de um código do WU
+    def icone(self, codigo):
+        i = self.indice.get(codigo, self.indice[ICONE_PADRAO])
+        altura, largura = self.tamanhos[i]
+        return self.icones[i, :altura, :largura]
+
+def chave_atlas(diretorio=DIRETORIO, escala=ESCALA):
+    partes = [f"{escala}"]
+    for nome in sorted(os.listdir(diretorio)):
+        estado = os.stat(os.path.join(diretorio, nome))
+        partes.append(f"{nome}|{estado.st_size}|{estado.st_mtime_ns}")
+    return hashlib.sha1('\n'.join(partes).encode()).hexdigest()[:16]
+
+_atlas = {}
+
+# Atlas do processo: da memória, do disco ou construído e salvo na primeira vez
+def obter_atlas(diretorio=DIRETORIO, escala=ESCALA):
+    chave = chave_atlas(diretorio, escala)
+    if chave not in _atlas:
+        arquivo = os.path.join(CACHE_DIR, f"{chave}.npz")
+        if os.path.exists(arquivo):
+            _atlas[chave] = AtlasIcones.carregar(arquivo)
+        else:
+            _atlas[chave] = AtlasIcones.construir(diretorio, escala)
+            _atlas[chave].salvar(arquivo)
+    return _atlas[chave]
@@ -1,28 +1,25 @@
 # Importa bibliotecas
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-import matplotlib.ticker as mticker
 import pandas as pd
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
 import requests
 import pytz
-import numpy as np
 import os
+import sys
+import api_clima
+import historico
+import painel_24h
+import renderizacao
+import series_derivadas
 
 # Fuso horário de Brasília
 brasilia_tz = pytz.timezone("America/Sao_Paulo")
 
 # Função para pegar os dados do Weather Underground
 def get_weather_data():
-    WU_API_KEY = os.getenv('API_KEY') # JAMAIS COMPARTILHAR ESSA API KEY
-    print(WU_API_KEY)
     STATION_ID = "ICURITIB28"
-    url = f"https://api.weather.com/v2/pws/observations/current?stationId={STATION_ID}&format=json&units=m&numericPrecision=decimal&apiKey={WU_API_KEY}"
     timestamp = datetime.now(timezone.utc).astimezone(brasilia_tz)  # Captura o timestamp em UTC e converte para HBR
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
+        data = api_clima.observacao_atual(STATION_ID)
         observation = data['observations'][0]
         temp = observation["metric"]["temp"]
         precip_total = observation["metric"]["precipTotal"]
@@ -35,39 +32,40 @@ def get_weather_data():
         wind_gust = observation["metric"]["windGust"]
         pressure = observation["metric"]["pressure"]
         return timestamp, temp, precip_total, humidity, dew_point, solar_rad, uv, wind_speed, wind_dir, wind_gust, pressure
-    except (requests.exceptions.RequestException, KeyError) as e:
+    except (requests.exceptions.RequestException, KeyError, IndexError) as e:
         print("Erro:", e)
         return timestamp, None, None, None, None, None, None, None, None, None, None
 
-# Caminho do arquivo CSV
+# Histórico completo da estação, em partições mensais só de acréscimo
+armazem = historico.ArmazemParticionado(os.path.join('historico', 'ICURITIB28'))
+colunas = ['Timestamp', 'Temperature', 'Precip', 'Humidity', 'Dew Point', 'Radiation', 'UV Index', 'Wind Speed', 'Wind Dir', 'Wind Gust', 'Pressure']
+
+# Caminho do arquivo CSV (visão das últimas 24 horas usada pela página)
 csv_file = 'weather_data.csv'
 
-# Verificar se o arquivo existe
-if os.path.exists(csv_file):
-    # Ler os dados existentes
-    df = pd.read_csv(csv_file, parse_dates=['Timestamp'])
-    # Filtrar para manter apenas os dados das últimas 24 horas
-    now = datetime.now(brasilia_tz)
-    df = df[df['Timestamp'] >= now - pd.Timedelta(hours=24)]
-else:
-    # Criar um DataFrame vazio
-    df = pd.DataFrame(columns=['Timestamp', 'Temperature', 'Precip', 'Humidity', 'Dew Point', 'Radiation', 'UV Index', 'Wind Speed', 'Wind Dir', 'Wind Gust', 'Pressure'])
+# Na primeira execução o histórico começa com o conteúdo do CSV existente
+if armazem.vazio() and os.path.exists(csv_file):
+    armazem.anexar(pd.read_csv(csv_file))
+
+# Ler apenas as últimas 24 horas do histórico
+now = datetime.now(brasilia_tz)
+df = armazem.ler(now - pd.Timedelta(hours=24)).reindex(columns=colunas)
 
 # Obter os dados atuais
 timestamp, temp, precip_total, humidity, dew_point, solar_rad, uv_index, wind_speed, wind_dir, wind_gust, pressure = get_weather_data()
 # Remover fração de segundos do timestamp
 timestamp = timestamp.replace(microsecond=0)
 
-# Limites do eixo x: de timestamp - 25h até timestamp + 1h
-start_time = timestamp - timedelta(hours=25)
-end_time = timestamp + timedelta(hours=1)
+# Valores atuais, que junto com a série formam as entradas do gráfico
+atuais = [temp, precip_total, humidity, dew_point, solar_rad, uv_index, wind_speed, wind_dir, wind_gust, pressure]
 
 if temp is not None:
-    # Verificar se o timestamp já existe no DataFrame
-    if timestamp not in df['Timestamp'].values:
+    # Verificar se o timestamp é mais recente que o último do histórico
+    ultimo = armazem.ultimo_tempo()
+    if ultimo is None or timestamp > ultimo:
         # Criar um DataFrame com o novo dado
         new_data = pd.DataFrame({
-            'Timestamp': [timestamp],
+            'Timestamp': [pd.Timestamp(timestamp).tz_convert(historico.FUSO)],
             'Temperature': [temp],
             'Precip': [precip_total],
             'Humidity': [humidity],
@@ -80,255 +78,40 @@ if temp is not None:
             'Pressure': [pressure]
         })
     
+        # Acrescentar ao histórico (só a nova linha é escrita)
+        armazem.anexar(new_data)
+
         # Concatenar com o DataFrame existente
-        df = pd.concat([df, new_data])
+        df = pd.concat([df, new_data], ignore_index=True)
     
         # Filtrar para manter apenas os dados das últimas 24 horas
         now = datetime.now(brasilia_tz)
         df = df[df['Timestamp'] >= now - pd.Timedelta(hours=24)]
         
-        # Salvar no arquivo CSV
-        df.to_csv(csv_file, index=False, date_format='%Y-%m-%d %H:%M:%S%z')
+        # Regenerar a visão de 24 h no arquivo CSV
+        df.to_csv(csv_file, index=False, date_format=historico.FORMATO_DATA)
         estadoEstacao = 'Online'
     else:
         print("Dados já existentes para o timestamp:", timestamp)
         #Estacao On/Off
         estadoEstacao = 'Offline'
-    
-    # Configurar subplots
-    fig, axs = plt.subplots(5, 1, figsize=(10, 12), sharex=True)
-    fig.suptitle("Tempo nas últimas 24 horas", fontsize=18)
-    
-    # Definir o colormap baseado na temperatura
-    c1 = plt.cm.Purples(np.linspace(0, 1, 50))
-    c2 = plt.cm.turbo(np.linspace(0, 1, 176))
-    c3 = plt.get_cmap('PuRd_r')(np.linspace(0, 1, 50))
-    col = np.vstack((c1, c2, c3))
-    cmap = plt.cm.colors.ListedColormap(col)
-    cmap_hum = plt.cm.colors.ListedColormap(plt.cm.coolwarm(np.linspace(1, 0, 100)))
-    cmap_rad = plt.cm.colors.ListedColormap(plt.cm.Blues(np.linspace(0, 1, 50)))
-    temp_norm = (temp + 10) / 55  # Normaliza a temperatura dos limites [-10, 45]ºC para o intervalo [0, 1]
-    temp_norm = np.clip(temp_norm, 0, 1)  # Garante que o valor esteja entre 0 e 1
-    state_color = 'red' if estadoEstacao == "Offline" else 'green'
-    temp_color = cmap(temp_norm)
-    hum_color = cmap_hum(humidity / 100)
-    precip_color = cmap_rad(precip_total/50)
-    
-    hora_atual = f"{timestamp.hour:02d}"
-    minuto_atual = f"{timestamp.minute:02d}"
-    dia_atual = f"{timestamp.day:02d}"
-    mes_atual = f"{timestamp.month:02d}"
-    ano_atual = f"{timestamp.year}"
-    fig.text(0.5, 1.00, estadoEstacao, color=state_color, fontsize=16, ha='center')
-    # Exibir a temperatura, umidade, P.O. e pressão acima dos plots
-    plt.figtext(0.5, 1.15, f"Condições meteorológicas atuais em Curitiba (Parque Barigui) - Atualizado {dia_atual}/{mes_atual}/{ano_atual} às {hora_atual}:{minuto_atual}", fontsize=16, ha='center')
-    
-    quadrado = plt.Rectangle((0.15, 1.06), 0.22, 0.07, transform=fig.transFigure, color=temp_color, lw=0)
-    fig.patches.append(quadrado)
-    # Definir a cor do texto com base na temperatura
-    text_color = 'white' if (temp >= 32 or temp < 8) else 'black'
-    # Usar o texto com a cor definida
-    plt.figtext(0.26, 1.075, f"Temperatura:\n {temp:.1f} °C", fontsize=18, ha='center', color=text_color)
-    plt.figtext(0.26, 1.03, f"Ponto de orvalho: {dew_point:.1f} °C", fontsize=11, ha='center', color='black')
-    
-    quadrado = plt.Rectangle((0.39, 1.06), 0.22, 0.07, transform=fig.transFigure, color=hum_color, lw=0)
-    fig.patches.append(quadrado)
-    text_color = 'white' if (humidity >= 90) else 'black'
-    plt.figtext(0.50, 1.075, f"Umidade:\n {humidity:.0f} %", fontsize=18, ha='center', color=text_color)
-    plt.figtext(0.50, 1.03, f"Radiação solar: {solar_rad:.0f} W/m²", fontsize=11, ha='center', color='black')
-    
-    quadrado = plt.Rectangle((0.63, 1.06), 0.22, 0.07, transform=fig.transFigure, color=precip_color, lw=0)
-    fig.patches.append(quadrado)
-    text_color = 'white' if (precip_total >= 30) else 'black'
-    plt.figtext(0.74, 1.075, f"Chuva acum.:\n {precip_total:.1f} mm", fontsize=18, ha='center', color=text_color)
-    plt.figtext(0.74, 1.03, f"Índice UV: {uv_index:.0f}", fontsize=11, ha='center', color='black')
-    
-    #plt.subplots_adjust(right=0.5)
-    
-    # Temperatura
-    axs[0].plot(df['Timestamp'], df['Temperature'], label="Temperatura", color='red', marker='o')
-    axs[0].plot(df['Timestamp'], df['Dew Point'], label="Ponto de orvalho", color="green", linestyle="--", marker='o',markersize=3)
-    axs[0].set_ylabel("Temperatura (°C)",fontsize=14)
-    axs[0].yaxis.set_major_formatter(mticker.FuncFormatter(lambda x, _: f"{x:.1f}"))
-    axs[0].legend(loc="best")
-    axs[0].grid(True)
-    for label in axs[0].get_yticklabels(): #Tamanho dos rótulos
-        label.set_fontsize(14)
-    
-    # Chuva
-    #axs[1].plot(df['Timestamp'], df['Precip'], color='indigo', label='Precipitação acumulada', marker='o')
-    precip_diff = df['Precip'].diff().fillna(0)
-    axs[1].bar(df['Timestamp'], precip_diff, color='skyblue', label='Taxa de precipitação', width=0.02)
-    axs[1].set_ylabel("Precipitação (mm)",fontsize=14)
-    axs[1].yaxis.set_major_formatter(mticker.FuncFormatter(lambda x, _: f"{x:.1f}"))
-    #axs[1].legend(loc="best")
-    axs[1].grid(True)
-    for label in axs[1].get_yticklabels(): #Tamanho dos rótulos
-        label.set_fontsize(14)
-    
-    # Umidade
-    axs[2].plot(df['Timestamp'], df['Humidity'], color='blue', marker='o')
-    axs[2].set_ylabel("Umidade relativa (%)",fontsize=14)
-    axs[2].yaxis.set_major_formatter(mticker.FuncFormatter(lambda x, _: f"{x:.0f}"))
-    axs[2].grid(True)
-    for label in axs[2].get_yticklabels(): #Tamanho dos rótulos
-        label.set_fontsize(14)
-    
-    # Vento
-    axs[3].plot(df['Timestamp'], df['Wind Speed'], color='navy', label='Vento', marker='o')
-    axs[3].scatter(df['Timestamp'], df['Wind Gust'], color='orange', label='Rajadas', alpha=0.7)
-    axs[3].set_ylabel("Vento (km/h)",fontsize=14)
-    axs[3].yaxis.set_major_formatter(mticker.FuncFormatter(lambda x, _: f"{x:.1f}"))
-    axs[3].grid(True)
-    axs[3].legend(loc="best")
-    for label in axs[3].get_yticklabels(): #Tamanho dos rótulos
-        label.set_fontsize(14)
-    
-    # Radiação
-    axs[4].plot(df['Timestamp'], df['Radiation'], color='orange', marker='o')
-    axs[4].set_ylabel("Radiação solar (W/m²)",fontsize=14)
-    axs[4].yaxis.set_major_formatter(mticker.FuncFormatter(lambda x, _: f"{x:.0f}"))
-    axs[4].grid(True)
-    for label in axs[4].get_yticklabels(): #Tamanho dos rótulos
-        label.set_fontsize(14)
-    
-    # Formatação do eixo X
-    axs[4].xaxis.set_major_formatter(mdates.DateFormatter('%H:%M', tz=brasilia_tz))
-    axs[4].xaxis.set_major_locator(mdates.HourLocator(interval=2))
-    axs[4].set_xlim([start_time, end_time])
-    for label in axs[4].get_xticklabels():
-        label.set_fontsize(14)
-    plt.xlabel("Hora local",fontsize=14)
-    plt.gcf().autofmt_xdate()
-    #print(f"Número de ticks no eixo X: {len(axs[2].get_xticks())}")
-    
-    # Configurar limites para cada eixo Y em cada subplot
-    axs[0].set_ylim(df['Dew Point'].min()-2, df['Temperature'].max()+2)
-    axs[1].set_ylim(0, precip_diff.max()+5)
-    axs[2].set_ylim([0, 103])
-    axs[3].set_ylim(0, df['Wind Gust'].max()+3)
-    axs[4].set_ylim([0, 1350])
-    
-    # Salvar o gráfico em um arquivo
-    plt.tight_layout()
-    plt.savefig('graph.png', bbox_inches='tight')
-    plt.close(fig)
 
 else:
     print("Dados não foram obtidos.")
     estadoEstacao = 'Offline'
 
-    # Configurar subplots
-    fig, axs = plt.subplots(5, 1, figsize=(10, 12), sharex=True)
-    fig.suptitle("Tempo nas últimas 24 horas", fontsize=18)
-    
-    # Definir o colormap baseado na temperatura
-    c1 = plt.cm.Purples(np.linspace(0, 1, 50))
-    c2 = plt.cm.turbo(np.linspace(0, 1, 176))
-    c3 = plt.get_cmap('PuRd_r')(np.linspace(0, 1, 50))
-    col = np.vstack((c1, c2, c3))
-    cmap = plt.cm.colors.ListedColormap(col)
-    cmap_hum = plt.cm.colors.ListedColormap(plt.cm.coolwarm(np.linspace(1, 0, 100)))
-    cmap_rad = plt.cm.colors.ListedColormap(plt.cm.Blues(np.linspace(0, 1, 50)))
-    state_color = 'red' if estadoEstacao == "Offline" else 'green'
-    temp_color = cmap_hum(0.5)
-    hum_color = cmap_hum(0.5)
-    precip_color = cmap_hum(0.5)
-    
-    hora_atual = f"{timestamp.hour:02d}"
-    minuto_atual = f"{timestamp.minute:02d}"
-    dia_atual = f"{timestamp.day:02d}"
-    mes_atual = f"{timestamp.month:02d}"
-    ano_atual = f"{timestamp.year}"
-    fig.text(0.5, 1.00, estadoEstacao, color=state_color, fontsize=16, ha='center')
-    # Exibir a temperatura, umidade, P.O. e pressão acima dos plots
-    plt.figtext(0.5, 1.15, f"Condições meteorológicas atuais em Curitiba (Parque Barigui) - Atualizado {dia_atual}/{mes_atual}/{ano_atual} às {hora_atual}:{minuto_atual}", fontsize=16, ha='center')
-    
-    quadrado = plt.Rectangle((0.15, 1.06), 0.22, 0.07, transform=fig.transFigure, color=temp_color, lw=0)
-    fig.patches.append(quadrado)
-    # Definir a cor do texto com base na temperatura
-    text_color = 'black'
-    # Usar o texto com a cor definida
-    plt.figtext(0.26, 1.075, f"Temperatura:\n NaN °C", fontsize=18, ha='center', color=text_color)
-    plt.figtext(0.26, 1.03, f"Ponto de orvalho: NaN °C", fontsize=11, ha='center', color='black')
-    
-    quadrado = plt.Rectangle((0.39, 1.06), 0.22, 0.07, transform=fig.transFigure, color=hum_color, lw=0)
-    fig.patches.append(quadrado)
-    plt.figtext(0.50, 1.075, f"Umidade:\n NaN %", fontsize=18, ha='center', color=text_color)
-    plt.figtext(0.50, 1.03, f"Radiação solar: NaN W/m²", fontsize=11, ha='center', color='black')
-    
-    quadrado = plt.Rectangle((0.63, 1.06), 0.22, 0.07, transform=fig.transFigure, color=precip_color, lw=0)
-    fig.patches.append(quadrado)
-    plt.figtext(0.74, 1.075, f"Chuva acum.:\n NaN mm", fontsize=18, ha='center', color=text_color)
-    plt.figtext(0.74, 1.03, f"Índice UV: NaN", fontsize=11, ha='center', color='black')
-    
-    #plt.subplots_adjust(right=0.5)
-    
-    # Temperatura
-    axs[0].plot(df['Timestamp'], df['Temperature'], label="Temperatura", color='red', marker='o')
-    axs[0].plot(df['Timestamp'], df['Dew Point'], label="Ponto de orvalho", color="green", linestyle="--", marker='o',markersize=3)
-    axs[0].set_ylabel("Temperatura (°C)",fontsize=14)
-    axs[0].yaxis.set_major_formatter(mticker.FuncFormatter(lambda x, _: f"{x:.1f}"))
-    axs[0].legend(loc="best")
-    axs[0].grid(True)
-    for label in axs[0].get_yticklabels(): #Tamanho dos rótulos
-        label.set_fontsize(14)
-    
-    # Chuva
-    #axs[1].plot(df['Timestamp'], df['Precip'], color='indigo', label='Precipitação acumulada', marker='o')
-    precip_diff = df['Precip'].diff().fillna(0)
-    axs[1].bar(df['Timestamp'], precip_diff, color='skyblue', label='Taxa de precipitação', width=0.02)
-    axs[1].set_ylabel("Precipitação (mm)",fontsize=14)
-    axs[1].yaxis.set_major_formatter(mticker.FuncFormatter(lambda x, _: f"{x:.1f}"))
-    #axs[1].legend(loc="best")
-    axs[1].grid(True)
-    for label in axs[1].get_yticklabels(): #Tamanho dos rótulos
-        label.set_fontsize(14)
-    
-    # Umidade
-    axs[2].plot(df['Timestamp'], df['Humidity'], color='blue', marker='o')
-    axs[2].set_ylabel("Umidade relativa (%)",fontsize=14)
-    axs[2].yaxis.set_major_formatter(mticker.FuncFormatter(lambda x, _: f"{x:.0f}"))
-    axs[2].grid(True)
-    for label in axs[2].get_yticklabels(): #Tamanho dos rótulos
-        label.set_fontsize(14)
-    
-    # Vento
-    axs[3].plot(df['Timestamp'], df['Wind Speed'], color='navy', label='Vento', marker='o')
-    axs[3].scatter(df['Timestamp'], df['Wind Gust'], color='orange', label='Rajadas', alpha=0.7)
-    axs[3].set_ylabel("Vento (km/h)",fontsize=14)
-    axs[3].yaxis.set_major_formatter(mticker.FuncFormatter(lambda x, _: f"{x:.1f}"))
-    axs[3].grid(True)
-    axs[3].legend(loc="best")
-    for label in axs[3].get_yticklabels(): #Tamanho dos rótulos
-        label.set_fontsize(14)
-    
-    # Radiação
-    axs[4].plot(df['Timestamp'], df['Radiation'], color='orange', marker='o')
-    axs[4].set_ylabel("Radiação solar (W/m²)",fontsize=14)
-    axs[4].yaxis.set_major_formatter(mticker.FuncFormatter(lambda x, _: f"{x:.0f}"))
-    axs[4].grid(True)
-    for label in axs[4].get_yticklabels(): #Tamanho dos rótulos
-        label.set_fontsize(14)
-    
-    # Formatação do eixo X
-    axs[4].xaxis.set_major_formatter(mdates.DateFormatter('%H:%M', tz=brasilia_tz))
-    axs[4].xaxis.set_major_locator(mdates.HourLocator(interval=2))
-    axs[4].set_xlim([start_time, end_time])
-    for label in axs[4].get_xticklabels():
-        label.set_fontsize(14)
-    plt.xlabel("Hora local",fontsize=14)
-    plt.gcf().autofmt_xdate()
-    #print(f"Número de ticks no eixo X: {len(axs[2].get_xticks())}")
-    
-    # Configurar limites para cada eixo Y em cada subplot
-    axs[0].set_ylim(df['Dew Point'].min()-2, df['Temperature'].max()+2)
-    axs[1].set_ylim(0, precip_diff.max()+5)
-    axs[2].set_ylim([0, 103])
-    axs[3].set_ylim(0, df['Wind Gust'].max()+3)
-    axs[4].set_ylim([0, 1350])
-    
-    # Salvar o gráfico em um arquivo
-    plt.tight_layout()
-    plt.savefig('graph.png', bbox_inches='tight')
-    plt.close(fig)
+# O horário da execução fica fora do hash: sem dado novo, graph.png é mantido.
+# O código do painel e das séries derivadas entra no hash junto com o do script.
+digest = renderizacao.impressao_digital(df, atuais, estadoEstacao,
+                                        script=[__file__, painel_24h.__file__, series_derivadas.__file__, historico.__file__])
+if renderizacao.inalterado('graph.png', digest):
+    print("Sem dados novos; graph.png mantido.")
+    sys.exit(0)
+
+# Atualizar o painel (a figura é montada uma vez por processo) e salvar o gráfico em um arquivo
+# Série na grade de 15 min e grandezas derivadas, calculadas uma vez para todo o painel
+serie = series_derivadas.processar(df, timestamp)
+painel = painel_24h.obter_painel()
+painel.atualizar(serie, temp, precip_total, humidity, dew_point, solar_rad, uv_index, estadoEstacao, timestamp)
+painel.salvar('graph.png')
+renderizacao.registrar('graph.png', digest)
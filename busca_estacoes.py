@@ -0,0 +1,54 @@
+# Busca das observações atuais das estações do mapa
+#
+# Cada estação é uma requisição ao WU pelo api_clima (timeout por requisição e
+# pool de conexões keep-alive compartilhado). As estações são consultadas em
+# paralelo, com no máximo max_conexoes requisições simultâneas, de modo que o
+# tempo total fica próximo ao da estação mais lenta, e não à soma de todas.
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import requests
+import api_clima
+
+# Limite de requisições simultâneas (o pool de conexões do api_clima tem o mesmo tamanho)
+MAX_CONEXOES = api_clima.MAX_CONEXOES
+
+# Função para buscar os dados da API do WU
+def get_station_temperature(station_id):
+    try:
+        data = api_clima.observacao_atual(station_id)
+    except requests.exceptions.HTTPError:
+        print(f"Station is offline: {station_id}")
+        return None, None, None, None
+    except ValueError:  # Antes de RequestException: o erro de JSON do requests é as duas coisas
+        print(f"Invalid JSON response for station {station_id}")
+        return None, None, None, None
+    except requests.exceptions.RequestException as e:
+        print(f"Erro na requisição da estação {station_id}: {e}")
+        return None, None, None, None
+    if 'observations' in data and len(data['observations']) > 0:
+        observation = data['observations'][0]
+        temp = observation.get('metric', {}).get('temp', np.nan)
+        if temp is None or (isinstance(temp, float) and np.isnan(temp)):
+            print(f"Station {station_id} with no data")
+            return None, None, None, None
+        else:
+            return temp, observation['lat'], observation['lon'], observation.get('solarRadiation')
+    else:
+        print(f"No observations found for station {station_id}")
+        return None, None, None, None
+
+# Busca todas as estações em paralelo. Devolve o DataFrame na mesma ordem da lista de estações.
+def buscar_estacoes(stations, hora, max_conexoes=MAX_CONEXOES):
+    with ThreadPoolExecutor(max_workers=max_conexoes) as executor:
+        resultados = list(executor.map(get_station_temperature, stations))
+
+    temperatures = [temp if temp is not None else np.nan for temp, _, _, _ in resultados]  # Aceitar np.nan
+    return pd.DataFrame({
+        'Estacao': list(stations),
+        'Temperatura': temperatures,
+        'Latitude': [lat for _, lat, _, _ in resultados],
+        'Longitude': [lon for _, _, lon, _ in resultados],
+        'Radiacao': [rad for _, _, _, rad in resultados],
+        'Hora': [hora] * len(stations)  # Adiciona a mesma hora para todas as linhas
+    })
@@ -0,0 +1,183 @@
+# Cache em disco das respostas HTTP, endereçado pelo conteúdo
+#
+# Cada resposta é gravada em objetos/<sha256 do conteúdo>, de modo que payloads
+# idênticos (por exemplo, a mesma previsão baixada duas vezes) ocupam espaço uma
+# só vez. O índice (indice.json) associa a chave da requisição ao objeto e guarda
+# ETag, Last-Modified, a hora em que foi salvo e o último acesso, usado para
+# descartar as entradas menos usadas quando o cache passa do tamanho máximo.
+# Vários processos podem usar o mesmo cache (servico_render.py): cada alteração
+# relê o índice do disco sob uma trava de arquivo, aplica só a própria mudança
+# e regrava, de modo que entradas gravadas pelos outros não se percam.
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import time
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+CACHE_DIR = os.getenv('METEO_CACHE_DIR', os.path.join('.cache', 'http'))
+TAMANHO_MAX = 200 * 1024 * 1024  # 200 MB
+INTERVALO_ACESSO = 60 * 60  # s; um acerto só regrava o último acesso da entrada depois disso
+
+# Caches de arquivos sem índice (os pesos do interpolacao, por exemplo) seguem a
+# mesma política: o último acesso é o mtime do arquivo, renovado por tocar() no
+# máximo a cada INTERVALO_ACESSO, e limitar_diretorio apaga os arquivos acessados
+# há mais tempo até o diretório caber em tamanho_max.
+def tocar(arquivo, intervalo=INTERVALO_ACESSO):
+    try:
+        if time.time() - os.path.getmtime(arquivo) >= intervalo:
+            os.utime(arquivo)
+    except OSError:
+        pass
+
+def limitar_diretorio(diretorio, tamanho_max=TAMANHO_MAX, manter=()):
+    arquivos = []
+    for entrada in os.scandir(diretorio):
+        try:
+            if entrada.is_file():
+                estado = entrada.stat()
+                arquivos.append((estado.st_mtime, estado.st_size, entrada.path))
+        except OSError:  # Apagado por outro processo
+            continue
+    total = sum(tamanho for _, tamanho, _ in arquivos)
+    manter = {os.path.abspath(arquivo) for arquivo in manter}
+    for _, tamanho, caminho in sorted(arquivos):
+        if total <= tamanho_max:
+            break
+        if os.path.abspath(caminho) in manter:
+            continue
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
+        total -= tamanho
+
+# Chave da requisição: URL e parâmetros, sem a API key
+def chave_requisicao(url, params=None):
+    params = {k: str(v) for k, v in (params or {}).items() if k != 'apiKey'}
+    texto = url + '?' + json.dumps(params, sort_keys=True)
+    return hashlib.sha256(texto.encode()).hexdigest()
+
+class CacheHTTP:
+    def __init__(self, diretorio=CACHE_DIR, tamanho_max=TAMANHO_MAX):
+        self.diretorio = diretorio
+        self.tamanho_max = tamanho_max
+        self._lock = threading.Lock()
+        self._arquivo_indice = os.path.join(diretorio, 'indice.json')
+        self._arquivo_trava = os.path.join(diretorio, 'indice.lock')
+        self._indice = {}
+        self._versao = None
+        self._recarregar()
+
+    def _caminho_objeto(self, digest):
+        return os.path.join(self.diretorio, 'objetos', digest[:2], digest)
+
+    # Relê o índice se outro processo o regravou desde a última leitura
+    def _recarregar(self):
+        try:
+            estado = os.stat(self._arquivo_indice)
+        except OSError:
+            return
+        versao = (estado.st_ino, estado.st_mtime_ns, estado.st_size)
+        if versao == self._versao:
+            return
+        try:
+            with open(self._arquivo_indice) as f:
+                self._indice = json.load(f)
+            self._versao = versao
+        except (OSError, ValueError):
+            pass
+
+    # Alteração do índice: com a trava (entre threads e entre processos), relê a
+    # versão do disco, deixa o bloco alterá-la e a regrava, já sem o excedente
+    @contextlib.contextmanager
+    def _alterando(self):
+        os.makedirs(self.diretorio, exist_ok=True)
+        with self._lock, open(self._arquivo_trava, 'a') as trava:
+            if fcntl is not None:
+                fcntl.flock(trava, fcntl.LOCK_EX)  # Liberada ao fechar o arquivo
+            self._recarregar()
+            yield self._indice
+            self._remover_excedente()
+            self._salvar_indice()
+
+    # Entrada do índice para a chave, ou None se não existir (ou se o objeto sumiu)
+    def buscar(self, chave):
+        with self._lock:
+            self._recarregar()
+            entrada = self._indice.get(chave)
+            if entrada is None or not os.path.exists(self._caminho_objeto(entrada['conteudo'])):
+                return None
+            return dict(entrada)
+
+    @staticmethod
+    def fresca(entrada, ttl):
+        return time.time() - entrada['salvo_em'] < ttl
+
+    # Lê o conteúdo da entrada. O acesso (para a política LRU) só é regravado no
+    # índice se o último registrado tiver mais de INTERVALO_ACESSO, e não a cada acerto.
+    def ler(self, chave, entrada):
+        with open(self._caminho_objeto(entrada['conteudo']), 'rb') as f:
+            conteudo = f.read()
+        if time.time() - entrada['acesso'] >= INTERVALO_ACESSO:
+            with self._alterando() as indice:
+                if chave in indice:
+                    indice[chave]['acesso'] = time.time()
+        return conteudo
+
+    # Revalidação sem mudança (HTTP 304): reinicia o TTL da entrada
+    def renovar(self, chave):
+        with self._alterando() as indice:
+            if chave in indice:
+                indice[chave]['salvo_em'] = indice[chave]['acesso'] = time.time()
+
+    def salvar(self, chave, conteudo, headers):
+        digest = hashlib.sha256(conteudo).hexdigest()
+        caminho = self._caminho_objeto(digest)
+        if not os.path.exists(caminho):
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporario, 'wb') as f:
+                f.write(conteudo)
+            os.replace(temporario, caminho)
+        agora = time.time()
+        with self._alterando() as indice:
+            indice[chave] = {
+                'conteudo': digest,
+                'tamanho': len(conteudo),
+                'tipo': headers.get('Content-Type'),
+                'etag': headers.get('ETag'),
+                'last_modified': headers.get('Last-Modified'),
+                'salvo_em': agora,
+                'acesso': agora,
+            }
+
+    # Remove as entradas acessadas há mais tempo até caber em tamanho_max.
+    # Objetos compartilhados por várias chaves contam uma vez só.
+    def _remover_excedente(self):
+        objetos = {e['conteudo']: e['tamanho'] for e in self._indice.values()}
+        total = sum(objetos.values())
+        for chave, entrada in sorted(self._indice.items(), key=lambda item: item[1]['acesso']):
+            if total <= self.tamanho_max:
+                break
+            del self._indice[chave]
+            digest = entrada['conteudo']
+            if all(e['conteudo'] != digest for e in self._indice.values()):
+                total -= objetos[digest]
+                try:
+                    os.remove(self._caminho_objeto(digest))
+                except OSError:
+                    pass
+
+    def _salvar_indice(self):
+        os.makedirs(self.diretorio, exist_ok=True)
+        temporario = f"{self._arquivo_indice}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporario, 'w') as f:
+            json.dump(self._indice, f)
+        os.replace(temporario, self._arquivo_indice)
+        estado = os.stat(self._arquivo_indice)
+        self._versao = (estado.st_ino, estado.st_mtime_ns, estado.st_size)
@@ -0,0 +1,175 @@
+# Climatologia da estação: histórico diário permanente e índice de agregados
+#
+# clima_diario.csv guarda um resumo por dia (mínima, máxima, média e chuva), sem
+# descartar os meses anteriores. climatologia.json guarda, para cada mês (MM) e
+# cada dia do ano (MM-DD), somas, recordes e histogramas que respondem normais,
+# percentis e recordes sem reler os dias. Cada novo dia atualiza o índice em O(1).
+# Somas e contagens também ficam por ano, para que as normais possam deixar de
+# fora o ano em andamento. Um índice de versão diferente é refeito a partir do CSV.
+import json
+import os
+import numpy as np
+import pandas as pd
+
+ARQUIVO_DIARIO = 'clima_diario.csv'
+ARQUIVO_INDICE = 'climatologia.json'
+COLUNAS = ['Date', 'MinTemp', 'MaxTemp', 'AvgTemp', 'Precip']
+TEMPERATURAS = ['MinTemp', 'MaxTemp', 'AvgTemp']
+VERSAO_INDICE = 2
+
+# Histograma das temperaturas, em classes de 0,5 °C entre -15 e 50 °C
+HIST_INICIO, HIST_FIM, HIST_PASSO = -15.0, 50.0, 0.5
+HIST_CLASSES = int((HIST_FIM - HIST_INICIO) / HIST_PASSO)
+
+def _agregado_vazio():
+    return {
+        'anos': [],
+        'chuva': {'n': 0, 'soma': 0.0, 'por_ano': {}},
+        **{var: {'n': 0, 'soma': 0.0, 'soma2': 0.0, 'recorde_min': None, 'recorde_max': None,
+                 'hist': [0] * HIST_CLASSES, 'por_ano': {}} for var in TEMPERATURAS},
+    }
+
+def _classe(valor):
+    return int(np.clip((valor - HIST_INICIO) // HIST_PASSO, 0, HIST_CLASSES - 1))
+
+# Acrescenta um dia a um agregado (de um mês ou de um dia do ano)
+def _acumular(agregado, data, valores):
+    ano = str(data.year)
+    if ano not in agregado['anos']:
+        agregado['anos'].append(ano)
+    for var in TEMPERATURAS:
+        valor = valores[var]
+        if valor is None or np.isnan(valor):
+            continue
+        a = agregado[var]
+        a['n'] += 1
+        a['soma'] += valor
+        a['soma2'] += valor * valor
+        a['hist'][_classe(valor)] += 1
+        n_ano, soma_ano = a['por_ano'].get(ano, (0, 0.0))
+        a['por_ano'][ano] = [n_ano + 1, soma_ano + valor]
+        if a['recorde_min'] is None or valor < a['recorde_min']['valor']:
+            a['recorde_min'] = {'valor': valor, 'data': data.isoformat()}
+        if a['recorde_max'] is None or valor > a['recorde_max']['valor']:
+            a['recorde_max'] = {'valor': valor, 'data': data.isoformat()}
+    chuva = valores['Precip']
+    if chuva is not None and not np.isnan(chuva):
+        agregado['chuva']['n'] += 1
+        agregado['chuva']['soma'] += chuva
+        agregado['chuva']['por_ano'][ano] = agregado['chuva']['por_ano'].get(ano, 0.0) + chuva
+
+class Climatologia:
+    def __init__(self, arquivo_diario=ARQUIVO_DIARIO, arquivo_indice=ARQUIVO_INDICE):
+        self.arquivo_diario = arquivo_diario
+        self.arquivo_indice = arquivo_indice
+        if os.path.exists(arquivo_diario):
+            self.diario = pd.read_csv(arquivo_diario, parse_dates=['Date'])
+            self.diario['Date'] = self.diario['Date'].dt.date
+        else:
+            self.diario = pd.DataFrame(columns=COLUNAS)
+        if os.path.exists(arquivo_indice):
+            with open(arquivo_indice) as f:
+                self.indice = json.load(f)
+        if not os.path.exists(arquivo_indice) or self.indice.get('versao') != VERSAO_INDICE:
+            self.reconstruir_indice()
+
+    def __contains__(self, data):
+        return data in set(self.diario['Date'])
+
+    # Recalcula o índice a partir de todo o histórico diário
+    def reconstruir_indice(self):
+        self.indice = {'versao': VERSAO_INDICE, 'mes': {}, 'dia': {}}
+        for linha in self.diario.itertuples(index=False):
+            self._atualizar_indice(linha.Date, linha._asdict())
+
+    def _atualizar_indice(self, data, valores):
+        valores = {k: (None if pd.isna(v) else float(v)) for k, v in valores.items() if k != 'Date'}
+        _acumular(self.indice['mes'].setdefault(f"{data.month:02d}", _agregado_vazio()), data, valores)
+        _acumular(self.indice['dia'].setdefault(f"{data.month:02d}-{data.day:02d}", _agregado_vazio()), data, valores)
+
+    # Acrescenta um dia ao histórico diário (só a nova linha é escrita) e ao índice
+    def adicionar_dia(self, data, min_temp, max_temp, mean_temp, precip_total):
+        linha = pd.DataFrame({'Date': [data], 'MinTemp': [min_temp], 'MaxTemp': [max_temp],
+                              'AvgTemp': [mean_temp], 'Precip': [precip_total]})
+        linha.to_csv(self.arquivo_diario, mode='a', header=not os.path.exists(self.arquivo_diario),
+                     index=False, date_format='%Y-%m-%d')
+        self.diario = pd.concat([self.diario, linha], ignore_index=True)
+        self._atualizar_indice(data, linha.iloc[0].to_dict())
+        self.salvar_indice()
+
+    # Acrescenta vários dias numa única escrita do CSV e do índice. Dias já presentes
+    # são ignorados, então repetir a mesma carga não duplica nada. Devolve quantos entraram.
+    def adicionar_dias(self, dias):
+        presentes = set(self.diario['Date'])
+        dias = dias[~dias['Date'].isin(presentes)].drop_duplicates('Date').reindex(columns=COLUNAS)
+        if dias.empty:
+            return 0
+        dias.to_csv(self.arquivo_diario, mode='a', header=not os.path.exists(self.arquivo_diario),
+                    index=False, date_format='%Y-%m-%d')
+        self.diario = pd.concat([self.diario, dias], ignore_index=True)
+        for linha in dias.itertuples(index=False):
+            self._atualizar_indice(linha.Date, linha._asdict())
+        self.salvar_indice()
+        return len(dias)
+
+    def salvar_indice(self):
+        temporario = f"{self.arquivo_indice}.{os.getpid()}.tmp"
+        with open(temporario, 'w') as f:
+            json.dump(self.indice, f)
+        os.replace(temporario, self.arquivo_indice)
+
+    # Dias de um mês, em ordem
+    def mes(self, ano, mes):
+        datas = pd.to_datetime(self.diario['Date'])
+        return self.diario[(datas.dt.year == ano) & (datas.dt.month == mes)].sort_values('Date').reset_index(drop=True)
+
+    def _agregado(self, chave):
+        tipo = 'dia' if '-' in chave else 'mes'
+        return self.indice[tipo].get(chave)
+
+    # Número de anos com dados para o mês (MM) ou dia do ano (MM-DD)
+    def anos(self, chave):
+        agregado = self._agregado(chave)
+        return len(agregado['anos']) if agregado else 0
+
+    # Média de todos os anos (normal) de uma variável de temperatura; excluir_ano
+    # deixa de fora o mês em andamento, como em chuva_normal. None sem dados.
+    def normal(self, chave, var, excluir_ano=None):
+        agregado = self._agregado(chave)
+        if not agregado:
+            return None
+        a = agregado[var]
+        n_ano, soma_ano = a['por_ano'].get(str(excluir_ano), (0, 0.0))
+        n, soma = a['n'] - n_ano, a['soma'] - soma_ano
+        return soma / n if n > 0 else None
+
+    def desvio_padrao(self, chave, var):
+        agregado = self._agregado(chave)
+        if not agregado or agregado[var]['n'] < 2:
+            return None
+        a = agregado[var]
+        media = a['soma'] / a['n']
+        return float(np.sqrt(max(a['soma2'] / a['n'] - media * media, 0.0)))
+
+    # Percentil aproximado (resolução de HIST_PASSO) a partir do histograma
+    def percentil(self, chave, var, p):
+        agregado = self._agregado(chave)
+        if not agregado or agregado[var]['n'] == 0:
+            return None
+        acumulado = np.cumsum(agregado[var]['hist'])
+        classe = int(np.searchsorted(acumulado, p / 100 * acumulado[-1]))
+        return HIST_INICIO + (classe + 0.5) * HIST_PASSO
+
+    # Recordes (valor e data) de mínima e máxima da variável; None onde não há dados
+    def recordes(self, chave, var):
+        agregado = self._agregado(chave)
+        if not agregado:
+            return None, None
+        return agregado[var]['recorde_min'], agregado[var]['recorde_max']
+
+    # Chuva normal do mês: média dos totais dos anos com dados (excluir_ano
+    # permite deixar de fora o mês em andamento)
+    def chuva_normal(self, mes, excluir_ano=None):
+        agregado = self._agregado(mes)
+        totais = [total for ano, total in agregado['chuva']['por_ano'].items() if ano != str(excluir_ano)] if agregado else []
+        return float(np.mean(totais)) if totais else None
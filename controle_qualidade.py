@@ -0,0 +1,147 @@
+# Controle de qualidade das estações do mapa
+#
+# Antes do desenho, cada temperatura passa por quatro testes, feitos para todas as
+# estações de uma vez com arrays NumPy:
+#  - faixa: fora de FAIXA (°C) é leitura impossível;
+#  - passo e histórico: variação grande demais desde a última leitura da própria
+#    estação, ou longe demais da mediana das suas últimas HISTORICO leituras
+#    (só as das últimas JANELA_HISTORICO horas: depois de uma longa ausência a
+#    estação volta sem histórico, e não é comparada com outra estação do ano);
+#  - vizinhos: longe demais da mediana das estações a até RAIO_VIZINHOS km
+#    (só as que passaram nos testes acima), quando há vizinhos suficientes;
+#  - sol: mais quente que os vizinhos com radiação solar alta (ou, sem sensor,
+#    nas horas de sol), o viés típico de sensor sem abrigo. O limite cresce com
+#    a dispersão entre os vizinhos, para não reprovar a estação que está mais
+#    quente só por estar numa parte mais urbana de uma região heterogênea.
+# Cada estação tem uma nota (média móvel exponencial dos resultados, de 0 a 1),
+# guardada em CACHE_DIR junto com as últimas leituras. Estações com nota abaixo
+# de NOTA_EXCLUSAO não entram no mapa; abaixo de NOTA_SUSPENSAO deixam de ser
+# consultadas e só são tentadas de novo a cada RETENTATIVA horas, para que
+# possam se recuperar. Estação offline conta como falha.
+import json
+import os
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import radar_numerico
+
+CACHE_DIR = os.getenv('CONTROLE_QUALIDADE_DIR', os.path.join('.cache', 'controle_qualidade'))
+FAIXA = (-10, 45)  # °C
+PASSO_MAX = 6  # °C por hora
+JANELA_PASSO = 3  # h; leituras anteriores mais velhas que isso não entram no teste de passo
+DESVIO_HISTORICO = 12  # °C em relação à mediana das últimas leituras
+HISTORICO = 24  # Leituras guardadas por estação
+JANELA_HISTORICO = 72  # h; leituras mais velhas que isso não entram no teste de histórico
+RAIO_VIZINHOS = 15  # km
+MIN_VIZINHOS = 3
+DESVIO_VIZINHOS = 4  # °C em relação à mediana dos vizinhos
+VIES_SOLAR = 2  # °C acima dos vizinhos, no mínimo
+FATOR_DISPERSAO = 2  # O limite do teste de sol é pelo menos esse múltiplo do desvio entre os vizinhos
+RADIACAO_SOL = 300  # W/m²
+HORAS_SOL = (10, 15)  # Horas de sol para estações sem sensor de radiação
+ALFA = 0.2  # Peso da execução atual na nota
+NOTA_EXCLUSAO = 0.5
+NOTA_SUSPENSAO = 0.2
+RETENTATIVA = 24  # h
+TESTES = ['faixa', 'passo', 'historico', 'vizinhos', 'sol']
+
+class ControleQualidade:
+    def __init__(self, arquivo=os.path.join(CACHE_DIR, 'estado.json')):
+        self.arquivo = arquivo
+        if os.path.exists(arquivo):
+            with open(arquivo) as f:
+                self.estacoes = json.load(f)
+        else:
+            self.estacoes = {}
+
+    def nota(self, estacao):
+        return self.estacoes.get(estacao, {}).get('nota', 1.0)
+
+    # Estações a consultar agora: todas, menos as suspensas que já foram tentadas há pouco
+    def a_buscar(self, estacoes, agora):
+        limite = agora - timedelta(hours=RETENTATIVA)
+        return [e for e in estacoes if self.nota(e) >= NOTA_SUSPENSAO
+                or datetime.fromisoformat(self.estacoes[e]['tentativa']) <= limite]
+
+    # Leitura anterior, seu tempo e a mediana das leituras das últimas
+    # JANELA_HISTORICO horas de cada estação
+    def _historico(self, estacoes, agora):
+        limite = (agora - timedelta(hours=JANELA_HISTORICO)).timestamp()
+        anterior, tempo, mediana = (np.full(len(estacoes), np.nan) for _ in range(3))
+        for i, e in enumerate(estacoes):
+            leituras = self.estacoes.get(e, {}).get('historico', [])
+            if leituras:
+                tempo[i] = datetime.fromisoformat(leituras[-1][0]).timestamp()
+                anterior[i] = leituras[-1][1]
+            recentes = [t for momento, t in leituras if datetime.fromisoformat(momento).timestamp() >= limite]
+            if len(recentes) >= 3:
+                mediana[i] = np.median(recentes)
+        return anterior, tempo, mediana
+
+    # Resultado de cada teste (True = falhou) e se a leitura foi aprovada, por estação.
+    # dados: colunas Estacao, Temperatura, Latitude, Longitude e Radiacao (W/m², opcional).
+    def verificar(self, dados, agora):
+        temperatura = pd.to_numeric(dados['Temperatura'], errors='coerce').to_numpy(dtype=float)
+        lat = pd.to_numeric(dados['Latitude'], errors='coerce').to_numpy(dtype=float)
+        lon = pd.to_numeric(dados['Longitude'], errors='coerce').to_numpy(dtype=float)
+        radiacao = pd.to_numeric(dados.get('Radiacao', pd.Series(np.nan, index=dados.index)), errors='coerce').to_numpy(dtype=float)
+        presente = ~np.isnan(temperatura)
+
+        falhas = pd.DataFrame(False, index=dados['Estacao'], columns=TESTES)
+        with np.errstate(invalid='ignore'):
+            falhas['faixa'] = (temperatura < FAIXA[0]) | (temperatura > FAIXA[1])
+            anterior, tempo, mediana = self._historico(dados['Estacao'], agora)
+            horas = (agora.timestamp() - tempo) / 3600
+            recente = (horas > 0) & (horas <= JANELA_PASSO)
+            falhas['passo'] = recente & (np.abs(temperatura - anterior) > PASSO_MAX * np.maximum(horas, 1))
+            falhas['historico'] = np.abs(temperatura - mediana) > DESVIO_HISTORICO
+
+            # Mediana dos vizinhos (matriz de distâncias entre todas as estações)
+            confiavel = presente & ~falhas[['faixa', 'passo', 'historico']].any(axis=1).to_numpy()
+            distancias = radar_numerico.distancia_km(lat[:, np.newaxis], lon[:, np.newaxis], lat[np.newaxis, :], lon[np.newaxis, :])
+            vizinho = (distancias <= RAIO_VIZINHOS) & confiavel[np.newaxis, :]
+            np.fill_diagonal(vizinho, False)
+            n_vizinhos = vizinho.sum(axis=1)
+            valores = np.where(vizinho, temperatura[np.newaxis, :], np.nan)
+            mediana_vizinhos, dispersao = np.full(len(temperatura), np.nan), np.full(len(temperatura), np.nan)
+            com_vizinhos = n_vizinhos >= MIN_VIZINHOS
+            if com_vizinhos.any():
+                mediana_vizinhos[com_vizinhos] = np.nanmedian(valores[com_vizinhos], axis=1)
+                # Desvio robusto entre os vizinhos (MAD escalado para equivaler ao desvio-padrão)
+                dispersao[com_vizinhos] = 1.4826 * np.nanmedian(np.abs(valores[com_vizinhos] - mediana_vizinhos[com_vizinhos, np.newaxis]), axis=1)
+            desvio = temperatura - mediana_vizinhos
+            falhas['vizinhos'] = np.abs(desvio) > DESVIO_VIZINHOS
+
+            sol = np.where(np.isnan(radiacao), HORAS_SOL[0] <= agora.hour <= HORAS_SOL[1], radiacao >= RADIACAO_SOL)
+            falhas['sol'] = sol & (desvio > np.maximum(VIES_SOLAR, FATOR_DISPERSAO * dispersao))
+
+        falhas['presente'] = presente
+        falhas['aprovada'] = presente & ~falhas[TESTES].any(axis=1).to_numpy()
+        return falhas
+
+    # Atualiza notas e históricos das estações consultadas com o resultado de verificar.
+    # Leituras reprovadas não entram no histórico, para não contaminar os testes seguintes.
+    def atualizar(self, dados, falhas, agora):
+        momento = agora.isoformat(timespec='seconds')
+        for estacao, temperatura, aprovada in zip(dados['Estacao'], dados['Temperatura'], falhas['aprovada']):
+            item = self.estacoes.setdefault(estacao, {'nota': 1.0, 'historico': []})
+            item['nota'] = round((1 - ALFA) * item['nota'] + ALFA * float(aprovada), 4)
+            item['tentativa'] = momento
+            if aprovada:
+                item['historico'] = (item['historico'] + [[momento, float(temperatura)]])[-HISTORICO:]
+        # Notas já atualizadas: reprovadas agora ou com nota baixa saem do mapa
+        return falhas['aprovada'].to_numpy() & np.array([self.nota(e) >= NOTA_EXCLUSAO for e in dados['Estacao']])
+
+    def salvar(self):
+        os.makedirs(os.path.dirname(self.arquivo) or '.', exist_ok=True)
+        temporario = f"{self.arquivo}.{os.getpid()}.tmp"
+        with open(temporario, 'w') as f:
+            json.dump(self.estacoes, f)
+        os.replace(temporario, self.arquivo)
+
+    # Resumo das falhas de uma execução, para o log
+    @staticmethod
+    def resumo(falhas, no_mapa):
+        partes = [f"{teste}: {', '.join(falhas.index[falhas[teste]])}" for teste in TESTES if falhas[teste].any()]
+        fora = falhas.index[falhas['presente'].to_numpy() & ~no_mapa]
+        return f"{len(fora)} estações fora do mapa" + (f" ({'; '.join(partes)})" if partes else "")
@@ -1,29 +1,26 @@
-import time
 import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-import matplotlib.ticker as mticker
 import pandas as pd
 from datetime import datetime, timedelta, timezone
 import requests
 import pytz
 import numpy as np
 import os
+import api_clima
+import climatologia
+import historico
+import renderizacao
 
 # Fuso horário de Brasília
 brasilia_tz = pytz.timezone("America/Sao_Paulo")
 
 # Função para pegar mínimas e máximas diárias
 def get_daily_min_max():
-    WU_API_KEY = os.getenv('API_KEY') # JAMAIS COMPARTILHAR ESSA API KEY
     STATION_ID = "ICURITIB28"
     current_date = datetime.now(brasilia_tz)
     yesterday_date = current_date - timedelta(days=1)
     yesterday_formatted = yesterday_date.strftime("%Y%m%d")
-    url = f"https://api.weather.com/v2/pws/history/daily?stationId={STATION_ID}&format=json&units=m&numericPrecision=decimal&date={yesterday_formatted}&apiKey={WU_API_KEY}"
     try:
-      response = requests.get(url)
-      response.raise_for_status()
-      data = response.json()
+      data = api_clima.historico_diario(STATION_ID, yesterday_formatted)
       #print(data)
       summary = data['observations'][0]["metric"]
       min_temp = summary["tempLow"]
@@ -34,57 +31,64 @@ def get_daily_min_max():
     except requests.exceptions.RequestException as e:
       print("Erro na requisição:", e)
       return None, None, None, None
-    except KeyError as e:
+    except (KeyError, IndexError) as e:
       print("Chave não encontrada nos dados da API:", e)
       return None, None, None, None
 
-# Obter os extremos diários de ontem
-min_temp, max_temp, mean_temp, precip_total = get_daily_min_max()
+# Mínimo de amostras para o dia ser considerado completo no histórico local
+# (a estação é lida a cada ~15 min, ou seja, ~96 amostras por dia)
+MIN_AMOSTRAS = 48
+
+# Extremos de um dia calculados a partir do histórico gravado pelo atualizaCSV.py,
+# sem chamada à API. Devolve None se o dia tiver poucas amostras.
+def get_daily_min_max_local(dia):
+    armazem = historico.ArmazemParticionado(os.path.join('historico', 'ICURITIB28'))
+    inicio = brasilia_tz.localize(datetime.combine(dia, datetime.min.time()))
+    # Começa uma hora antes da meia-noite para contar a chuva logo após a virada
+    observacoes = armazem.ler(inicio - timedelta(hours=1), inicio + timedelta(days=1))
+    if observacoes.empty:
+        return None
+    diarios = historico.agregados_diarios(observacoes)
+    if dia not in diarios.index or diarios.at[dia, 'Amostras'] < MIN_AMOSTRAS:
+        return None
+    resumo = diarios.loc[dia]
+    return tuple(round(float(resumo[coluna]), 1) for coluna in ['MinTemp', 'MaxTemp', 'AvgTemp', 'Precip'])
+
 timestamp = datetime.now(timezone.utc).astimezone(brasilia_tz) - timedelta(days=1)
 data_formatada = timestamp.date()  # Obter apenas a data (YYYY-MM-DD) como datetime.date
 
-# Caminho do arquivo CSV
+# Obter os extremos diários de ontem: do histórico local e, se ele estiver incompleto, da API
+extremos_locais = get_daily_min_max_local(data_formatada)
+if extremos_locais is not None:
+    min_temp, max_temp, mean_temp, precip_total = extremos_locais
+else:
+    print("Histórico local incompleto para ontem; consultando a API.")
+    min_temp, max_temp, mean_temp, precip_total = get_daily_min_max()
+
+# Histórico diário completo e índice climatológico (normais, percentis e recordes)
+clima = climatologia.Climatologia()
+
+# Caminho do arquivo CSV (visão do mês atual)
 csv_file = 'month_data.csv'
 
-# Verificar se o arquivo existe
-if os.path.exists(csv_file):
-    # Ler os dados existentes
-    df = pd.read_csv(csv_file, parse_dates=['Date'])
-    df['Date'] = df['Date'].dt.date  # Apenas data (sem hora e sem timezone)
+# Na primeira execução o histórico diário começa com o conteúdo do CSV do mês
+if clima.diario.empty and os.path.exists(csv_file):
+    anterior = pd.read_csv(csv_file, parse_dates=['Date'])
+    for linha in anterior.itertuples(index=False):
+        clima.adicionar_dia(linha.Date.date(), linha.MinTemp, linha.MaxTemp, linha.AvgTemp, linha.Precip)
+
+# Verificar se a data já existe no histórico
+if data_formatada in clima:
+    print(f"Dados de {data_formatada} já existem no arquivo {climatologia.ARQUIVO_DIARIO}.")
+elif min_temp is None:
+    print(f"Sem dados de {data_formatada}; nada foi adicionado.")
 else:
-    # Criar um DataFrame vazio
-    df = pd.DataFrame(columns=['Date', 'MinTemp', 'MaxTemp', 'AvgTemp', 'Precip'])
-    print("Arquivo CSV não encontrado. Criando um arquivo vazio...")
-    df.to_csv(csv_file, index=False)
-
-# Obter a data atual no formato YYYY-MM
-current_month = timestamp.strftime("%Y-%m")
-
-# Obter a data atual no formato YYYY-MM
-current_month = timestamp.strftime("%Y-%m")
-# Filtrar os dados do DataFrame para manter apenas os registros do mesmo mês
-df = df[df['Date'].apply(lambda x: x.strftime("%Y-%m")) == current_month]
-
-# Verificar se a data já existe no DataFrame
-if data_formatada not in df['Date'].values:
-    # Criar um DataFrame com o novo dado
-    new_data = pd.DataFrame({
-        'Date': [data_formatada],
-        'MinTemp': [min_temp],
-        'MaxTemp': [max_temp],
-        'AvgTemp': [mean_temp],
-        'Precip': [precip_total]
-    })
-
-    # Concatenar com o DataFrame existente
-    df = pd.concat([df, new_data], ignore_index=True)
-
-    # Salvar de volta no CSV
-    #df['Date'] = pd.to_datetime(df['Date']).dt.strftime("%Y-%m-%d")  # Salvar no formato desejado
-    df.to_csv(csv_file, index=False, date_format='%Y-%m-%d')
-    print(f"Dados de {data_formatada} adicionados ao arquivo {csv_file}.")
-else:
-    print(f"Dados de {data_formatada} já existem no arquivo {csv_file}.")
+    clima.adicionar_dia(data_formatada, min_temp, max_temp, mean_temp, precip_total)
+    print(f"Dados de {data_formatada} adicionados ao arquivo {climatologia.ARQUIVO_DIARIO}.")
+
+# Filtrar os dados para manter apenas os registros do mesmo mês
+df = clima.mes(timestamp.year, timestamp.month)
+df.to_csv(csv_file, index=False, date_format='%Y-%m-%d')
 
 # Determinar a data de ontem no formato YYYY-MM-DD
 yesterday = (datetime.now(brasilia_tz) - timedelta(days=1)).date()
@@ -92,8 +96,27 @@ yesterday = (datetime.now(brasilia_tz) - timedelta(days=1)).date()
 # Obter os dados do dia anterior
 daily_data = df[df['Date'] == yesterday]
 
+# Comparação com a climatologia do mês, quando há outros anos para comparar.
+# As normais (temperatura e chuva) deixam de fora o ano em andamento. Os valores
+# entram na impressão digital: um preenchimento de lacunas ou uma mudança nas
+# normais também redesenha a figura.
+mes_chave = f"{yesterday.month:02d}"
+comparacao = None
+if clima.anos(mes_chave) > 1:
+    comparacao = {
+        'normal_min': clima.normal(mes_chave, 'MinTemp', excluir_ano=yesterday.year),
+        'normal_max': clima.normal(mes_chave, 'MaxTemp', excluir_ano=yesterday.year),
+        'recorde_min': clima.recordes(mes_chave, 'MinTemp')[0],
+        'recorde_max': clima.recordes(mes_chave, 'MaxTemp')[1],
+        'chuva_normal': clima.chuva_normal(mes_chave, excluir_ano=yesterday.year),
+    }
+
+digest = renderizacao.impressao_digital(df, yesterday, comparacao, script=[__file__, climatologia.__file__])
+
 if daily_data.empty:
     print(f"Nenhum dado encontrado para {yesterday}.")
+elif renderizacao.inalterado('extremes_graph.png', digest):
+    print("Extremos sem mudanças; extremes_graph.png mantido.")
 else:
     # Extrair valores do dia anterior
     min_temp = daily_data['MinTemp'].iloc[0]
@@ -150,8 +173,27 @@ else:
     ax.text(0.5, 0.12, f"Temperatura média: {media_horaria:.1f} ºC\n", fontsize=16, ha='center', va='center')
     ax.text(0.5, 0.05, f"Precipitação total: {precip_soma_mes:.1f} mm\n", fontsize=16, ha='center', va='center')
 
+    # Comparação com a climatologia do mês
+    if comparacao is not None:
+        normal_min, normal_max = comparacao['normal_min'], comparacao['normal_max']
+        if normal_min is not None and normal_max is not None:
+            plt.figtext(0.5, -0.02, f"Em relação à normal: mínimas {avg_min - normal_min:+.1f} ºC, máximas {avg_max - normal_max:+.1f} ºC",
+                        fontsize=9, ha='center', va='center')
+
+        recorde_min, recorde_max = comparacao['recorde_min'], comparacao['recorde_max']
+        partes = []
+        if recorde_min is not None and recorde_max is not None:
+            partes.append(f"Recordes do mês: {recorde_min['valor']:.1f} ºC ({recorde_min['data'][:4]}) e "
+                          f"{recorde_max['valor']:.1f} ºC ({recorde_max['data'][:4]})")
+        chuva_normal = comparacao['chuva_normal']
+        if chuva_normal is not None:
+            partes.append(f"Chuva normal: {chuva_normal:.0f} mm")
+        if partes:
+            plt.figtext(0.5, -0.07, " | ".join(partes), fontsize=9, ha='center', va='center')
+
     # Salvar o gráfico em um arquivo
     plt.tight_layout()
-    plt.savefig('extremes_graph.png', bbox_inches='tight')
+    renderizacao.salvar_figura(fig, 'extremes_graph.png', bbox_inches='tight')
     plt.close(fig)
+    renderizacao.registrar('extremes_graph.png', digest)
 
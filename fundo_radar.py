@@ -0,0 +1,234 @@
+# Camadas estáticas do mapa do radar, renderizadas uma vez e reaproveitadas
+#
+# Tudo no radar.png (e no radar_parana.png), menos a imagem do radar e o horário,
+# depende só do centro, da extensão e do título do mapa: estados, estradas, áreas
+# urbanas, cidades, o círculo em torno do centro, a escala, a barra de cores e o título. Essas camadas são desenhadas uma
+# vez com o cartopy e salvas como duas imagens RGBA, uma abaixo do radar (fundo)
+# e outra acima dele (sobreposição), junto com a caixa em pixels onde o radar
+# entra. A divisão segue a ordem de desenho do mapa original: terra e oceano
+# (zorder < 0) ficam abaixo do radar; linhas, áreas urbanas, cidades e textos,
+# acima. A cada execução só é preciso compor o radar novo entre as duas, com NumPy.
+import hashlib
+import json
+import os
+import numpy as np
+import matplotlib.pyplot as plt
+import matplotlib.colors as mcolors
+from PIL import Image
+import indice_cidades
+import renderizacao
+
+CACHE_DIR = os.getenv('FUNDO_RADAR_DIR', os.path.join('.cache', 'fundo_radar'))
+FIGSIZE = (10, 8)
+DPI = 100
+ALPHA_RADAR = 0.6
+TITULO = "Radar de Chuvas - Curitiba e região"
+
+# Definição da paleta de cores da chuva usada pelo RainViewer
+rain_colors = [
+    (0, "white"),         # Sem precipitação
+    (0.1, "lightblue"),   # Chuva fraca
+    (0.3, "blue"),        # Chuva moderada
+    (0.5, "yellow"),      # Chuva forte
+    (0.7, "orange"),      # Chuva muito forte
+    (0.9, "red"),         # Tempestade
+    (1.0, "purple")       # Chuva extrema
+]
+
+# Imagem RGBA da figura como está desenhada no canvas
+def _rgba(fig):
+    fig.canvas.draw()
+    return np.asarray(fig.canvas.buffer_rgba()).copy()
+
+# Desenha as camadas estáticas com o cartopy. Devolve as imagens de fundo e de
+# sobreposição, a caixa do radar (coluna/linha inicial e final, origem no canto
+# superior esquerdo) e a posição do texto do horário em frações da figura.
+# raio_km = 0 omite o círculo em torno do centro.
+def _renderizar(lat_centro, lon_centro, delta_lat, delta_lon, titulo=TITULO, raio_km=30, escala_km=20):
+    import cartopy.crs as ccrs
+    import cartopy.feature as cfeature
+    from cartopy.geodesic import Geodesic
+    from geopy.distance import geodesic
+
+    extensao = [lon_centro - delta_lon, lon_centro + delta_lon, lat_centro - delta_lat, lat_centro + delta_lat]
+
+    # Criar o mapa com Cartopy
+    fig, ax = plt.subplots(figsize=FIGSIZE, dpi=DPI, subplot_kw={'projection': ccrs.PlateCarree()})
+    ax.set_extent(extensao, crs=ccrs.PlateCarree())
+
+    # Adicionar camadas geográficas
+    ax.add_feature(cfeature.LAND, facecolor='lightgray')
+    ax.add_feature(cfeature.OCEAN, facecolor='lightblue')
+    ax.add_feature(cfeature.COASTLINE, linewidth=0.8)
+    ax.add_feature(cfeature.BORDERS, linewidth=1.5)
+
+    # Adicionar fronteiras estaduais com mais destaque
+    ax.add_feature(cfeature.NaturalEarthFeature(category='cultural',
+                                                name='admin_1_states_provinces_lines',
+                                                scale='10m',
+                                                facecolor='none',
+                                                edgecolor='black',
+                                                linewidth=1.2))
+
+    # Adicionar estradas principais
+    ax.add_feature(cfeature.NaturalEarthFeature(category='cultural',
+                                                name='roads',
+                                                scale='10m',
+                                                facecolor='none',
+                                                edgecolor='gray',
+                                                linewidth=0.8))
+
+    # Adicionar áreas urbanas ao mapa
+    ax.add_feature(cfeature.NaturalEarthFeature(category='cultural',
+                                                name='urban_areas',
+                                                scale='10m',
+                                                facecolor='dimgrey',  # Cor cinza escuro
+                                                alpha=0.5))  # Transparência para não cobrir tudo
+
+    # Adicionar cidades importantes (população relevante dentro da área do mapa)
+    nomes, lons, lats, _ = indice_cidades.cidades(lon_centro-delta_lon+0.1, lon_centro+delta_lon-0.1,
+                                                  lat_centro-delta_lat+0.1, lat_centro+delta_lat-0.1, pop_min=100000)
+    for nome, lon, lat in zip(nomes, lons, lats):
+        ax.scatter(lon, lat, color='red', s=30, transform=ccrs.PlateCarree(), label=nome)
+        ax.text(lon, lat + 0.02, nome, fontsize=9, color='black', transform=ccrs.PlateCarree(), ha='center')
+
+    # Adicionar círculo de raio_km ao redor do centro
+    if raio_km:
+        geod = Geodesic()
+        circle = geod.circle(lon=lon_centro, lat=lat_centro, radius=raio_km * 1000, n_samples=100)
+        circle_lons, circle_lats = zip(*circle)
+
+        ax.plot(circle_lons, circle_lats, color='black', linewidth=1.5, transform=ccrs.PlateCarree(), linestyle='dashed', alpha=0.8)
+
+    # Ponto inicial da escala de distância
+    scale_start = (lat_centro - delta_lat * 0.85, lon_centro - delta_lon * 0.7)
+
+    # Ponto final a escala_km de distância para a escala
+    scale_end = geodesic(kilometers=escala_km).destination(scale_start, 90)  # 90° = direção leste
+
+    # Desenhar a escala corretamente
+    ax.plot([scale_start[1], scale_end.longitude], [scale_start[0], scale_end.latitude],
+            color='black', linewidth=3, transform=ccrs.PlateCarree())
+
+    ax.text((scale_start[1] + scale_end.longitude) / 2, scale_start[0] - delta_lat * 0.068,
+            f"{escala_km} km", fontsize=14, color='black', ha='center', transform=ccrs.PlateCarree())
+
+    # Fonte no canto superior direito (o horário é escrito a cada execução logo acima)
+    ax.text(lon_centro+delta_lon*0.8, lat_centro+delta_lat*0.83, "Fonte: RainViewer", fontsize=14, color='black', ha='right')
+
+    # Criar colormap personalizado
+    colors = [cor for _, cor in rain_colors]  # Pegamos apenas as cores da lista
+    positions = [pos for pos, _ in rain_colors]  # Pegamos as posições da lista
+
+    # Criar o colormap corretamente
+    cmap = mcolors.LinearSegmentedColormap.from_list("rain_cmap", list(zip(positions, colors)))
+
+    # Normalizar valores
+    norm = mcolors.Normalize(vmin=0, vmax=1)
+
+    # Criar a barra de cores discreta
+    cbar_ax = fig.add_axes([0.85, 0.3, 0.015, 0.4])  # Mais estreito e menor altura
+    cbar = plt.colorbar(plt.cm.ScalarMappable(norm=norm, cmap=cmap), cax=cbar_ax)
+
+    # Ajustar fonte e espaçamento para um estilo mais discreto
+    cbar.set_label("Intensidade da chuva", fontsize=16)  # Fonte menor
+    cbar.set_ticks([0.2, 0.5, 0.8, 1])  # Menos marcações
+    cbar.set_ticklabels(["", "", "", ""])  # Labels curtos
+    cbar.outline.set_visible(False)  # Remove a borda para ficar mais clean
+
+    # Ajustar título para ficar no topo
+    fig.suptitle(titulo, fontsize=16)
+    plt.subplots_adjust(top=0.95)  # Reduz o espaço superior
+
+    # Camada de baixo: fundo dos eixos, terra, oceano, barra de cores e título
+    camadas_topo = [a for a in ax.get_children() if a.get_zorder() >= 0 and a.get_visible() and a is not ax.patch]
+    camadas_fundo = [a for a in ax.get_children() if a.get_zorder() < 0] + [ax.patch, cbar_ax, fig._suptitle]
+    for artista in camadas_topo:
+        artista.set_visible(False)
+    fundo = _rgba(fig)
+    posicao_hora = fig.transFigure.inverted().transform(ax.transData.transform((lon_centro+delta_lon*0.8, lat_centro+delta_lat*0.91)))
+    caixa = ax.get_window_extent()
+    altura = fundo.shape[0]
+    caixa_radar = (int(round(caixa.x0)), int(round(altura - caixa.y1)), int(round(caixa.x1)), int(round(altura - caixa.y0)))
+
+    # Camada de cima: o que era desenhado sobre o radar, em fundo transparente
+    for artista in camadas_fundo:
+        artista.set_visible(False)
+    for artista in camadas_topo:
+        artista.set_visible(True)
+    fig.patch.set_alpha(0)
+    sobreposicao = _rgba(fig)
+    plt.close(fig)
+
+    return fundo, sobreposicao, caixa_radar, tuple(float(v) for v in posicao_hora)
+
+# Camadas para o centro e a extensão dados: da memória, do disco ou renderizadas
+_memoria = {}
+
+def chave_camadas(lat_centro, lon_centro, delta_lat, delta_lon, titulo=TITULO, raio_km=30, escala_km=20):
+    with open(__file__, 'rb') as f:
+        codigo = f.read()
+    parametros = json.dumps([lat_centro, lon_centro, round(delta_lat, 6), round(delta_lon, 6), titulo, raio_km, escala_km, FIGSIZE, DPI])
+    return hashlib.sha1(codigo + parametros.encode()).hexdigest()[:16]
+
+def obter_camadas(lat_centro, lon_centro, delta_lat, delta_lon, titulo=TITULO, raio_km=30, escala_km=20):
+    chave = chave_camadas(lat_centro, lon_centro, delta_lat, delta_lon, titulo, raio_km, escala_km)
+    if chave in _memoria:
+        return _memoria[chave]
+    arquivo = os.path.join(CACHE_DIR, f"{chave}.npz")
+    if os.path.exists(arquivo):
+        with np.load(arquivo) as dados:
+            camadas = dados['fundo'], dados['sobreposicao'], tuple(dados['caixa_radar']), tuple(dados['posicao_hora'])
+    else:
+        camadas = _renderizar(lat_centro, lon_centro, delta_lat, delta_lon, titulo, raio_km, escala_km)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        fundo, sobreposicao, caixa_radar, posicao_hora = camadas
+        np.savez_compressed(arquivo, fundo=fundo, sobreposicao=sobreposicao,
+                            caixa_radar=np.array(caixa_radar), posicao_hora=np.array(posicao_hora))
+    _memoria[chave] = camadas
+    return camadas
+
+# Composição "over" de imagens RGBA (float, 0-1) sobre outras, in-place no destino
+def _sobrepor(destino, origem, alpha=1.0):
+    a = origem[..., 3:4] * alpha
+    destino[..., :3] = origem[..., :3] * a + destino[..., :3] * (1 - a)
+
+# Compõe fundo, radares (redimensionados para a caixa do mapa) e sobreposição para
+# vários quadros de uma vez: a composição é feita sobre a pilha (quadros, linhas,
+# colunas, canais) inteira. Os radares podem ser imagens PIL ou arrays RGBA.
+def compor_quadros(camadas, radares, alpha=ALPHA_RADAR):
+    fundo, sobreposicao, (x0, y0, x1, y1), _ = camadas
+    radares = np.stack([np.asarray(Image.fromarray(np.asarray(r)).convert('RGBA').resize((x1 - x0, y1 - y0), Image.BILINEAR))
+                        for r in radares]).astype(np.float32) / 255
+    imagens = np.repeat(fundo[np.newaxis].astype(np.float32) / 255, len(radares), axis=0)
+    _sobrepor(imagens[:, y0:y1, x0:x1], radares, alpha)
+    _sobrepor(imagens, sobreposicao.astype(np.float32) / 255)
+    return (imagens[..., :3] * 255 + 0.5).astype(np.uint8)
+
+def compor(camadas, radar_image, alpha=ALPHA_RADAR):
+    return compor_quadros(camadas, [radar_image], alpha)[0]
+
+# Salva a imagem composta com o horário do radar
+def salvar(imagem, camadas, texto_hora, arquivo):
+    fig = plt.figure(figsize=FIGSIZE, dpi=DPI)
+    fig.figimage(imagem, 0, 0, origin='upper')
+    fig.text(*camadas[3], texto_hora, fontsize=14, color='black', ha='right')
+    renderizacao.salvar_figura(fig, arquivo, dpi=DPI)
+    plt.close(fig)
+
+# Salva os quadros compostos como GIF animado. O horário de cada quadro é escrito
+# com o PIL, na mesma posição e fonte do radar.png, sem montar uma figura por quadro.
+def salvar_animacao(imagens, camadas, textos_hora, arquivo, duracao=500, pausa_final=1500):
+    from matplotlib import font_manager
+    from PIL import ImageDraw, ImageFont
+    fonte = ImageFont.truetype(font_manager.findfont('DejaVu Sans'), round(14 * DPI / 72))
+    altura, largura = imagens.shape[1:3]
+    x, y = camadas[3][0] * largura, (1 - camadas[3][1]) * altura
+    quadros = []
+    for imagem, texto in zip(imagens, textos_hora):
+        quadro = Image.fromarray(imagem)
+        ImageDraw.Draw(quadro).text((x, y), texto, font=fonte, fill='black', anchor='rs')
+        quadros.append(quadro.quantize(colors=256, method=Image.Quantize.MEDIANCUT))
+    duracoes = [duracao] * (len(quadros) - 1) + [pausa_final]
+    renderizacao.salvar_atomico(arquivo, lambda temporario: quadros[0].save(
+        temporario, save_all=True, append_images=quadros[1:], duration=duracoes, loop=0, optimize=True))
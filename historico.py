@@ -0,0 +1,119 @@
+# Armazenamento permanente das observações, particionado por mês
+#
+# Cada mês (no horário de Brasília) é um CSV em <diretorio>/AAAA-MM.csv. As
+# linhas só são acrescentadas ao fim do arquivo, em ordem de tempo, então gravar
+# uma observação custa o mesmo com 1 dia ou 10 anos de histórico, e uma consulta
+# por janela ("últimas 24 h", "este mês") só abre as partições que a cobrem.
+# Dados antigos recuperados depois (recuperar_lacunas.py) entram com mesclar,
+# que regrava só os meses afetados, mantendo cada partição ordenada.
+import os
+import numpy as np
+import pandas as pd
+
+FUSO = "America/Sao_Paulo"
+FORMATO_DATA = '%Y-%m-%d %H:%M:%S%z'
+
+class ArmazemParticionado:
+    def __init__(self, diretorio, coluna_tempo='Timestamp'):
+        self.diretorio = diretorio
+        self.coluna_tempo = coluna_tempo
+
+    def _arquivo(self, mes):
+        return os.path.join(self.diretorio, f"{mes}.csv")
+
+    # Meses (AAAA-MM) com dados, em ordem
+    def particoes(self):
+        if not os.path.isdir(self.diretorio):
+            return []
+        return sorted(nome[:-4] for nome in os.listdir(self.diretorio) if nome.endswith('.csv'))
+
+    def vazio(self):
+        return not self.particoes()
+
+    def _ler_particao(self, mes):
+        df = pd.read_csv(self._arquivo(mes))
+        df[self.coluna_tempo] = pd.to_datetime(df[self.coluna_tempo], utc=True).dt.tz_convert(FUSO)
+        return df
+
+    # Acrescenta as linhas (já em ordem de tempo) ao fim das partições correspondentes
+    def anexar(self, df):
+        os.makedirs(self.diretorio, exist_ok=True)
+        tempos = pd.to_datetime(df[self.coluna_tempo], utc=True).dt.tz_convert(FUSO)
+        df = df.assign(**{self.coluna_tempo: tempos})
+        for mes, parte in df.groupby(tempos.dt.strftime('%Y-%m'), sort=True):
+            arquivo = self._arquivo(mes)
+            parte.to_csv(arquivo, mode='a', header=not os.path.exists(arquivo), index=False, date_format=FORMATO_DATA)
+
+    # Junta linhas de qualquer época às partições (ao contrário de anexar, que só
+    # acrescenta ao fim): cada mês afetado é lido uma vez, unido às linhas novas sem
+    # repetir tempos (fica a linha já gravada), ordenado e regravado de uma só vez
+    # num arquivo temporário que substitui o original. Repetir a mesma carga não
+    # muda nada. Devolve o número de linhas novas.
+    def mesclar(self, df):
+        os.makedirs(self.diretorio, exist_ok=True)
+        tempos = pd.to_datetime(df[self.coluna_tempo], utc=True).dt.tz_convert(FUSO)
+        df = df.assign(**{self.coluna_tempo: tempos})
+        novas = 0
+        for mes, parte in df.groupby(tempos.dt.strftime('%Y-%m'), sort=True):
+            arquivo = self._arquivo(mes)
+            atual = self._ler_particao(mes) if os.path.exists(arquivo) else parte.iloc[:0]
+            unido = pd.concat([atual, parte], ignore_index=True).drop_duplicates(self.coluna_tempo, keep='first')
+            if len(unido) == len(atual):
+                continue
+            novas += len(unido) - len(atual)
+            temporario = f"{arquivo}.{os.getpid()}.tmp"
+            unido.sort_values(self.coluna_tempo, kind='stable').to_csv(temporario, index=False, date_format=FORMATO_DATA)
+            os.replace(temporario, arquivo)
+        return novas
+
+    # Observações com inicio <= tempo < fim; só lê as partições do intervalo
+    def ler(self, inicio, fim=None):
+        inicio = pd.Timestamp(inicio).tz_convert(FUSO)
+        fim = pd.Timestamp.now(tz=FUSO) + pd.Timedelta(days=1) if fim is None else pd.Timestamp(fim).tz_convert(FUSO)
+        primeiro, ultimo = inicio.strftime('%Y-%m'), fim.strftime('%Y-%m')
+        meses = [mes for mes in self.particoes() if primeiro <= mes <= ultimo]
+        if not meses:
+            return pd.DataFrame(columns=[self.coluna_tempo])
+        df = pd.concat([self._ler_particao(mes) for mes in meses], ignore_index=True)
+        # As partições estão ordenadas, então o recorte é uma busca binária
+        tempos = df[self.coluna_tempo].values
+        a, b = tempos.searchsorted(inicio.to_datetime64()), tempos.searchsorted(fim.to_datetime64())
+        return df.iloc[a:b].reset_index(drop=True)
+
+    # Tempo da observação mais recente, ou None se o armazenamento estiver vazio
+    def ultimo_tempo(self):
+        particoes = self.particoes()
+        if not particoes:
+            return None
+        df = self._ler_particao(particoes[-1])
+        return df[self.coluna_tempo].iloc[-1] if len(df) else None
+
+# Chuva registrada entre cada amostra e a anterior com valor, a partir do
+# acumulado diário da estação (precipTotal). O acumulador zera à meia-noite: há
+# recomeço quando o valor cai ou quando o dia (horário de Brasília) mudou desde
+# a amostra anterior, o que cobre a virada dentro de uma lacuna; no recomeço,
+# todo o acumulado é chuva nova. Amostras sem valor contam 0 e não interrompem
+# a diferença, e a primeira amostra também conta 0 (não há com o que comparar).
+# É a mesma conta para os resumos diários e para o painel de 24 h.
+def incrementos_chuva(tempos, precip):
+    precip = pd.to_numeric(pd.Series(precip), errors='coerce').to_numpy(dtype=float)
+    dias = pd.DatetimeIndex(pd.to_datetime(tempos, utc=True)).tz_convert(FUSO).normalize().as_unit('ns').asi8
+    validos = ~np.isnan(precip)
+    incrementos = np.zeros(len(precip))
+    valores, dias = precip[validos], dias[validos]
+    if len(valores):
+        diferenca = np.diff(valores, prepend=np.nan)
+        recomeco = (diferenca < 0) | (np.diff(dias, prepend=dias[:1]) != 0)
+        incrementos[validos] = np.nan_to_num(np.where(recomeco, valores, diferenca))
+    return incrementos
+
+# Mínima, máxima e média da temperatura, chuva total e número de amostras de cada
+# dia (meia-noite a meia-noite no horário de Brasília), numa única agregação.
+# Para que a chuva do início de um dia seja contada, df deve começar com alguma
+# amostra do dia anterior; esse primeiro dia parcial também aparece no resultado.
+def agregados_diarios(df, coluna_tempo='Timestamp'):
+    dias = df[coluna_tempo].dt.tz_convert(FUSO).dt.date
+    tabela = pd.DataFrame({'Date': dias, 'Temperature': df['Temperature'], 'Chuva': incrementos_chuva(df[coluna_tempo], df['Precip'])})
+    return tabela.groupby('Date').agg(MinTemp=('Temperature', 'min'), MaxTemp=('Temperature', 'max'),
+                                      AvgTemp=('Temperature', 'mean'), Precip=('Chuva', 'sum'),
+                                      Amostras=('Temperature', 'count'))
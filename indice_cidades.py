@@ -0,0 +1,119 @@
+# Índice espacial das cidades do Natural Earth (populated_places)
+#
+# Percorrer os ~7 mil registros do shapefile a cada mapa, testando extensão e
+# população linha a linha, custa mais que o resto do desenho das cidades. Aqui o
+# shapefile é lido uma única vez e guardado em arrays NumPy (longitude, latitude,
+# população e nome), ordenados por célula de uma grade de GRADE graus. Para cada
+# célula guarda-se onde começam os seus registros, de modo que uma consulta só
+# examina as células que cruzam a extensão pedida, com filtros vetorizados.
+# O índice serve para qualquer extensão e qualquer limite de população.
+import hashlib
+import os
+import time
+import numpy as np
+
+CACHE_DIR = os.getenv('INDICE_CIDADES_DIR', os.path.join('.cache', 'indice_cidades'))
+GRADE = 1.0  # graus
+COLUNAS_GRADE = int(360 / GRADE)
+LINHAS_GRADE = int(180 / GRADE)
+
+def _celula(lon, lat):
+    coluna = np.clip(((np.asarray(lon) + 180) // GRADE).astype(np.int64), 0, COLUNAS_GRADE - 1)
+    linha = np.clip(((np.asarray(lat) + 90) // GRADE).astype(np.int64), 0, LINHAS_GRADE - 1)
+    return linha * COLUNAS_GRADE + coluna
+
+class IndiceCidades:
+    def __init__(self, lon, lat, pop, nomes):
+        # Registros ordenados pela célula da grade; inicio[c]:inicio[c + 1] são os da célula c
+        celulas = _celula(lon, lat)
+        ordem = np.argsort(celulas, kind='stable')
+        self.lon = np.asarray(lon, dtype=np.float64)[ordem]
+        self.lat = np.asarray(lat, dtype=np.float64)[ordem]
+        self.pop = np.asarray(pop, dtype=np.int64)[ordem]
+        self.nomes = np.asarray(nomes, dtype=str)[ordem]
+        self.inicio = np.searchsorted(celulas[ordem], np.arange(COLUNAS_GRADE * LINHAS_GRADE + 1))
+
+    # Lê o shapefile com o leitor do cartopy
+    @classmethod
+    def do_shapefile(cls, shapefile):
+        import cartopy.io.shapereader as shpreader
+        lon, lat, pop, nomes = [], [], [], []
+        for city in shpreader.Reader(shapefile).records():
+            lon.append(city.geometry.x)
+            lat.append(city.geometry.y)
+            pop.append(city.attributes['POP_MAX'])
+            nomes.append(city.attributes['NAME'])
+        return cls(lon, lat, pop, nomes)
+
+    def salvar(self, arquivo):
+        os.makedirs(os.path.dirname(arquivo) or '.', exist_ok=True)
+        np.savez(arquivo, lon=self.lon, lat=self.lat, pop=self.pop, nomes=self.nomes, inicio=self.inicio)
+
+    @classmethod
+    def carregar(cls, arquivo):
+        indice = cls.__new__(cls)
+        with np.load(arquivo) as dados:
+            indice.lon, indice.lat, indice.pop = dados['lon'], dados['lat'], dados['pop']
+            indice.nomes, indice.inicio = dados['nomes'], dados['inicio']
+        return indice
+
+    # Posições (no arrays ordenados) dos registros nas células que cruzam a extensão
+    def _candidatos(self, lon_min, lon_max, lat_min, lat_max):
+        celulas = _celula([lon_min, lon_max], [lat_min, lat_max])
+        (l0, l1), (c0, c1) = celulas // COLUNAS_GRADE, celulas % COLUNAS_GRADE
+        faixas = [np.arange(self.inicio[linha * COLUNAS_GRADE + c0], self.inicio[linha * COLUNAS_GRADE + c1 + 1])
+                  for linha in range(l0, l1 + 1)]
+        return np.concatenate(faixas) if faixas else np.empty(0, dtype=np.int64)
+
+    # Cidades dentro da extensão (limites inclusivos) com população acima de pop_min,
+    # em ordem decrescente de população: arrays de nomes, longitudes, latitudes e populações
+    def consultar(self, lon_min, lon_max, lat_min, lat_max, pop_min=0):
+        i = self._candidatos(lon_min, lon_max, lat_min, lat_max)
+        lon, lat, pop = self.lon[i], self.lat[i], self.pop[i]
+        dentro = (lon >= lon_min) & (lon <= lon_max) & (lat >= lat_min) & (lat <= lat_max) & (pop > pop_min)
+        i = i[dentro][np.argsort(-pop[dentro], kind='stable')]
+        return self.nomes[i], self.lon[i], self.lat[i], self.pop[i]
+
+_memoria = {}
+
+# Índice de um shapefile, da memória, do disco ou construído na hora. O arquivo em
+# cache é identificado pelo caminho, tamanho e data de modificação do shapefile.
+def obter_indice(shapefile):
+    estado = os.stat(shapefile)
+    chave = hashlib.sha1(f"{os.path.abspath(shapefile)}|{estado.st_size}|{estado.st_mtime_ns}".encode()).hexdigest()[:16]
+    if chave not in _memoria:
+        arquivo = os.path.join(CACHE_DIR, f"{chave}.npz")
+        if os.path.exists(arquivo):
+            _memoria[chave] = IndiceCidades.carregar(arquivo)
+        else:
+            _memoria[chave] = IndiceCidades.do_shapefile(shapefile)
+            _memoria[chave].salvar(arquivo)
+    return _memoria[chave]
+
+# Cidades do populated_places (escala 10m) dentro da extensão, como no mapa do radar
+def cidades(lon_min, lon_max, lat_min, lat_max, pop_min=0):
+    import cartopy.io.shapereader as shpreader
+    shapefile = shpreader.natural_earth(resolution='10m', category='cultural', name='populated_places')
+    return obter_indice(shapefile).consultar(lon_min, lon_max, lat_min, lat_max, pop_min)
+
+# Compara a consulta pelo índice com a varredura linha a linha do shapefile
+if __name__ == '__main__':
+    import cartopy.io.shapereader as shpreader
+    shapefile = shpreader.natural_earth(resolution='10m', category='cultural', name='populated_places')
+    extensao = (-50.5, -48.1, -26.6, -24.2)
+
+    inicio = time.perf_counter()
+    varredura = [city.attributes['NAME'] for city in shpreader.Reader(shapefile).records()
+                 if extensao[0] <= city.geometry.x <= extensao[1] and extensao[2] <= city.geometry.y <= extensao[3]
+                 and city.attributes['POP_MAX'] > 100000]
+    tempo_varredura = time.perf_counter() - inicio
+
+    indice = obter_indice(shapefile)
+    repeticoes = 1000
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        nomes = indice.consultar(*extensao, pop_min=100000)[0]
+    tempo_indice = (time.perf_counter() - inicio) / repeticoes
+
+    print(f"Varredura: {tempo_varredura * 1000:.1f} ms ({len(varredura)} cidades)")
+    print(f"Índice: {tempo_indice * 1e6:.0f} µs ({len(nomes)} cidades)")
@@ -0,0 +1,109 @@
+# Interpolação das temperaturas das estações numa grade regular (IDW)
+#
+# Cada célula da grade recebe a média das temperaturas das K estações mais próximas,
+# ponderada pelo inverso da distância elevado a POTENCIA. A parte cara (distâncias
+# de todas as células a todas as estações e a escolha das K mais próximas com
+# np.argpartition) só depende das posições das estações e da grade, e não das
+# temperaturas: os vizinhos e pesos ficam guardados em memória e em CACHE_DIR e
+# são reaproveitados enquanto o conjunto de estações não muda. O diretório segue
+# o limite de tamanho e o descarte dos menos usados do cache_http. Estações sem
+# temperatura numa hora não invalidam os pesos: os pesos delas são zerados e os
+# demais renormalizados. Com 100+ estações, a interpolação de cada hora é um
+# produto de matrizes pequenas.
+import hashlib
+import os
+import time
+import numpy as np
+import cache_http
+
+CACHE_DIR = os.getenv('INTERPOLACAO_DIR', os.path.join('.cache', 'interpolacao'))
+RESOLUCAO = 500  # m, tamanho da célula da grade (Web Mercator)
+MARGEM = 3000  # m, em volta das estações
+K = 8  # Estações usadas em cada célula
+POTENCIA = 2
+DIST_MAX = 8000  # m; células mais longe que isso da estação mais próxima ficam vazias
+TAMANHO_MAX = cache_http.TAMANHO_MAX  # Limite de CACHE_DIR
+
+# Eixos x e y (centros das células) de uma grade que cobre os pontos com uma margem
+def grade_para(x, y, resolucao=RESOLUCAO, margem=MARGEM):
+    x0 = np.floor((np.nanmin(x) - margem) / resolucao) * resolucao
+    x1 = np.ceil((np.nanmax(x) + margem) / resolucao) * resolucao
+    y0 = np.floor((np.nanmin(y) - margem) / resolucao) * resolucao
+    y1 = np.ceil((np.nanmax(y) + margem) / resolucao) * resolucao
+    return np.arange(x0, x1, resolucao) + resolucao / 2, np.arange(y0, y1, resolucao) + resolucao / 2
+
+class InterpoladorIDW:
+    def __init__(self, x, y, eixo_x, eixo_y, k=K, potencia=POTENCIA):
+        self.eixo_x, self.eixo_y = eixo_x, eixo_y
+        k = min(k, len(x))
+        gx, gy = np.meshgrid(eixo_x, eixo_y)
+        dx = gx.reshape(-1, 1) - np.asarray(x, dtype=float)[np.newaxis, :]
+        dy = gy.reshape(-1, 1) - np.asarray(y, dtype=float)[np.newaxis, :]
+        distancias = np.hypot(dx, dy)  # (células, estações)
+
+        # K estações mais próximas de cada célula, sem ordenar a linha inteira
+        vizinhos = np.argpartition(distancias, k - 1, axis=1)[:, :k]
+        d = np.take_along_axis(distancias, vizinhos, axis=1)
+        self.vizinhos = vizinhos.astype(np.int32)
+        self.pesos = 1 / np.maximum(d, 1.0) ** potencia
+        self.fora = d.min(axis=1) > DIST_MAX
+
+    def salvar(self, arquivo):
+        os.makedirs(os.path.dirname(arquivo) or '.', exist_ok=True)
+        np.savez(arquivo, eixo_x=self.eixo_x, eixo_y=self.eixo_y, vizinhos=self.vizinhos, pesos=self.pesos, fora=self.fora)
+
+    @classmethod
+    def carregar(cls, arquivo):
+        interpolador = cls.__new__(cls)
+        with np.load(arquivo) as dados:
+            for nome in ['eixo_x', 'eixo_y', 'vizinhos', 'pesos', 'fora']:
+                setattr(interpolador, nome, dados[nome])
+        return interpolador
+
+    # Grade (linhas = eixo_y, colunas = eixo_x) interpolada a partir dos valores
+    # das estações, na mesma ordem das posições; NaN onde não há estação próxima
+    def interpolar(self, valores):
+        valores = np.asarray(valores, dtype=float)[self.vizinhos]
+        validos = ~np.isnan(valores)
+        pesos = np.where(validos, self.pesos, 0.0)
+        soma_pesos = pesos.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            grade = (pesos * np.where(validos, valores, 0.0)).sum(axis=1) / soma_pesos
+        grade[self.fora | (soma_pesos == 0)] = np.nan
+        return grade.reshape(len(self.eixo_y), len(self.eixo_x))
+
+_memoria = {}
+
+# Interpolador para as posições dadas (Web Mercator), da memória, do disco ou calculado
+def obter_interpolador(x, y, resolucao=RESOLUCAO, k=K, potencia=POTENCIA):
+    x, y = np.round(np.asarray(x, dtype=float)), np.round(np.asarray(y, dtype=float))
+    chave = hashlib.sha1(np.concatenate([x, y, [resolucao, k, potencia, MARGEM, DIST_MAX]]).tobytes()).hexdigest()[:16]
+    if chave not in _memoria:
+        arquivo = os.path.join(CACHE_DIR, f"{chave}.npz")
+        if os.path.exists(arquivo):
+            _memoria[chave] = InterpoladorIDW.carregar(arquivo)
+            cache_http.tocar(arquivo)
+        else:
+            eixo_x, eixo_y = grade_para(x, y, resolucao)
+            _memoria[chave] = InterpoladorIDW(x, y, eixo_x, eixo_y, k, potencia)
+            _memoria[chave].salvar(arquivo)
+            cache_http.limitar_diretorio(CACHE_DIR, TAMANHO_MAX, manter=[arquivo])
+    return _memoria[chave]
+
+# Tempo para montar os pesos e para interpolar, com estações sintéticas na região de Curitiba
+if __name__ == '__main__':
+    import mapa_base
+    rng = np.random.default_rng(0)
+    for n in [33, 150]:
+        x, y = mapa_base.para_web_mercator(rng.uniform(-49.6, -49.0, n), rng.uniform(-25.7, -25.2, n))
+        temperaturas = rng.normal(20, 3, n)
+        inicio = time.perf_counter()
+        eixo_x, eixo_y = grade_para(x, y)
+        interpolador = InterpoladorIDW(x, y, eixo_x, eixo_y)
+        montagem = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        for _ in range(100):
+            interpolador.interpolar(temperaturas)
+        interpolacao = (time.perf_counter() - inicio) / 100
+        print(f"{n} estações, grade {len(eixo_x)}x{len(eixo_y)}: pesos em {montagem * 1000:.0f} ms, "
+              f"interpolação em {interpolacao * 1000:.1f} ms")
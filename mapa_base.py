@@ -0,0 +1,65 @@
+# Mapa de fundo (tiles) em cache, já na projeção Web Mercator
+#
+# O ctx.add_basemap baixa e costura os mesmos tiles do CartoDB a cada hora, embora
+# a região só mude quando muda o conjunto de estações. Aqui a imagem costurada e a
+# sua extensão ficam salvas em disco, identificadas pelo provedor, zoom e extensão.
+# A extensão pedida é arredondada para uma grade de GRADE metros, para que pequenas
+# variações nos limites do gráfico (uma estação a mais ou a menos na borda) usem a
+# mesma imagem. Sem mudança nas estações, o mapa não baixa nenhum tile.
+import hashlib
+import os
+import numpy as np
+
+CACHE_DIR = os.getenv('MAPA_BASE_DIR', os.path.join('.cache', 'mapa_base'))
+GRADE = 5000  # m
+RAIO_TERRA = 6378137.0  # m, esfera usada pelo Web Mercator (EPSG:3857)
+
+_memoria = {}
+
+# Converte longitude/latitude (graus) para x/y em Web Mercator (m), sem pyproj
+def para_web_mercator(lon, lat):
+    lon = np.radians(np.asarray(lon, dtype=float))
+    lat = np.radians(np.asarray(lat, dtype=float))
+    return RAIO_TERRA * lon, RAIO_TERRA * np.log(np.tan(np.pi / 4 + lat / 2))
+
+# Inversa de para_web_mercator: x/y (m) para longitude/latitude (graus)
+def de_web_mercator(x, y):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    return np.degrees(x / RAIO_TERRA), np.degrees(2 * np.arctan(np.exp(y / RAIO_TERRA)) - np.pi / 2)
+
+# Imagem RGBA e extensão (xmin, xmax, ymin, ymax) cobrindo os limites pedidos
+def obter_mapa_base(xmin, xmax, ymin, ymax, source, zoom='auto'):
+    w, s = np.floor(xmin / GRADE) * GRADE, np.floor(ymin / GRADE) * GRADE
+    e, n = np.ceil(xmax / GRADE) * GRADE, np.ceil(ymax / GRADE) * GRADE
+    nome = getattr(source, 'name', str(source))
+    chave = hashlib.sha1(f"{nome}|{zoom}|{w:.0f}|{s:.0f}|{e:.0f}|{n:.0f}".encode()).hexdigest()[:16]
+    if chave in _memoria:
+        return _memoria[chave]
+
+    arquivo = os.path.join(CACHE_DIR, f"{chave}.npz")
+    if os.path.exists(arquivo):
+        with np.load(arquivo) as dados:
+            resultado = dados['imagem'], tuple(dados['extensao'])
+    else:
+        import contextily as ctx
+        imagem, extensao = ctx.bounds2img(w, s, e, n, zoom=zoom, source=source, ll=False)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        np.savez_compressed(arquivo, imagem=imagem, extensao=np.array(extensao))
+        resultado = imagem, tuple(extensao)
+    _memoria[chave] = resultado
+    return resultado
+
+# Substitui o ctx.add_basemap para eixos em EPSG:3857. Como no add_basemap, a
+# atribuição exigida pelo provedor (OpenStreetMap, CARTO...) é escrita no mapa;
+# attribution=False a omite e um texto a substitui.
+def desenhar_mapa_base(ax, source, zoom='auto', attribution=None):
+    xmin, xmax, ymin, ymax = ax.axis()
+    imagem, extensao = obter_mapa_base(xmin, xmax, ymin, ymax, source, zoom)
+    ax.imshow(imagem, extent=extensao, interpolation='bilinear')
+    ax.axis((xmin, xmax, ymin, ymax))
+    if attribution is None:
+        attribution = source.get('attribution', '') if hasattr(source, 'get') else ''
+    if attribution:
+        import contextily as ctx
+        ctx.add_attribution(ax, attribution)
@@ -1,103 +1,59 @@
-import requests
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 import pytz
-import json
 import geopandas as gpd
 from matplotlib.colors import ListedColormap, Normalize
 import contextily as ctx
 from datetime import datetime
 import os
+import sys
+import busca_estacoes
+import controle_qualidade
+import interpolacao
+import mapa_base
+import registro_estacoes
+import renderizacao
+import serie_estacoes
 
 # Fuso horário de Brasília
 brasilia_tz = pytz.timezone("America/Sao_Paulo")
 
-# Função para buscar os dados da API do WU
-def get_station_temperature(station_id):
-    WU_API_KEY = os.getenv('API_KEY') # JAMAIS COMPARTILHAR ESSA API KEY
-    url = f"http://api.weather.com/v2/pws/observations/current?stationId={station_id}&format=json&units=m&numericPrecision=decimal&apiKey={WU_API_KEY}"
-    response = requests.get(url)
-    # Check the status code of the response
-    if response.status_code == 200:
-        try:
-            data = response.json()
-            if 'observations' in data and len(data['observations']) > 0:
-                observation = data['observations'][0]
-                temp = observation.get('metric', {}).get('temp', np.nan)
-                if temp is None or (isinstance(temp, float) and np.isnan(temp)):
-                    print(f"Station {station_id} with no data")
-                    return None, None, None
-                else:
-                    return temp, observation['lat'], observation['lon']
-            else:
-                print(f"No observations found for station {station_id}")
-                return None, None, None
-        except ValueError:
-            print(f"Invalid JSON response for station {station_id}: {response.text}")
-            return None, None, None
-    else:
-        print(f"Station is offline: {station_id}")
-        return None, None, None
-
-# Ler o arquivo de estações
-with open('estacoes.txt', 'r') as f:
-    stations = [line.strip() for line in f.readlines()]
-
-# Dados de saída
-temperatures = []
-latitudes = []
-longitudes = []
-estacoes = []
-
-hora = datetime.now(brasilia_tz).strftime("%d/%b/%Y %H:%M")
-hora_num = datetime.now(brasilia_tz).hour
-
-# Pega dados das estações suspeitas só se for à noite.
-if 5 <= hora_num <= 19:
-    for station in stations[:24]:
-        temp, lat, lon = get_station_temperature(station)
-        estacoes.append(station)
-        temperatures.append(temp if temp is not None else np.nan)  # Aceitar np.nan
-        latitudes.append(lat)
-        longitudes.append(lon)
-else:
-    for station in stations:
-        temp, lat, lon = get_station_temperature(station)
-        estacoes.append(station)
-        temperatures.append(temp if temp is not None else np.nan)  # Aceitar np.nan
-        latitudes.append(lat)
-        longitudes.append(lon)
+# Cadastro das estações: IDs, correções de posição e rótulos
+registro = registro_estacoes.obter_registro()
+
+agora = datetime.now(brasilia_tz)
+hora = agora.strftime("%d/%b/%Y %H:%M")
+hora_num = agora.hour
+
+# Estações do cadastro para esta hora, menos as suspensas pelo controle de qualidade
+qualidade = controle_qualidade.ControleQualidade()
+stations = qualidade.a_buscar(registro_estacoes.selecionar(registro, hora_num).index, agora)
 
 # Criar o DataFrame
-dados = pd.DataFrame({
-    'Estacao': estacoes,
-    'Temperatura': temperatures,
-    'Latitude': latitudes,
-    'Longitude': longitudes,
-    'Hora': [hora] * len(estacoes)  # Adiciona a mesma hora para todas as linhas
-})
-
-# Corrige a posição de Bocaiúva
-dados.at[10, 'Latitude'] = -25.27
-dados.at[10, 'Longitude'] = -49.11
-
-# Corrige a posição de Balsa Nova
-dados.at[15, 'Latitude'] = -25.49
-dados.at[15, 'Longitude'] = -49.49
-
-# Corrige a posição de Lapa
-dados.at[16, 'Latitude'] = -25.57
-dados.at[16, 'Longitude'] = -49.49
-
-# Corrige a posição de Borda do Campo
-dados.at[20, 'Latitude'] = -25.41
-dados.at[20, 'Longitude'] = -49.08
-
-if len(dados) > 24:
-    # Corrige a posição de Vista Alegre
-    dados.at[25, 'Latitude'] = -25.40
-    dados.at[25, 'Longitude'] = -49.31
+dados = busca_estacoes.buscar_estacoes(stations, hora)
+
+# Corrige as posições que o cadastro sobrescreve (Bocaiúva, Balsa Nova, Lapa...)
+dados['Latitude'], dados['Longitude'] = registro_estacoes.posicionar(registro, dados['Estacao'], dados['Latitude'], dados['Longitude'])
+
+# Controle de qualidade: leituras reprovadas e estações com nota baixa ficam fora do mapa
+falhas = qualidade.verificar(dados, agora)
+no_mapa = qualidade.atualizar(dados, falhas, agora)
+qualidade.salvar()
+print(qualidade.resumo(falhas, no_mapa))
+
+# Toda consulta fica na série histórica das estações, mesmo sem nova figura
+serie_estacoes.SerieEstacoes().gravar(agora, dados, no_mapa)
+dados.loc[~no_mapa, 'Temperatura'] = np.nan  # Tratadas como estações sem dado
+
+# Mesmas estações, posições e temperaturas da última figura: nada a redesenhar
+digest = renderizacao.impressao_digital(dados[['Estacao', 'Temperatura', 'Latitude', 'Longitude']],
+                                       registro.reset_index(),
+                                       script=[__file__, interpolacao.__file__, mapa_base.__file__,
+                                               registro_estacoes.__file__, controle_qualidade.__file__])
+if renderizacao.inalterado('mapa.png', digest):
+    print("Temperaturas sem mudanças; mapa.png mantido.")
+    sys.exit(0)
 
 # Definir o colormap baseado na temperatura
 c1 = plt.cm.Purples(np.linspace(0, 1, 50))
@@ -111,15 +67,29 @@ ctx.providers.keys()  # This will trigger the initialization
 
 # Criação do gráfico usando matplotlib diretamente
 fig, ax = plt.subplots(1, 1, figsize=(10, 7))
-gdf = gpd.GeoDataFrame(dados, geometry=gpd.points_from_xy(dados.Longitude, dados.Latitude), crs="EPSG:4326")
-gdf = gdf.to_crs(epsg=3857)  # Convertendo para o CRS usado pelo contextily
+x, y = mapa_base.para_web_mercator(dados.Longitude, dados.Latitude)  # CRS usado pelos tiles
+gdf = gpd.GeoDataFrame(dados, geometry=gpd.points_from_xy(x, y), crs="EPSG:3857")
 
 norm = Normalize(vmin=-10, vmax=45)  # Definindo os limites do colormap
 
 sc = ax.scatter(gdf.geometry.x, gdf.geometry.y, c=gdf['Temperatura'], cmap=custom_colormap, s=700, edgecolor='k', linewidth=0, norm=norm)
 
-# Adicionando o mapa de fundo
-ctx.add_basemap(ax, source=ctx.providers.CartoDB.Positron, crs=gdf.crs)  # Changed provider
+# Adicionando o mapa de fundo (do cache em disco; tiles só são baixados se a região mudar)
+mapa_base.desenhar_mapa_base(ax, source=ctx.providers.CartoDB.Positron)  # Changed provider
+
+# Superfície de temperatura interpolada (IDW) entre o mapa de fundo e os marcadores.
+# Os pesos só são recalculados quando muda o conjunto de estações com posição.
+posicionadas = gdf[np.isfinite(gdf.geometry.x) & np.isfinite(gdf.geometry.y)]
+if posicionadas['Temperatura'].notna().sum() >= 3:
+    limites = ax.axis()
+    interpolador = interpolacao.obter_interpolador(posicionadas.geometry.x, posicionadas.geometry.y)
+    superficie = interpolador.interpolar(posicionadas['Temperatura'])
+    meia_celula = interpolacao.RESOLUCAO / 2
+    extensao = [interpolador.eixo_x[0] - meia_celula, interpolador.eixo_x[-1] + meia_celula,
+                interpolador.eixo_y[0] - meia_celula, interpolador.eixo_y[-1] + meia_celula]
+    ax.imshow(superficie, extent=extensao, origin='lower', cmap=custom_colormap, norm=norm,
+              alpha=0.4, interpolation='bilinear', zorder=0.5)
+    ax.axis(limites)  # Mantém o enquadramento dado pelas estações
 
 # Adicionando títulos e labels
 plt.figtext(0.5, 1.00, f"Temperaturas em Curitiba e região - Atualizado em {hora}", fontsize=18, ha='center')
@@ -135,81 +105,21 @@ ax.set_yticks([])
 
 # Adicionando textos ao mapa
 plt.figtext(0.5, 0.00, f"Atualizado a cada 1 hora", fontsize=10, ha='center')
-for idx, row in gdf.iterrows():
-    if not np.isnan(row['Temperatura']):
-        if idx in [0]:
-            ax.text(row.geometry.x - 100, row.geometry.y + 1500, f"Barigui", color='black', va='center', ha='center', fontsize=8, weight='bold')
-        elif idx in [1]:
-            ax.text(row.geometry.x, row.geometry.y + 1500, f"INMET", color='black', va='center', ha='center', fontsize=12, weight='bold')
-        elif idx in [2]:
-            ax.text(row.geometry.x + 250, row.geometry.y + 1500, f"Bateias", color='black', va='center', ha='center', fontsize=8, weight='bold')
-        elif idx in [3]:
-            ax.text(row.geometry.x, row.geometry.y - 1500, f"Capão Raso", color='black', va='center', ha='center', fontsize=8, weight='bold')
-        elif idx in [4]:
-            ax.text(row.geometry.x, row.geometry.y - 1500, f"S J Pinhais", color='black', va='center', ha='center', fontsize=8, weight='bold')
-        elif idx in [5]:
-            ax.text(row.geometry.x, row.geometry.y - 1500, f"Boa Vista", color='black', va='center', ha='center', fontsize=8, weight='bold')
-        elif idx in [6]:
-            ax.text(row.geometry.x, row.geometry.y + 1500, f"Cachoeira", color='black', va='center', ha='center', fontsize=8, weight='bold')
-        elif idx in [7]:
-            ax.text(row.geometry.x, row.geometry.y + 1500, f"Ganchinho", color='black', va='center', ha='center', fontsize=8, weight='bold')
-        elif idx in [8]:
-            ax.text(row.geometry.x - 1000, row.geometry.y - 1500, f"C Comprido", color='black', va='center', ha='center', fontsize=8, weight='bold')
-        elif idx in [9]:
-            ax.text(row.geometry.x, row.geometry.y - 1500, f"Seminário", color='black', va='center', ha='center', fontsize=8, weight='bold')
-        elif idx in [10]:
-            ax.text(row.geometry.x - 500, row.geometry.y - 1500, f"↑ Bocaiúva do Sul", color='black', va='center', ha='center',fontsize=10, weight='bold')
-        elif idx in [11]:
-            ax.text(row.geometry.x, row.geometry.y - 1500, f"Novo Mundo", color='black', va='center', ha='center', fontsize=8, weight='bold')
-        elif idx in [12]:
-            ax.text(row.geometry.x, row.geometry.y - 1500, f"Campo Magro", color='black', va='center', ha='center', fontsize=8, weight='bold')
-        elif idx in [13]:
-            ax.text(row.geometry.x, row.geometry.y - 1500, f"Colombo", color='black', va='center', ha='center', fontsize=8, weight='bold')
-        elif idx in [14]:
-            ax.text(row.geometry.x, row.geometry.y + 1500, f"Mercês", color='black', va='center', ha='center', fontsize=8, weight='bold')
-        elif idx in [15]:
-            ax.text(row.geometry.x + 1000, row.geometry.y + 1500, f"← Balsa Nova", color='black', va='center', ha='center', fontsize=10, weight='bold')
-        elif idx in [16]:
-            ax.text(row.geometry.x + 3000, row.geometry.y, f"↓ Lapa", color='black', va='center', ha='center', fontsize=10, weight='bold')
-        elif idx in [17]:
-            ax.text(row.geometry.x, row.geometry.y + 1500, f"Piraquara", color='black', va='center', ha='center', fontsize=8, weight='bold')
-        elif idx in [18]:
-            ax.text(row.geometry.x, row.geometry.y + 1500, f"Canguiri", color='black', va='center', ha='center', fontsize=8, weight='bold')
-        elif idx in [19]:
-            ax.text(row.geometry.x, row.geometry.y + 1500, f"Q. Barras", color='black', va='center', ha='center', fontsize=8, weight='bold')
-        elif idx in [20]:
-            ax.text(row.geometry.x, row.geometry.y - 1500, f"B. Campo →", color='black', va='center', ha='center', fontsize=8, weight='bold')
-        elif idx in [21]:
-            ax.text(row.geometry.x, row.geometry.y + 1500, f"Alphaville", color='black', va='center', ha='center', fontsize=8, weight='bold')
-        elif idx in [22]:
-            ax.text(row.geometry.x, row.geometry.y + 1500, f"SJP Boneca", color='black', va='center', ha='center', fontsize=8, weight='bold')
-        elif idx in [23]:
-            ax.text(row.geometry.x, row.geometry.y - 1500, f"Barreirinha", color='black', va='center', ha='center', fontsize=8, weight='bold')
-        if(len(gdf) > 24):
-            if idx in [24]:
-                ax.text(row.geometry.x, row.geometry.y + 1500, f"Uberaba", color='black', va='center', ha='center', fontsize=8, weight='bold')
-            elif idx in [25]:
-                ax.text(row.geometry.x, row.geometry.y + 1500, f"Vista Alegre", color='black', va='center', ha='center', fontsize=8, weight='bold')
-            elif idx in [26]:
-                ax.text(row.geometry.x, row.geometry.y + 1500, f"S Inácio", color='black', va='center', ha='center', fontsize=8, weight='bold')
-            elif idx in [27]:
-                ax.text(row.geometry.x + 500, row.geometry.y - 1500, f"Bigorrilho", color='black', va='center', ha='center', fontsize=8, weight='bold')
-            elif idx in [28]:
-                ax.text(row.geometry.x - 1000, row.geometry.y + 1500, f"Pilarzinho", color='black', va='center', ha='center', fontsize=8, weight='bold')
-            elif idx in [29]:
-                ax.text(row.geometry.x, row.geometry.y + 1500, f"S Lourenço", color='black', va='center', ha='center', fontsize=8, weight='bold')
-            elif idx in [30]:
-                ax.text(row.geometry.x, row.geometry.y - 1500, f"Água Verde", color='black', va='center', ha='center', fontsize=8, weight='bold')
-            elif idx in [31]:
-                ax.text(row.geometry.x, row.geometry.y + 1500, f"Colombo Centro", color='black', va='center', ha='center', fontsize=8, weight='bold')
-            elif idx in [32]:
-                ax.text(row.geometry.x, row.geometry.y + 1500, f"Orleans", color='black', va='center', ha='center', fontsize=8, weight='bold')
-        if (32 <= row['Temperatura'] < 40) or (-5 < row['Temperatura'] <= 8):
-            ax.text(row.geometry.x, row.geometry.y, f'{row["Temperatura"]:.1f}', color='white', ha='center', va='center', fontsize=10, weight='bold')
-        else:
-            ax.text(row.geometry.x, row.geometry.y, f'{row["Temperatura"]:.1f}', color='black', ha='center', va='center', fontsize=10, weight='bold')
+com_dado = gdf[gdf['Temperatura'].notna()]
+rotulos = registro_estacoes.rotulos(registro, com_dado['Estacao'])
+xs, ys = com_dado.geometry.x.to_numpy(), com_dado.geometry.y.to_numpy()
+temperaturas = com_dado['Temperatura'].to_numpy()
+# Texto branco nos tons escuros do colormap
+brancas = ((32 <= temperaturas) & (temperaturas < 40)) | ((-5 < temperaturas) & (temperaturas <= 8))
+cores = np.where(brancas, 'white', 'black')
+rotulo_x, rotulo_y = xs + rotulos['dx'].to_numpy(), ys + rotulos['dy'].to_numpy()
+for i, (texto, tamanho) in enumerate(zip(rotulos['rotulo'], rotulos['tamanho'])):
+    if isinstance(texto, str):  # Estações fora do cadastro ficam sem rótulo
+        ax.text(rotulo_x[i], rotulo_y[i], texto, color='black', va='center', ha='center', fontsize=tamanho, weight='bold')
+    ax.text(xs[i], ys[i], f'{temperaturas[i]:.1f}', color=cores[i], ha='center', va='center', fontsize=10, weight='bold')
 
 # Salvar o gráfico em um arquivo
 plt.tight_layout()
-plt.savefig('mapa.png', bbox_inches='tight')
+renderizacao.salvar_figura(fig, 'mapa.png', bbox_inches='tight')
 plt.close(fig)
+renderizacao.registrar('mapa.png', digest)
@@ -0,0 +1,146 @@
+# Mosaico de tiles XYZ (Web Mercator) do radar do RainViewer
+#
+# A imagem centrada do RainViewer tem zoom e tamanho fixos e uma extensão só
+# aproximada. Aqui, para qualquer extensão e zoom, calcula-se o conjunto exato de
+# tiles que a cobre; os tiles são baixados em paralelo pela sessão compartilhada
+# do api_clima e escritos direto na sua posição em um array já alocado, sem
+# concatenações. O resultado é recortado na extensão pedida (uma view do mesmo
+# array) e vem com a transformação afim, pronto para o radar_numerico.
+# Várias vistas (por exemplo Curitiba em zoom alto e o Paraná inteiro) são
+# montadas numa única passada, sem baixar duas vezes um tile em comum. O
+# update_radar.py monta assim o radar.png e o radar_parana.png, com o recorte
+# reamostrado para a projeção dos mapas (em_plate_carree).
+#
+# Uso: python mosaico_radar.py   (monta as VISTAS com o quadro mais recente)
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import numpy as np
+from PIL import Image
+import api_clima
+import mapa_base
+
+TAMANHO_TILE = 256
+COLOR_SCHEME = 4  # Paleta de cores do radar
+OPTIONS = "1_1"  # Suavização e neve
+CIRCUNFERENCIA = 2 * np.pi * mapa_base.RAIO_TERRA  # m, largura do mundo em Web Mercator
+
+# Vistas: extensão (lon_min, lon_max, lat_min, lat_max) e zoom
+VISTAS = {
+    'curitiba': {'extensao': (-49.75, -48.85, -25.85, -25.0), 'zoom': 9},
+    'parana': {'extensao': (-54.7, -47.9, -26.8, -22.4), 'zoom': 6},
+}
+
+# Resolução (m/pixel) de um zoom, no equador
+def resolucao(zoom, tamanho=TAMANHO_TILE):
+    return CIRCUNFERENCIA / (tamanho * 2 ** zoom)
+
+# Posição em pixels globais (origem no canto superior esquerdo do mundo) de lon/lat
+def _pixels(lon, lat, zoom, tamanho):
+    x, y = mapa_base.para_web_mercator(lon, lat)
+    escala = 1 / resolucao(zoom, tamanho)
+    return (x + CIRCUNFERENCIA / 2) * escala, (CIRCUNFERENCIA / 2 - y) * escala
+
+# Janela em pixels globais (coluna e linha inicial e final) de uma extensão
+def janela(extensao, zoom, tamanho=TAMANHO_TILE):
+    lon_min, lon_max, lat_min, lat_max = extensao
+    px0, py0 = _pixels(lon_min, lat_max, zoom, tamanho)
+    px1, py1 = _pixels(lon_max, lat_min, zoom, tamanho)
+    return int(np.floor(px0)), int(np.floor(py0)), int(np.ceil(px1)), int(np.ceil(py1))
+
+# Tiles (x, y) que cobrem a extensão no zoom dado
+def tiles(extensao, zoom, tamanho=TAMANHO_TILE):
+    px0, py0, px1, py1 = janela(extensao, zoom, tamanho)
+    xs = range(px0 // tamanho, (px1 - 1) // tamanho + 1)
+    ys = range(py0 // tamanho, (py1 - 1) // tamanho + 1)
+    return [(x, y) for y in ys for x in xs]
+
+def url_tile(path, zoom, x, y, tamanho=TAMANHO_TILE, color_scheme=COLOR_SCHEME, options=OPTIONS):
+    return f"{api_clima.RAINVIEWER_TILES}{path}/{tamanho}/{zoom}/{x}/{y}/{color_scheme}/{options}.png"
+
+# Imagem RGBA de um tile; None quando o tile não existe
+def _baixar(url):
+    response = api_clima.get(url)
+    if response.status_code != 200:
+        return None
+    return np.asarray(Image.open(BytesIO(response.content)).convert('RGBA'))
+
+class Mosaico:
+    def __init__(self, extensao, zoom, tamanho=TAMANHO_TILE):
+        self.extensao, self.zoom, self.tamanho = extensao, zoom, tamanho
+        self.px0, self.py0, self.px1, self.py1 = janela(extensao, zoom, tamanho)
+        self.tiles = tiles(extensao, zoom, tamanho)
+        self.tx0 = min(x for x, _ in self.tiles)
+        self.ty0 = min(y for _, y in self.tiles)
+        colunas = (max(x for x, _ in self.tiles) - self.tx0 + 1) * tamanho
+        linhas = (max(y for _, y in self.tiles) - self.ty0 + 1) * tamanho
+        self.completo = np.zeros((linhas, colunas, 4), dtype=np.uint8)  # Transparente onde faltar tile
+
+    # Escreve um tile na sua posição do mosaico
+    def colocar(self, x, y, imagem):
+        linha, coluna = (y - self.ty0) * self.tamanho, (x - self.tx0) * self.tamanho
+        self.completo[linha:linha + self.tamanho, coluna:coluna + self.tamanho] = imagem
+
+    # Recorte exato da extensão (view, sem cópia)
+    @property
+    def imagem(self):
+        dx, dy = self.px0 - self.tx0 * self.tamanho, self.py0 - self.ty0 * self.tamanho
+        return self.completo[dy:dy + self.py1 - self.py0, dx:dx + self.px1 - self.px0]
+
+    # Transformação afim do recorte em Web Mercator (ver radar_numerico.GradeRadar)
+    @property
+    def transformacao(self):
+        r = resolucao(self.zoom, self.tamanho)
+        return (self.px0 * r - CIRCUNFERENCIA / 2, r, 0.0, CIRCUNFERENCIA / 2 - self.py0 * r, 0.0, -r)
+
+    # Extensão (xmin, xmax, ymin, ymax) do recorte em Web Mercator, para o imshow
+    @property
+    def extensao_mercator(self):
+        x0, dx, _, y0, _, dy = self.transformacao
+        linhas, colunas = self.imagem.shape[:2]
+        return x0, x0 + colunas * dx, y0 + linhas * dy, y0
+
+    # Recorte reamostrado (vizinho mais próximo) na projeção PlateCarree dos mapas
+    # do cartopy: colunas igualmente espaçadas em longitude e linhas em latitude,
+    # cobrindo exatamente a extensão pedida
+    def em_plate_carree(self):
+        lon_min, lon_max, lat_min, lat_max = self.extensao
+        linhas, colunas = self.py1 - self.py0, self.px1 - self.px0
+        lons = lon_min + (np.arange(colunas) + 0.5) * (lon_max - lon_min) / colunas
+        lats = lat_max - (np.arange(linhas) + 0.5) * (lat_max - lat_min) / linhas
+        px, _ = _pixels(lons, lat_max, self.zoom, self.tamanho)
+        _, py = _pixels(lon_min, lats, self.zoom, self.tamanho)
+        i = np.clip(np.floor(py).astype(int) - self.py0, 0, linhas - 1)
+        j = np.clip(np.floor(px).astype(int) - self.px0, 0, colunas - 1)
+        return self.imagem[i[:, np.newaxis], j]
+
+# Monta os mosaicos de várias vistas de um quadro numa única passada: os tiles de
+# todas as vistas são baixados juntos, em paralelo, e cada tile só uma vez
+def montar_vistas(path, vistas=VISTAS, tamanho=TAMANHO_TILE, max_conexoes=api_clima.MAX_CONEXOES):
+    mosaicos = {nome: Mosaico(v['extensao'], v['zoom'], tamanho) for nome, v in vistas.items()}
+    pedidos = {}
+    for nome, mosaico in mosaicos.items():
+        for x, y in mosaico.tiles:
+            pedidos.setdefault((mosaico.zoom, x, y), []).append(mosaico)
+
+    with ThreadPoolExecutor(max_workers=max_conexoes) as executor:
+        urls = [url_tile(path, z, x, y, tamanho) for z, x, y in pedidos]
+        for ((z, x, y), destinos), imagem in zip(pedidos.items(), executor.map(_baixar, urls)):
+            if imagem is None:
+                continue
+            for mosaico in destinos:
+                mosaico.colocar(x, y, imagem)
+    return mosaicos
+
+if __name__ == '__main__':
+    import radar_numerico
+    path = api_clima.mapas_rainviewer()["radar"]["past"][-1]["path"]
+    inicio = time.perf_counter()
+    mosaicos = montar_vistas(path)
+    print(f"{sum(len(m.tiles) for m in mosaicos.values())} tiles em {time.perf_counter() - inicio:.1f} s")
+    for nome, mosaico in mosaicos.items():
+        grade = radar_numerico.GradeRadar(radar_numerico.decodificador(COLOR_SCHEME).decodificar(mosaico.imagem), mosaico.transformacao)
+        lon_min, lon_max, lat_min, lat_max = VISTAS[nome]['extensao']
+        raio = radar_numerico.distancia_km(lat_min, lon_min, lat_max, lon_max) / 2
+        resumo = grade.estatisticas((lat_min + lat_max) / 2, (lon_min + lon_max) / 2, raio)
+        print(f"{nome}: {mosaico.imagem.shape[1]}x{mosaico.imagem.shape[0]} px, chuva em {resumo['cobertura']:.0%} da área, máxima {resumo['taxa_maxima']:.1f} mm/h")
@@ -0,0 +1,221 @@
+# Painel "Tempo nas últimas 24 horas" (graph.png)
+#
+# A figura, os colormaps, os formatadores e os localizadores são criados uma única
+# vez. Cada atualização só troca os dados das linhas e barras, os limites dos eixos
+# e os textos do cabeçalho, de modo que um processo de longa duração pode redesenhar
+# o painel a cada poucos minutos sem pagar de novo o custo de montar o layout.
+import time
+import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
+import matplotlib.ticker as mticker
+import numpy as np
+import pandas as pd
+import pytz
+import renderizacao
+import series_derivadas
+
+brasilia_tz = pytz.timezone("America/Sao_Paulo")
+
+# Colormap da temperatura, de -10 a 45 °C
+def colormap_temperatura():
+    c1 = plt.cm.Purples(np.linspace(0, 1, 50))
+    c2 = plt.cm.turbo(np.linspace(0, 1, 176))
+    c3 = plt.get_cmap('PuRd_r')(np.linspace(0, 1, 50))
+    return plt.cm.colors.ListedColormap(np.vstack((c1, c2, c3)))
+
+class Painel24h:
+    def __init__(self):
+        self.cmap = colormap_temperatura()
+        self.cmap_hum = plt.cm.colors.ListedColormap(plt.cm.coolwarm(np.linspace(1, 0, 100)))
+        self.cmap_rad = plt.cm.colors.ListedColormap(plt.cm.Blues(np.linspace(0, 1, 50)))
+
+        # Configurar subplots
+        fig, axs = plt.subplots(5, 1, figsize=(10, 12), sharex=True)
+        fig.suptitle("Tempo nas últimas 24 horas", fontsize=18)
+        self.fig, self.axs = fig, axs
+
+        # Cabeçalho: estado da estação, título e três quadrados com os valores atuais
+        self.texto_estado = fig.text(0.5, 1.00, '', fontsize=16, ha='center')
+        self.texto_titulo = fig.text(0.5, 1.15, '', fontsize=16, ha='center')
+        self.quadrados, self.textos_principais, self.textos_secundarios = [], [], []
+        for x in [0.15, 0.39, 0.63]:
+            quadrado = plt.Rectangle((x, 1.06), 0.22, 0.07, transform=fig.transFigure, lw=0)
+            fig.patches.append(quadrado)
+            self.quadrados.append(quadrado)
+            self.textos_principais.append(fig.text(x + 0.11, 1.075, '', fontsize=18, ha='center'))
+            self.textos_secundarios.append(fig.text(x + 0.11, 1.03, '', fontsize=11, ha='center', color='black'))
+
+        # Temperatura
+        self.linha_temp, = axs[0].plot([], [], label="Temperatura", color='red', marker='o')
+        self.linha_orvalho, = axs[0].plot([], [], label="Ponto de orvalho", color="green", linestyle="--", marker='o', markersize=3)
+        self.linha_sensacao, = axs[0].plot([], [], label="Sensação térmica", color='purple', linestyle=':')
+        axs[0].set_ylabel("Temperatura (°C)", fontsize=14)
+        axs[0].yaxis.set_major_formatter(mticker.FuncFormatter(lambda x, _: f"{x:.1f}"))
+        axs[0].legend(loc="best")
+
+        # Chuva (as barras são refeitas a cada atualização)
+        self.barras_chuva = None
+        axs[1].set_ylabel("Chuva (mm/h)", fontsize=14)
+        axs[1].yaxis.set_major_formatter(mticker.FuncFormatter(lambda x, _: f"{x:.1f}"))
+
+        # Umidade
+        self.linha_umidade, = axs[2].plot([], [], color='blue', marker='o')
+        axs[2].set_ylabel("Umidade relativa (%)", fontsize=14)
+        axs[2].yaxis.set_major_formatter(mticker.FuncFormatter(lambda x, _: f"{x:.0f}"))
+        axs[2].set_ylim([0, 103])
+
+        # Vento
+        self.linha_vento, = axs[3].plot([], [], color='navy', label='Vento', marker='o')
+        self.rajadas = axs[3].scatter([], [], color='orange', label='Rajadas', alpha=0.7)
+        axs[3].set_ylabel("Vento (km/h)", fontsize=14)
+        axs[3].yaxis.set_major_formatter(mticker.FuncFormatter(lambda x, _: f"{x:.1f}"))
+        axs[3].legend(loc="best")
+
+        # Radiação
+        self.linha_radiacao, = axs[4].plot([], [], color='orange', marker='o')
+        axs[4].set_ylabel("Radiação solar (W/m²)", fontsize=14)
+        axs[4].yaxis.set_major_formatter(mticker.FuncFormatter(lambda x, _: f"{x:.0f}"))
+        axs[4].set_ylim([0, 1350])
+
+        for ax in axs:
+            ax.grid(True)
+            ax.tick_params(axis='y', labelsize=14)
+
+        # Formatação do eixo X
+        axs[4].xaxis.set_major_formatter(mdates.DateFormatter('%H:%M', tz=brasilia_tz))
+        axs[4].xaxis.set_major_locator(mdates.HourLocator(interval=2))
+        axs[4].tick_params(axis='x', labelsize=14)
+        axs[4].set_xlabel("Hora local", fontsize=14)
+        fig.autofmt_xdate()
+
+        # Rodapé com a tendência da pressão e o vento médio da última hora
+        self.texto_rodape = fig.text(0.5, -0.01, '', fontsize=12, ha='center')
+
+        self._layout_pronto = False
+
+    # Atualiza o painel com a série das últimas 24 h já na grade (series_derivadas.processar),
+    # os valores atuais (None quando a estação não respondeu), o estado da estação e o horário
+    def atualizar(self, serie, temp, precip_total, humidity, dew_point, solar_rad, uv_index, estadoEstacao, timestamp):
+        axs = self.axs
+        tempos = serie.index.values
+
+        # Cabeçalho
+        self.texto_estado.set_text(estadoEstacao)
+        self.texto_estado.set_color('red' if estadoEstacao == "Offline" else 'green')
+        self.texto_titulo.set_text(f"Condições meteorológicas atuais em Curitiba (Parque Barigui) - Atualizado "
+                                   f"{timestamp.day:02d}/{timestamp.month:02d}/{timestamp.year} às {timestamp.hour:02d}:{timestamp.minute:02d}")
+        if temp is not None:
+            temp_norm = np.clip((temp + 10) / 55, 0, 1)  # Normaliza a temperatura dos limites [-10, 45]ºC para o intervalo [0, 1]
+            cores = [self.cmap(temp_norm), self.cmap_hum(humidity / 100), self.cmap_rad(precip_total / 50)]
+            cores_texto = ['white' if (temp >= 32 or temp < 8) else 'black',
+                           'white' if (humidity >= 90) else 'black',
+                           'white' if (precip_total >= 30) else 'black']
+            principais = [f"Temperatura:\n {temp:.1f} °C", f"Umidade:\n {humidity:.0f} %", f"Chuva acum.:\n {precip_total:.1f} mm"]
+            secundarios = [f"Ponto de orvalho: {dew_point:.1f} °C", f"Radiação solar: {solar_rad:.0f} W/m²", f"Índice UV: {uv_index:.0f}"]
+        else:
+            cores = [self.cmap_hum(0.5)] * 3
+            cores_texto = ['black'] * 3
+            principais = ["Temperatura:\n NaN °C", "Umidade:\n NaN %", "Chuva acum.:\n NaN mm"]
+            secundarios = ["Ponto de orvalho: NaN °C", "Radiação solar: NaN W/m²", "Índice UV: NaN"]
+        for quadrado, cor in zip(self.quadrados, cores):
+            quadrado.set_color(cor)
+        for texto, valor, cor in zip(self.textos_principais, principais, cores_texto):
+            texto.set_text(valor)
+            texto.set_color(cor)
+        for texto, valor in zip(self.textos_secundarios, secundarios):
+            texto.set_text(valor)
+
+        # Séries (NaN nas lacunas interrompe as linhas)
+        self.linha_temp.set_data(tempos, serie['Temperature'])
+        self.linha_orvalho.set_data(tempos, serie['Dew Point'])
+        self.linha_sensacao.set_data(tempos, serie['sensacao'])
+        self.linha_umidade.set_data(tempos, serie['Humidity'])
+        self.linha_vento.set_data(tempos, serie['Wind Speed'])
+        self.rajadas.set_offsets(np.column_stack([mdates.date2num(tempos), serie['Wind Gust']]))
+        self.linha_radiacao.set_data(tempos, serie['Radiation'])
+
+        # Taxa de chuva em mm/h, uma barra por intervalo da grade
+        taxa_chuva = serie['taxa_chuva'].fillna(0)
+        passo = (serie.index[1] - serie.index[0]) / pd.Timedelta(days=1) if len(serie) > 1 else 0.01
+        if self.barras_chuva is not None:
+            self.barras_chuva.remove()
+        self.barras_chuva = axs[1].bar(tempos, taxa_chuva, color='skyblue', label='Taxa de precipitação',
+                                       width=passo, align='edge')
+
+        ultimo = serie.iloc[-1]
+        rodape = []
+        if not np.isnan(ultimo['tendencia_pressao']):
+            rodape.append(f"Pressão: {ultimo['Pressure']:.1f} hPa ({ultimo['tendencia_pressao']:+.1f} hPa em 3 h)")
+        if ultimo['vento_medio'] < 1:
+            rodape.append("Vento calmo na última hora")
+        elif not np.isnan(ultimo['vento_medio']):
+            rodape.append(f"Vento médio na última hora: {ultimo['vento_medio']:.0f} km/h de {ultimo['direcao_media']:.0f}°")
+        rodape.append(f"Chuva: {ultimo['chuva_1h']:.1f} mm em 1 h, {ultimo['chuva_3h']:.1f} mm em 3 h")
+        self.texto_rodape.set_text(' | '.join(rodape))
+
+        # Limites de x (de timestamp - 25h até timestamp + 1h) e de y
+        axs[4].set_xlim([timestamp - pd.Timedelta(hours=25), timestamp + pd.Timedelta(hours=1)])
+        axs[0].set_ylim(min(serie['Dew Point'].min(), serie['sensacao'].min())-2, max(serie['Temperature'].max(), serie['sensacao'].max())+2)
+        axs[1].set_ylim(0, taxa_chuva.max()+5)
+        axs[3].set_ylim(0, serie['Wind Gust'].max()+3)
+
+    def salvar(self, arquivo):
+        # O ajuste do layout só é calculado no primeiro desenho
+        if not self._layout_pronto:
+            self.fig.tight_layout()
+            self._layout_pronto = True
+        renderizacao.salvar_figura(self.fig, arquivo, bbox_inches='tight')
+
+_painel = None
+
+# Painel único do processo: num processo de longa duração, as chamadas seguintes reaproveitam a figura
+def obter_painel():
+    global _painel
+    if _painel is None:
+        _painel = Painel24h()
+    return _painel
+
+# Compara o tempo de desenho a frio (figura nova) e a quente (figura reaproveitada)
+if __name__ == '__main__':
+    import matplotlib
+    matplotlib.use('Agg')
+    from io import BytesIO
+
+    agora = pd.Timestamp.now(tz=brasilia_tz).floor('s')
+    tempos = pd.date_range(agora - pd.Timedelta(hours=24), agora, freq='15min')
+    n = len(tempos)
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'Timestamp': tempos,
+        'Temperature': 18 + 5 * np.sin(np.linspace(0, 2 * np.pi, n)),
+        'Precip': np.cumsum(rng.exponential(0.05, n)),
+        'Humidity': 70 + 20 * np.cos(np.linspace(0, 2 * np.pi, n)),
+        'Dew Point': 12 + rng.normal(0, 0.5, n),
+        'Radiation': np.clip(900 * np.sin(np.linspace(-np.pi, np.pi, n)), 0, None),
+        'Wind Speed': rng.uniform(0, 15, n),
+        'Wind Gust': rng.uniform(5, 30, n),
+        'Wind Dir': rng.uniform(0, 360, n),
+        'Pressure': 1012 + np.cumsum(rng.normal(0, 0.1, n)),
+    })
+    argumentos = (series_derivadas.processar(df, agora), 20.0, 3.2, 75, 12.0, 500, 4, 'Online', agora)
+
+    repeticoes = 5
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        painel = Painel24h()
+        painel.atualizar(*argumentos)
+        painel.salvar(BytesIO())
+        plt.close(painel.fig)
+    frio = (time.perf_counter() - inicio) / repeticoes
+
+    painel = Painel24h()
+    painel.atualizar(*argumentos)
+    painel.salvar(BytesIO())
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        painel.atualizar(*argumentos)
+        painel.salvar(BytesIO())
+    quente = (time.perf_counter() - inicio) / repeticoes
+
+    print(f"A frio: {frio * 1000:.0f} ms por desenho")
+    print(f"A quente: {quente * 1000:.0f} ms por desenho ({frio / quente:.1f}x mais rápido)")
@@ -0,0 +1,134 @@
+# Previsão do tempo em lote para vários locais
+#
+# Para cada ponto (por padrão, as estações ativas de estacoes.csv) busca a previsão do WU
+# e a qualidade do ar do Open-Meteo, com no máximo MAX_CONEXOES requisições
+# simultâneas, e desenha um previsao.png por local num pool de processos, com o
+# mesmo gráfico do previsaoTempo.py e um único atlas de ícones, carregado antes de
+# o pool ser criado. Locais cuja previsão não mudou desde a última execução não
+# são redesenhados. O resultado fica em SAIDA, com um indice.json
+# listando local, coordenadas, arquivo e situação de cada gráfico.
+#
+# Uso: python previsao_lote.py                      (estações de estacoes.csv)
+#      python previsao_lote.py --pontos pontos.csv  (colunas id, nome, latitude, longitude)
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pytz
+import requests
+import api_clima
+import atlas_icones
+import previsaoTempo
+import registro_estacoes
+import renderizacao
+
+brasilia_tz = pytz.timezone("America/Sao_Paulo")
+
+SAIDA = 'previsoes'
+MAX_CONEXOES = api_clima.MAX_CONEXOES
+PROCESSOS = min(4, os.cpu_count() or 1)
+
+# Local de uma estação: posição do cadastro ou, sem ela, a da observação atual;
+# None se a posição não estiver no cadastro e a estação estiver offline
+def _ponto_da_estacao(estacao):
+    ponto = {'id': estacao.Index, 'nome': estacao.nome, 'latitude': estacao.latitude, 'longitude': estacao.longitude}
+    if not (np.isnan(ponto['latitude']) or np.isnan(ponto['longitude'])):
+        return ponto
+    try:
+        data = api_clima.observacao_atual(estacao.Index)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"Estação {estacao.Index} sem localização: {e}")
+        return None
+    if not data.get('observations'):
+        print(f"Estação {estacao.Index} sem localização: offline")
+        return None
+    observation = data['observations'][0]
+    return {**ponto, 'latitude': observation['lat'], 'longitude': observation['lon']}
+
+# Estações ativas do cadastro
+def pontos_das_estacoes(arquivo=registro_estacoes.ARQUIVO, max_conexoes=MAX_CONEXOES):
+    registro = registro_estacoes.obter_registro(arquivo)
+    with ThreadPoolExecutor(max_workers=max_conexoes) as executor:
+        return [p for p in executor.map(_ponto_da_estacao, registro[registro['ativa']].itertuples()) if p is not None]
+
+def ler_pontos(arquivo):
+    return pd.read_csv(arquivo, dtype={'id': str}).to_dict('records')
+
+# Previsão e qualidade do ar de um ponto; None se alguma das APIs falhar
+def _buscar(ponto):
+    try:
+        return previsaoTempo.obter_previsao(ponto['latitude'], ponto['longitude'])
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"Previsão indisponível para {ponto['nome']}: {e}")
+        return None
+
+# Roda em cada processo do pool antes do primeiro desenho
+def _iniciar_processo():
+    import matplotlib
+    matplotlib.use('Agg')
+    atlas_icones.obter_atlas()
+
+def _renderizar(tarefa):
+    forecast_data, air_data, arquivo, titulo = tarefa
+    previsaoTempo.renderizar(forecast_data, air_data, arquivo, titulo)
+    return arquivo
+
+def principal(pontos, saida=SAIDA, processos=PROCESSOS, max_conexoes=MAX_CONEXOES):
+    os.makedirs(saida, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=max_conexoes) as executor:
+        dados = list(executor.map(_buscar, pontos))
+
+    indice, tarefas, digests, itens = [], [], {}, {}
+    for ponto, resultado in zip(pontos, dados):
+        arquivo = os.path.join(saida, f"{ponto['id']}.png")
+        item = {**ponto, 'arquivo': arquivo}
+        if resultado is None:
+            item['situacao'] = 'erro'
+        else:
+            forecast_data, air_data = resultado
+            digest = previsaoTempo.impressao_previsao(forecast_data, air_data, ponto['latitude'], ponto['longitude'], ponto['nome'])
+            if renderizacao.inalterado(arquivo, digest):
+                item['situacao'] = 'mantido'
+            else:
+                item['situacao'] = 'atualizado'
+                tarefas.append((forecast_data, air_data, arquivo, f"Previsão do tempo - {ponto['nome']}"))
+                digests[arquivo] = digest
+                itens[arquivo] = item
+        indice.append(item)
+
+    if tarefas:
+        atlas_icones.obter_atlas()  # Os processos do pool herdam o atlas já carregado
+        # Uma falha no desenho de um local não interrompe os demais; o hash só é
+        # registrado para as figuras desenhadas, e o local com falha fica como 'erro'
+        with ProcessPoolExecutor(max_workers=min(processos, len(tarefas)), initializer=_iniciar_processo) as executor:
+            futuros = {executor.submit(_renderizar, tarefa): tarefa[2] for tarefa in tarefas}
+        for futuro, arquivo in futuros.items():
+            try:
+                futuro.result()
+            except Exception as e:
+                print(f"Falha ao desenhar {arquivo}: {e}")
+                itens[arquivo]['situacao'] = 'erro'
+                continue
+            renderizacao.registrar(arquivo, digests[arquivo])
+
+    arquivo_indice = os.path.join(saida, 'indice.json')
+    temporario = f"{arquivo_indice}.{os.getpid()}.tmp"
+    with open(temporario, 'w') as f:
+        json.dump({'atualizado': datetime.now(brasilia_tz).isoformat(timespec='seconds'), 'locais': indice},
+                  f, ensure_ascii=False, indent=1)
+    os.replace(temporario, arquivo_indice)
+    situacoes = pd.Series([item['situacao'] for item in indice]).value_counts().to_dict()
+    print(f"{len(indice)} locais: {situacoes}")
+    return indice
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Gera a previsão do tempo para vários locais.")
+    parser.add_argument('--pontos', help="CSV com id, nome, latitude e longitude (padrão: estações de estacoes.csv)")
+    parser.add_argument('--saida', default=SAIDA)
+    parser.add_argument('--processos', type=int, default=PROCESSOS)
+    args = parser.parse_args()
+    pontos = ler_pontos(args.pontos) if args.pontos else pontos_das_estacoes()
+    principal(pontos, args.saida, args.processos)
@@ -0,0 +1,74 @@
+# Cache dos quadros de radar do RainViewer, identificados pelo path de cada quadro
+#
+# O weather-maps.json lista ~2 h de quadros passados (e alguns de nowcast), mas de
+# uma execução para a outra só entram um ou dois quadros novos. Cada quadro baixado
+# é guardado já decodificado (RGBA, uint8) em CACHE_DIR, com os parâmetros da
+# imagem no nome, e as execuções seguintes só baixam os que faltam, em paralelo.
+# Por padrão o quadro é a imagem centrada (a chave é a URL); com produzir e chave,
+# qualquer imagem de um quadro, como o recorte de um mosaico_radar.
+# Quadros que saíram da lista são apagados. Cada arquivo é gravado num temporário
+# e renomeado; um arquivo ilegível (truncado por falta de espaço em disco, por
+# exemplo) é apagado e o quadro, produzido de novo.
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import numpy as np
+from PIL import Image
+import api_clima
+
+CACHE_DIR = os.getenv('QUADROS_RADAR_DIR', os.path.join('.cache', 'quadros_radar'))
+
+# URL da imagem de radar de um quadro, centrada em (lat, lon)
+def url_quadro(path, size, zoom, lat, lon, color_scheme, options):
+    return f"{api_clima.RAINVIEWER_TILES}{path}/{size}/{zoom}/{lat}/{lon}/{color_scheme}/{options}.png"
+
+def _arquivo(chave):
+    return os.path.join(CACHE_DIR, hashlib.sha1(chave.encode()).hexdigest()[:20] + '.npy')
+
+def _baixar(url):
+    response = api_clima.get(url)
+    if response.status_code != 200:
+        raise ValueError("Erro ao baixar a imagem de radar.")
+    return np.asarray(Image.open(BytesIO(response.content)).convert('RGBA'))
+
+# Quadro guardado no cache; None se não existe ou está ilegível (nesse caso é apagado)
+def _carregar(arquivo):
+    if not os.path.exists(arquivo):
+        return None
+    try:
+        return np.load(arquivo)
+    except (OSError, ValueError, EOFError):
+        os.remove(arquivo)
+        return None
+
+def _salvar(arquivo, imagem):
+    temporario = f"{arquivo}.{os.getpid()}.tmp"
+    with open(temporario, 'wb') as f:
+        np.save(f, imagem)
+    os.replace(temporario, arquivo)
+
+# Imagens RGBA dos quadros (na ordem dada), produzindo só as que não estão no
+# cache. chave(quadro) identifica a imagem no cache; por padrão os quadros são URLs.
+def obter_quadros(quadros, produzir=_baixar, chave=str, max_conexoes=api_clima.MAX_CONEXOES):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    imagens = {}
+    for quadro in quadros:
+        imagem = _carregar(_arquivo(chave(quadro)))
+        if imagem is not None:
+            imagens[quadro] = imagem
+    faltando = list(dict.fromkeys(quadro for quadro in quadros if quadro not in imagens))
+    if faltando:
+        with ThreadPoolExecutor(max_workers=min(max_conexoes, len(faltando))) as executor:
+            for quadro, imagem in zip(faltando, executor.map(produzir, faltando)):
+                _salvar(_arquivo(chave(quadro)), imagem)
+                imagens[quadro] = imagem
+    return [imagens[quadro] for quadro in quadros], len(faltando)
+
+# Remove do cache os quadros que não estão na lista de chaves (os que saíram da
+# animação) e temporários deixados por execuções interrompidas
+def descartar_outros(chaves):
+    manter = {os.path.basename(_arquivo(c)) for c in chaves}
+    for nome in os.listdir(CACHE_DIR):
+        if (nome.endswith('.npy') and nome not in manter) or nome.endswith('.tmp'):
+            os.remove(os.path.join(CACHE_DIR, nome))
@@ -0,0 +1,38 @@
+# Agregados diários de qualidade do ar a partir da série horária do Open-Meteo
+#
+# A resposta traz uma lista de horários (no fuso pedido, sem offset) e uma lista
+# de valores por poluente, com None nas horas sem dado. Tudo é convertido para um
+# DataFrame de uma vez e agrupado por dia no horário de Brasília; média, máxima e
+# percentil saem de agregações do pandas sobre todos os poluentes juntos, sem
+# laços em Python por hora, dia ou poluente.
+import pandas as pd
+
+FUSO = "America/Sao_Paulo"
+POLUENTES = ['pm2_5', 'pm10', 'ozone', 'nitrogen_dioxide']
+PERCENTIL = 0.9
+
+# Série horária (índice com fuso) dos poluentes presentes na resposta
+def serie_horaria(hourly):
+    tempos = pd.to_datetime(pd.Series(hourly['time']), format='%Y-%m-%dT%H:%M')
+    tempos = tempos.dt.tz_localize(FUSO, ambiguous='NaT', nonexistent='shift_forward')
+    colunas = [p for p in hourly if p != 'time']
+    return pd.DataFrame({p: pd.to_numeric(pd.Series(hourly[p]), errors='coerce') for p in colunas}).set_index(tempos)
+
+# Média, máxima e percentil diários de cada poluente: colunas (poluente, estatística),
+# índice pela data (datetime.date). Horas sem valor ficam de fora; dias sem nenhum
+# valor ficam com NaN.
+def agregados_diarios(hourly, percentil=PERCENTIL):
+    serie = serie_horaria(hourly)
+    grupos = serie.groupby(serie.index.date)
+    agregados = pd.concat({'media': grupos.mean(), 'maxima': grupos.max(), f'p{percentil * 100:.0f}': grupos.quantile(percentil)}, axis=1)
+    return agregados.swaplevel(axis=1).sort_index(axis=1)
+
+# Datas (no horário de Brasília) dos instantes Unix de validade da previsão do WU
+def datas_da_previsao(valid_time_utc):
+    return pd.to_datetime(pd.Series(valid_time_utc), unit='s', utc=True).dt.tz_convert(FUSO).dt.date
+
+# Valores de uma estatística de um poluente alinhados às datas, arredondados para
+# inteiros; None nos dias sem dado
+def por_dia(agregados, datas, poluente='pm2_5', estatistica='media'):
+    valores = agregados[(poluente, estatistica)].reindex(datas).round()
+    return [None if pd.isna(v) else int(v) for v in valores]
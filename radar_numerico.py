@@ -0,0 +1,141 @@
+# Decodificação das imagens de radar do RainViewer em grades numéricas
+#
+# A imagem de radar é só uma paleta de cores: cada cor corresponde a uma faixa de
+# refletividade (dBZ) na tabela de cores do RainViewer. Aqui a paleta do esquema
+# usado vira uma tabela de consulta com 32 níveis por canal (32³ entradas, cada
+# uma com o dBZ da cor mais próxima da paleta), de modo que a imagem inteira é
+# decodificada com uma única indexação NumPy. A grade resultante é georreferenciada
+# em Web Mercator a partir do zoom e do centro da imagem, o que permite calcular
+# chuva num raio, área coberta e intensidade máxima em milissegundos.
+import time
+from io import StringIO
+import numpy as np
+import pandas as pd
+import api_clima
+import mapa_base
+
+# Tabela de conversão: Zoom → Resolução (m/pixel) das imagens de 512 pixels
+zoom_to_resolution = {
+    0: 78271.517, 1: 39135.7585, 2: 19567.8792, 3: 9783.9396,
+    4: 4891.9698, 5: 2445.9849, 6: 1222.9925, 7: 611.4962,
+    8: 305.7481, 9: 152.8741, 10: 76.437
+}
+
+NIVEIS = 32  # Níveis por canal da tabela de consulta
+ALPHA_MIN = 16  # Pixels mais transparentes que isso não têm eco
+
+# Paleta de um esquema de cores: arrays de dBZ e de cores RGBA (uint8). Na tabela
+# do RainViewer, a primeira coluna é o dBZ e as seguintes são os esquemas 0, 1, 2...
+def ler_paleta(texto_csv, esquema):
+    tabela = pd.read_csv(StringIO(texto_csv))
+    coluna = tabela.iloc[:, 1 + esquema].astype(str).str.strip().str.lstrip('#')
+    validas = coluna.str.fullmatch(r'[0-9a-fA-F]{6}([0-9a-fA-F]{2})?')
+    coluna = coluna[validas].where(coluna[validas].str.len() == 8, coluna[validas] + 'ff')
+    cores = np.array([[int(c[i:i + 2], 16) for i in (0, 2, 4, 6)] for c in coluna], dtype=np.uint8)
+    return tabela.iloc[:, 0][validas].to_numpy(dtype=np.float32), cores
+
+def carregar_paleta(esquema):
+    return ler_paleta(api_clima.tabela_cores_rainviewer(), esquema)
+
+# Índice de cada pixel RGB na tabela de consulta
+def _indice_lut(rgb):
+    q = (rgb >> 3).astype(np.int32)  # 256 / NIVEIS = 8
+    return (q[..., 0] * NIVEIS + q[..., 1]) * NIVEIS + q[..., 2]
+
+class DecodificadorRadar:
+    def __init__(self, dbz, cores):
+        # Cores repetidas na paleta (várias faixas de dBZ com a mesma cor) ficam com o dBZ médio
+        opacas = cores[:, 3] > 0
+        unicas, inverso = np.unique(cores[opacas, :3], axis=0, return_inverse=True)
+        inverso = inverso.ravel()
+        dbz_unicas = np.bincount(inverso, weights=dbz[opacas]) / np.bincount(inverso)
+
+        # Centro de cada célula da tabela e a cor mais próxima da paleta
+        niveis = np.arange(NIVEIS) * (256 // NIVEIS) + (256 // NIVEIS) / 2
+        centros = np.stack(np.meshgrid(niveis, niveis, niveis, indexing='ij'), axis=-1).reshape(-1, 3).astype(np.float32)
+        distancias = ((centros[:, np.newaxis, :] - unicas[np.newaxis, :, :].astype(np.float32)) ** 2).sum(-1)
+        self.lut = dbz_unicas[distancias.argmin(axis=1)].astype(np.float32)
+
+    # Grade de dBZ (float32) de uma imagem RGBA; NaN onde não há eco
+    def decodificar(self, imagem):
+        imagem = np.asarray(imagem)
+        dbz = self.lut[_indice_lut(imagem[..., :3])]
+        if imagem.shape[-1] == 4:
+            dbz[imagem[..., 3] < ALPHA_MIN] = np.nan
+        return dbz
+
+_decodificadores = {}
+
+# Decodificador de um esquema de cores, criado uma vez por processo
+def decodificador(esquema):
+    if esquema not in _decodificadores:
+        _decodificadores[esquema] = DecodificadorRadar(*carregar_paleta(esquema))
+    return _decodificadores[esquema]
+
+# Taxa de chuva (mm/h) pela relação de Marshall-Palmer, Z = 200 R^1,6
+def taxa_chuva(dbz):
+    return (10 ** (np.asarray(dbz) / 10) / 200) ** (1 / 1.6)
+
+# Distância (km) pelo grande círculo entre pontos (graus), vetorizada
+def distancia_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * mapa_base.RAIO_TERRA / 1000 * np.arcsin(np.sqrt(a))
+
+class GradeRadar:
+    # dbz: grade decodificada; transformacao: afim (como no GDAL) em Web Mercator,
+    # x = x0 + coluna * dx, y = y0 + linha * dy, nos cantos dos pixels
+    def __init__(self, dbz, transformacao):
+        self.dbz = dbz
+        self.transformacao = transformacao
+        self._coordenadas = None
+
+    # Grade de uma imagem do RainViewer centrada em (lat_centro, lon_centro) no zoom dado
+    @classmethod
+    def centrada(cls, dbz, lat_centro, lon_centro, zoom):
+        resolucao = zoom_to_resolution[zoom]
+        linhas, colunas = dbz.shape
+        x_c, y_c = mapa_base.para_web_mercator(lon_centro, lat_centro)
+        return cls(dbz, (float(x_c) - colunas / 2 * resolucao, resolucao, 0.0,
+                         float(y_c) + linhas / 2 * resolucao, 0.0, -resolucao))
+
+    # Longitude e latitude (graus) do centro de cada pixel
+    def coordenadas(self):
+        if self._coordenadas is None:
+            x0, dx, _, y0, _, dy = self.transformacao
+            linhas, colunas = self.dbz.shape
+            x = x0 + (np.arange(colunas) + 0.5) * dx
+            y = y0 + (np.arange(linhas) + 0.5) * dy
+            lon, lat = mapa_base.de_web_mercator(x, y)
+            self._coordenadas = np.broadcast_to(lon, self.dbz.shape), np.broadcast_to(lat[:, np.newaxis], self.dbz.shape)
+        return self._coordenadas
+
+    # Chuva dentro de um raio (km) em torno de um ponto: fração da área com chuva
+    # (taxa >= limiar), taxa média na área com chuva, taxa máxima e dBZ máximo
+    def estatisticas(self, lat, lon, raio_km, limiar=0.1):
+        lons, lats = self.coordenadas()
+        dentro = distancia_km(lat, lon, lats, lons) <= raio_km
+        dbz = self.dbz[dentro]
+        taxa = np.nan_to_num(taxa_chuva(dbz), nan=0.0)
+        chovendo = taxa >= limiar
+        return {
+            'cobertura': float(chovendo.mean()) if dbz.size else 0.0,
+            'taxa_media': float(taxa[chovendo].mean()) if chovendo.any() else 0.0,
+            'taxa_maxima': float(taxa.max()) if dbz.size else 0.0,
+            'dbz_maximo': float(np.nanmax(dbz)) if np.isfinite(dbz).any() else None,
+        }
+
+# Tempo de decodificação e das estatísticas para uma imagem sintética com as cores da paleta
+if __name__ == '__main__':
+    _, cores = carregar_paleta(4)
+    rng = np.random.default_rng(0)
+    imagem = cores[rng.integers(0, len(cores), (512, 512))]
+
+    repeticoes = 100
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        grade = GradeRadar.centrada(decodificador(4).decodificar(imagem), -25.426, -49.304, 7)
+        resumo = grade.estatisticas(-25.426, -49.304, 30)
+    tempo = (time.perf_counter() - inicio) / repeticoes
+    print(f"Decodificação e estatísticas: {tempo * 1000:.1f} ms por imagem")
+    print(resumo)
@@ -0,0 +1,213 @@
+# Recuperação de lacunas no histórico da estação (backfill)
+#
+# O atualizaCSV.py só lê a observação atual e o extremes.py só pede o resumo de
+# ontem: uma execução que falha ou uma estação offline deixam um buraco para
+# sempre. Este script procura as lacunas e as preenche com os endpoints de
+# histórico do WU:
+#  - dias sem resumo em clima_diario.csv -> v2/pws/history/daily;
+#  - intervalos sem amostra por mais de LACUNA no histórico de alta resolução
+#    (historico/ICURITIB28) -> v2/pws/history/all dos dias afetados, usando só as
+#    observações que caem dentro das lacunas.
+# Os dias são baixados em lotes de LOTE, em paralelo (no máximo MAX_CONEXOES
+# conexões) e sem passar de REQUISICOES_POR_MINUTO. Ao fim de cada lote os dados
+# são mesclados de uma vez no histórico (uma escrita por mês afetado) e os dias
+# concluídos vão para o arquivo de progresso, de onde uma execução interrompida
+# continua. Repetir a recuperação não duplica nada.
+#
+# Uso: python recuperar_lacunas.py                       (últimos DIAS dias)
+#      python recuperar_lacunas.py --desde 2026-01-01
+#      WU_API_BASE=http://localhost:8000 python recuperar_lacunas.py   (API falsa)
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import pandas as pd
+import pytz
+import requests
+import api_clima
+import climatologia
+import historico
+
+brasilia_tz = pytz.timezone("America/Sao_Paulo")
+
+STATION_ID = "ICURITIB28"
+DIAS = 30  # Janela padrão de busca de lacunas
+LACUNA = timedelta(minutes=45)  # A estação é lida a cada ~15 min
+LOTE = 10  # Dias por lote (entre dois pontos de controle)
+MAX_CONEXOES = api_clima.MAX_CONEXOES
+REQUISICOES_POR_MINUTO = int(os.getenv('WU_REQUISICOES_POR_MINUTO', 30))
+ARQUIVO_PROGRESSO = os.path.join('.cache', 'recuperar_lacunas', 'progresso.json')
+
+# Campos do history/all (valores médios ou extremos de cada intervalo) para as colunas do histórico
+CAMPOS = {
+    'Temperature': ('metric', 'tempAvg'),
+    'Precip': ('metric', 'precipTotal'),
+    'Humidity': (None, 'humidityAvg'),
+    'Dew Point': ('metric', 'dewptAvg'),
+    'Radiation': (None, 'solarRadiationHigh'),
+    'UV Index': (None, 'uvHigh'),
+    'Wind Speed': ('metric', 'windspeedAvg'),
+    'Wind Dir': (None, 'winddirAvg'),
+    'Wind Gust': ('metric', 'windgustHigh'),
+    'Pressure': ('metric', 'pressureMax'),
+}
+
+# Limita as requisições por minuto entre todas as threads (intervalo mínimo entre inícios)
+class LimiteTaxa:
+    def __init__(self, por_minuto):
+        self.intervalo = 60 / por_minuto
+        self.proxima = time.monotonic()
+        self.trava = threading.Lock()
+
+    def esperar(self):
+        with self.trava:
+            agora = time.monotonic()
+            espera = self.proxima - agora
+            self.proxima = max(agora, self.proxima) + self.intervalo
+        if espera > 0:
+            time.sleep(espera)
+
+# Dias já recuperados (ou confirmados sem dado na API), por tipo de recuperação
+class Progresso:
+    def __init__(self, arquivo=ARQUIVO_PROGRESSO):
+        self.arquivo = arquivo
+        if os.path.exists(arquivo):
+            with open(arquivo) as f:
+                self.feitos = {tipo: set(dias) for tipo, dias in json.load(f).items()}
+        else:
+            self.feitos = {}
+
+    def feito(self, tipo, dia):
+        return dia.isoformat() in self.feitos.get(tipo, set())
+
+    def marcar(self, tipo, dias):
+        self.feitos.setdefault(tipo, set()).update(d.isoformat() for d in dias)
+
+    def salvar(self):
+        os.makedirs(os.path.dirname(self.arquivo) or '.', exist_ok=True)
+        temporario = f"{self.arquivo}.{os.getpid()}.tmp"
+        with open(temporario, 'w') as f:
+            json.dump({tipo: sorted(dias) for tipo, dias in self.feitos.items()}, f)
+        os.replace(temporario, self.arquivo)
+
+# Dias entre desde e ate (inclusive) sem resumo no histórico diário
+def dias_sem_resumo(clima, desde, ate):
+    presentes = set(clima.diario['Date'])
+    return [d.date() for d in pd.date_range(desde, ate) if d.date() not in presentes]
+
+# Intervalos (inicio, fim) sem amostra por mais de lacuna entre desde e ate, incluindo
+# o começo e o fim da janela
+def lacunas(armazem, desde, ate, lacuna=LACUNA):
+    tempos = armazem.ler(desde, ate)[armazem.coluna_tempo] if not armazem.vazio() else pd.Series(dtype='datetime64[ns, UTC]')
+    limites = pd.Series([pd.Timestamp(desde)]).dt.tz_convert(historico.FUSO)
+    fim = pd.Series([pd.Timestamp(ate)]).dt.tz_convert(historico.FUSO)
+    pontos = pd.concat([limites, tempos, fim], ignore_index=True)
+    saltos = pontos.diff() > lacuna
+    return list(zip(pontos.shift()[saltos], pontos[saltos]))
+
+# Dias (horário de Brasília) tocados pelas lacunas
+def dias_das_lacunas(intervalos):
+    dias = set()
+    for inicio, fim in intervalos:
+        dias.update(d.date() for d in pd.date_range(inicio.normalize(), fim.normalize(), freq='D'))
+    return sorted(dias)
+
+# Resumo de um dia no formato do clima_diario.csv; None se a API não tiver o dia
+def _baixar_resumo(station_id, dia, limite):
+    limite.esperar()
+    data = api_clima.historico_diario(station_id, dia.strftime("%Y%m%d"))
+    if not data.get('observations'):
+        return None
+    resumo = data['observations'][0]['metric']
+    return {'Date': dia, 'MinTemp': resumo['tempLow'], 'MaxTemp': resumo['tempHigh'],
+            'AvgTemp': resumo['tempAvg'], 'Precip': resumo['precipTotal']}
+
+# Observações de um dia com as colunas do histórico de alta resolução
+def _baixar_observacoes(station_id, dia, limite):
+    limite.esperar()
+    observacoes = api_clima.historico_completo(station_id, dia.strftime("%Y%m%d")).get('observations', [])
+    linhas = pd.json_normalize(observacoes)
+    if linhas.empty:
+        return linhas
+    colunas = {f"{grupo}.{campo}" if grupo else campo: nome for nome, (grupo, campo) in CAMPOS.items()}
+    tabela = linhas.reindex(columns=list(colunas)).rename(columns=colunas)
+    tabela.insert(0, 'Timestamp', pd.to_datetime(linhas['obsTimeUtc'], utc=True).dt.tz_convert(historico.FUSO))
+    return tabela
+
+# Baixa os dias em lotes, chamando mesclar(resultados) e salvando o progresso ao fim de cada lote.
+# Dias com erro não são marcados e voltam na próxima execução. Devolve o total de registros novos.
+def _recuperar(tipo, dias, baixar, mesclar, progresso, max_conexoes):
+    pendentes = [d for d in dias if not progresso.feito(tipo, d)]
+    hoje = datetime.now(brasilia_tz).date()
+    total = 0
+    for i in range(0, len(pendentes), LOTE):
+        lote = pendentes[i:i + LOTE]
+        resultados, concluidos = [], []
+        with ThreadPoolExecutor(max_workers=max_conexoes) as executor:
+            futuros = {dia: executor.submit(baixar, dia) for dia in lote}
+        for dia, futuro in futuros.items():
+            try:
+                resultado = futuro.result()
+            except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+                print(f"{tipo} {dia}: {e}")
+                continue
+            if resultado is not None and len(resultado):
+                resultados.append(resultado)
+            if dia < hoje:  # O dia de hoje ainda vai mudar
+                concluidos.append(dia)
+        novos = mesclar(resultados) if resultados else 0
+        total += novos
+        progresso.marcar(tipo, concluidos)
+        progresso.salvar()
+        print(f"{tipo}: {min(lote)} a {max(lote)}, {novos} registros novos")
+    return total
+
+def principal(desde, station_id=STATION_ID, max_conexoes=MAX_CONEXOES, por_minuto=REQUISICOES_POR_MINUTO,
+              arquivo_progresso=ARQUIVO_PROGRESSO):
+    agora = datetime.now(brasilia_tz).replace(microsecond=0)
+    ontem = agora.date() - timedelta(days=1)
+    limite = LimiteTaxa(por_minuto)
+    progresso = Progresso(arquivo_progresso)
+
+    # Resumos diários
+    clima = climatologia.Climatologia()
+    if clima.diario.empty and os.path.exists('month_data.csv'):  # Como no extremes.py
+        anterior = pd.read_csv('month_data.csv', parse_dates=['Date'])
+        clima.adicionar_dias(anterior.assign(Date=anterior['Date'].dt.date))
+    dias = dias_sem_resumo(clima, desde, ontem)
+    print(f"{len(dias)} dias sem resumo diário")
+    if _recuperar('diario', dias, lambda dia: _baixar_resumo(station_id, dia, limite),
+                  lambda resultados: clima.adicionar_dias(pd.DataFrame(resultados)), progresso, max_conexoes):
+        clima.mes(ontem.year, ontem.month).to_csv('month_data.csv', index=False, date_format='%Y-%m-%d')
+
+    # Observações de alta resolução, só dentro das lacunas
+    armazem = historico.ArmazemParticionado(os.path.join('historico', station_id))
+    if armazem.vazio() and os.path.exists('weather_data.csv'):  # Como no atualizaCSV.py
+        armazem.anexar(pd.read_csv('weather_data.csv'))
+    intervalos = lacunas(armazem, brasilia_tz.localize(datetime.combine(desde, datetime.min.time())), agora)
+    dias = dias_das_lacunas(intervalos)
+    print(f"{len(intervalos)} lacunas em {len(dias)} dias no histórico de {station_id}")
+
+    def mesclar_observacoes(resultados):
+        tabela = pd.concat(resultados, ignore_index=True)
+        dentro = pd.Series(False, index=tabela.index)
+        for inicio, fim in intervalos:
+            dentro |= (tabela['Timestamp'] > inicio) & (tabela['Timestamp'] < fim)
+        return armazem.mesclar(tabela[dentro])
+
+    # Visão de 24 h da página, com o que tiver sido recuperado
+    if _recuperar(f'observacoes/{station_id}', dias, lambda dia: _baixar_observacoes(station_id, dia, limite),
+                  mesclar_observacoes, progresso, max_conexoes):
+        armazem.ler(agora - pd.Timedelta(hours=24)).to_csv('weather_data.csv', index=False, date_format=historico.FORMATO_DATA)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Preenche lacunas do histórico da estação com os endpoints de histórico do WU.")
+    parser.add_argument('--desde', type=lambda s: datetime.strptime(s, '%Y-%m-%d').date(),
+                        default=datetime.now(brasilia_tz).date() - timedelta(days=DIAS))
+    parser.add_argument('--conexoes', type=int, default=MAX_CONEXOES)
+    parser.add_argument('--por-minuto', type=int, default=REQUISICOES_POR_MINUTO)
+    args = parser.parse_args()
+    principal(args.desde, max_conexoes=args.conexoes, por_minuto=args.por_minuto)
@@ -0,0 +1,46 @@
+# Cadastro das estações (estacoes.csv)
+#
+# Tudo o que o mapa sabe de cada estação fica numa linha do CSV, pelo ID do WU:
+# nome, texto do rótulo, posição corrigida (vazia para usar a posição informada
+# pela própria estação), deslocamento e tamanho do rótulo, se entra no mapa
+# durante o dia (as estações suspeitas só entram à noite) e se está ativa. O
+# cadastro é lido uma vez por processo num DataFrame indexado pelo ID, e as
+# correções e rótulos são aplicados a todas as estações de uma vez, alinhando
+# pelo ID e não pela posição da linha no arquivo.
+import os
+import numpy as np
+import pandas as pd
+
+ARQUIVO = 'estacoes.csv'
+TIPOS = {'id': str, 'nome': str, 'rotulo': str, 'latitude': 'float64', 'longitude': 'float64',
+         'dx': 'float32', 'dy': 'float32', 'tamanho': 'float32', 'diurna': bool, 'ativa': bool}
+HORA_DIA = (5, 19)  # Horas (inclusive) em que só as estações diurnas entram no mapa
+
+_memoria = {}
+
+def carregar(arquivo=ARQUIVO):
+    return pd.read_csv(arquivo, dtype=TIPOS, keep_default_na=False, na_values={'latitude': [''], 'longitude': ['']}).set_index('id')
+
+# Cadastro do processo, relido só se o arquivo mudar
+def obter_registro(arquivo=ARQUIVO):
+    chave = (arquivo, os.stat(arquivo).st_mtime_ns)
+    if chave not in _memoria:
+        _memoria[chave] = carregar(arquivo)
+    return _memoria[chave]
+
+# Estações ativas que entram no mapa na hora dada (0-23), na ordem do cadastro
+def selecionar(registro, hora):
+    dia = HORA_DIA[0] <= hora <= HORA_DIA[1]
+    return registro[registro['ativa'] & (registro['diurna'] | (not dia))]
+
+# Latitude e longitude finais: a do cadastro, quando houver, senão a informada
+def posicionar(registro, ids, latitude, longitude):
+    corrigida = registro[['latitude', 'longitude']].reindex(ids).to_numpy()
+    latitude = pd.to_numeric(pd.Series(latitude), errors='coerce').to_numpy(dtype=float)
+    longitude = pd.to_numeric(pd.Series(longitude), errors='coerce').to_numpy(dtype=float)
+    return (np.where(np.isnan(corrigida[:, 0]), latitude, corrigida[:, 0]),
+            np.where(np.isnan(corrigida[:, 1]), longitude, corrigida[:, 1]))
+
+# Texto, deslocamento (m) e tamanho dos rótulos, alinhados aos IDs
+def rotulos(registro, ids):
+    return registro[['rotulo', 'dx', 'dy', 'tamanho']].reindex(ids)
@@ -0,0 +1,69 @@
+# Funções comuns à geração das figuras
+import hashlib
+import json
+import os
+
+# Impressão digital (sha256) das entradas de uma figura: dados baixados e
+# parâmetros de desenho. Aceita bytes, DataFrames, arrays NumPy e qualquer
+# valor serializável em JSON. Se script for informado (um arquivo ou uma lista
+# deles, como o script e os módulos que desenham a figura), o código-fonte entra
+# no hash, de modo que mudanças no desenho também forçam uma nova figura.
+def impressao_digital(*entradas, script=None):
+    h = hashlib.sha256()
+    scripts = [] if script is None else [script] if isinstance(script, (str, os.PathLike)) else script
+    for arquivo in scripts:
+        with open(arquivo, 'rb') as f:
+            h.update(f.read())
+        h.update(b'\0')
+    for entrada in entradas:
+        if isinstance(entrada, bytes):
+            h.update(entrada)
+        elif hasattr(entrada, 'to_csv'):
+            h.update(entrada.to_csv(index=False).encode())
+        elif hasattr(entrada, 'tobytes'):
+            h.update(entrada.tobytes())
+        else:
+            h.update(json.dumps(entrada, sort_keys=True, default=str).encode())
+        h.update(b'\0')
+    return h.hexdigest()
+
+# O hash fica ao lado da figura: radar.png -> radar.png.sha256
+def arquivo_hash(saida):
+    return f"{saida}.sha256"
+
+# True se a figura existe e foi gerada a partir das mesmas entradas
+def inalterado(saida, digest):
+    try:
+        with open(arquivo_hash(saida)) as f:
+            return os.path.exists(saida) and f.read().strip() == digest
+    except OSError:
+        return False
+
+def registrar(saida, digest):
+    salvar_atomico(arquivo_hash(saida), lambda temporario: _escrever_texto(temporario, digest + '\n'))
+
+def _escrever_texto(arquivo, texto):
+    with open(arquivo, 'w') as f:
+        f.write(texto)
+
+# Grava o arquivo de forma atômica: escrever(temporario) grava num temporário do
+# mesmo diretório (com a mesma extensão, da qual o matplotlib e o PIL tiram o
+# formato), que depois substitui o original com os.replace. Quem lê o arquivo
+# (o site, outro produto rodando em paralelo) vê a versão antiga ou a nova
+# completa, nunca uma imagem pela metade.
+def salvar_atomico(arquivo, escrever):
+    raiz, extensao = os.path.splitext(arquivo)
+    temporario = f"{raiz}.{os.getpid()}.tmp{extensao}"
+    try:
+        escrever(temporario)
+        os.replace(temporario, arquivo)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+# Figura em arquivo, de forma atômica; objetos de arquivo (BytesIO) são escritos direto
+def salvar_figura(fig, arquivo, **kwargs):
+    if not isinstance(arquivo, (str, os.PathLike)):
+        fig.savefig(arquivo, **kwargs)
+        return
+    salvar_atomico(arquivo, lambda temporario: fig.savefig(temporario, **kwargs))
@@ -0,0 +1,93 @@
+# Série histórica de todas as estações do mapa
+#
+# Cada consulta do mapa (temperatura, radiação e resultado do controle de
+# qualidade de cada estação) é acrescentada a um ArmazemParticionado (um CSV por
+# mês) em formato longo, com a estação codificada por um inteiro: o código é a
+# posição do ID em estacoes.json, que só cresce. As consultas leem só os meses do
+# intervalo e montam uma matriz tempo × estação com indexação NumPy (sem pivot e
+# sem laços por linha), da qual saem a série de uma estação, o retrato de todas
+# as estações num instante e as extremas diárias.
+import json
+import os
+import numpy as np
+import pandas as pd
+import historico
+import renderizacao
+
+DIRETORIO = os.path.join('historico', 'estacoes')
+
+def _escrever_json(arquivo, dados):
+    with open(arquivo, 'w') as f:
+        json.dump(dados, f)
+
+class SerieEstacoes:
+    def __init__(self, diretorio=DIRETORIO):
+        self.armazem = historico.ArmazemParticionado(diretorio)
+        self.arquivo_dicionario = os.path.join(diretorio, 'estacoes.json')
+        if os.path.exists(self.arquivo_dicionario):
+            with open(self.arquivo_dicionario) as f:
+                self.estacoes = json.load(f)
+        else:
+            self.estacoes = []
+        self.codigos = {e: i for i, e in enumerate(self.estacoes)}
+
+    # Códigos das estações; IDs novos entram no fim do dicionário, gravado de forma
+    # atômica (um estacoes.json truncado mudaria o código de todas as estações)
+    def codificar(self, ids):
+        novos = [e for e in dict.fromkeys(ids) if e not in self.codigos]
+        if novos:
+            for e in novos:
+                self.codigos[e] = len(self.estacoes)
+                self.estacoes.append(e)
+            os.makedirs(os.path.dirname(self.arquivo_dicionario), exist_ok=True)
+            renderizacao.salvar_atomico(self.arquivo_dicionario, lambda temporario: _escrever_json(temporario, self.estacoes))
+        return np.array([self.codigos[e] for e in ids], dtype=np.int32)
+
+    # Acrescenta uma consulta do mapa: colunas Estacao, Temperatura e Radiacao (opcional).
+    # Estações sem temperatura não são gravadas.
+    def gravar(self, tempo, dados, aprovadas):
+        temperatura = pd.to_numeric(dados['Temperatura'], errors='coerce')
+        presentes = temperatura.notna().to_numpy()
+        if not presentes.any():
+            return
+        linhas = pd.DataFrame({
+            'Timestamp': pd.Timestamp(tempo).floor('s'),
+            'Codigo': self.codificar(list(dados['Estacao'][presentes])),
+            'Temperatura': temperatura[presentes].to_numpy(),
+            'Radiacao': pd.to_numeric(dados.get('Radiacao', pd.Series(np.nan, index=dados.index)), errors='coerce')[presentes].to_numpy(),
+            'Aprovada': np.asarray(aprovadas)[presentes].astype(int),
+        })
+        self.armazem.anexar(linhas)
+
+    # Matriz tempo × estação de uma variável entre inicio e fim (colunas pelos IDs).
+    # Com so_aprovadas, leituras reprovadas pelo controle de qualidade ficam NaN.
+    def matriz(self, inicio, fim=None, variavel='Temperatura', so_aprovadas=True):
+        df = self.armazem.ler(inicio, fim)
+        if df.empty:
+            return pd.DataFrame(columns=self.estacoes, dtype=float)
+        tempos, linha = np.unique(df['Timestamp'].values, return_inverse=True)
+        valores = df[variavel].to_numpy(dtype=float)
+        if so_aprovadas:
+            valores = np.where(df['Aprovada'].to_numpy() == 1, valores, np.nan)
+        grade = np.full((len(tempos), len(self.estacoes)), np.nan, dtype=np.float32)
+        grade[linha, df['Codigo'].to_numpy()] = valores
+        indice = pd.DatetimeIndex(tempos).tz_localize('UTC').tz_convert(historico.FUSO)
+        return pd.DataFrame(grade, index=indice, columns=self.estacoes)
+
+    # Série de uma estação no intervalo, só com os instantes em que ela tem dado
+    def estacao(self, estacao, inicio, fim=None, variavel='Temperatura', so_aprovadas=True):
+        if estacao not in self.codigos:
+            return pd.Series(dtype=float, name=estacao)
+        return self.matriz(inicio, fim, variavel, so_aprovadas)[estacao].dropna()
+
+    # Última leitura de cada estação até tempo, dentro da tolerância
+    def instante(self, tempo, tolerancia=pd.Timedelta(minutes=30), variavel='Temperatura', so_aprovadas=True):
+        tempo = pd.Timestamp(tempo)
+        grade = self.matriz(tempo - tolerancia, tempo + pd.Timedelta(seconds=1), variavel, so_aprovadas)
+        return grade.ffill().iloc[-1] if len(grade) else pd.Series(np.nan, index=self.estacoes)
+
+    # Mínima e máxima de cada estação por dia (horário de Brasília): colunas (estatística, estação)
+    def extremos_diarios(self, inicio, fim=None, variavel='Temperatura', so_aprovadas=True):
+        grade = self.matriz(inicio, fim, variavel, so_aprovadas)
+        grupos = grade.groupby(grade.index.date)
+        return pd.concat({'min': grupos.min(), 'max': grupos.max(), 'leituras': grupos.count()}, axis=1)
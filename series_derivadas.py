@@ -0,0 +1,124 @@
+# Série de 24 h numa grade regular, com lacunas explícitas e grandezas derivadas
+#
+# As leituras da estação chegam em intervalos irregulares (~15 min, com falhas).
+# Aqui elas são levadas uma única vez por execução a uma grade de PASSO: cada
+# ponto da grade recebe a leitura mais próxima, e os pontos dentro de uma falha
+# (leituras vizinhas a mais de LACUNA uma da outra) ficam NaN e marcados em
+# 'lacuna', para que as linhas do gráfico se interrompam em vez de ligar os
+# dois lados da falha. Da mesma passada saem:
+#  - chuva em cada intervalo da grade e taxa em mm/h: os incrementos vêm de
+#    historico.incrementos_chuva, a mesma conta dos resumos diários, e a chuva
+#    de cada leitura é dividida pelo tempo que ela cobre;
+#  - somas móveis de 1 h e 3 h, tendência de pressão em 3 h e direção média do
+#    vento na última hora (média vetorial), todas por somas acumuladas;
+#  - índice de calor e sensação pelo vento (sensação térmica).
+# Tudo é feito com operações NumPy sobre a série inteira, sem laços em Python.
+import numpy as np
+import pandas as pd
+import historico
+
+FUSO = "America/Sao_Paulo"
+PASSO = pd.Timedelta(minutes=15)
+LACUNA = pd.Timedelta(minutes=45)  # Intervalo máximo entre leituras fora de uma falha
+JANELA = pd.Timedelta(hours=24)
+VARIAVEIS = ['Temperature', 'Dew Point', 'Humidity', 'Wind Speed', 'Wind Gust', 'Wind Dir', 'Radiation', 'Pressure']
+
+# Soma móvel das últimas n posições (inclusive), por soma acumulada; NaN conta como 0
+def _soma_movel(valores, n):
+    acumulado = np.concatenate([[0.0], np.cumsum(np.nan_to_num(valores))])
+    return acumulado[1:] - acumulado[np.maximum(np.arange(1, len(valores) + 1) - n, 0)]
+
+# Índice de calor (regressão de Rothfusz, NOAA) em °C; só vale com calor e umidade
+def indice_calor(temperatura, umidade):
+    t = np.asarray(temperatura, dtype=float) * 9 / 5 + 32
+    u = np.asarray(umidade, dtype=float)
+    simples = 0.5 * (t + 61.0 + (t - 68.0) * 1.2 + u * 0.094)
+    completo = (-42.379 + 2.04901523 * t + 10.14333127 * u - 0.22475541 * t * u - 6.83783e-3 * t ** 2
+                - 5.481717e-2 * u ** 2 + 1.22874e-3 * t ** 2 * u + 8.5282e-4 * t * u ** 2 - 1.99e-6 * t ** 2 * u ** 2)
+    with np.errstate(invalid='ignore'):
+        completo -= np.where((u < 13) & (t >= 80) & (t <= 112), (13 - u) / 4 * np.sqrt((17 - np.abs(t - 95)) / 17), 0)
+        completo += np.where((u > 85) & (t >= 80) & (t <= 87), (u - 85) / 10 * (87 - t) / 5, 0)
+        indice = np.where((simples + t) / 2 >= 80, completo, simples)
+    return (indice - 32) * 5 / 9
+
+# Sensação pelo vento (fórmula do Canadá/EUA, °C e km/h); só vale com frio e vento
+def sensacao_vento(temperatura, vento):
+    t = np.asarray(temperatura, dtype=float)
+    v = np.power(np.maximum(np.asarray(vento, dtype=float), 0), 0.16)
+    return 13.12 + 0.6215 * t - 11.37 * v + 0.3965 * t * v
+
+# Sensação térmica: índice de calor acima de 27 °C, sensação pelo vento abaixo de
+# 10 °C com vento, e a própria temperatura nos demais casos
+def sensacao_termica(temperatura, umidade, vento):
+    t = np.asarray(temperatura, dtype=float)
+    with np.errstate(invalid='ignore'):
+        calor = (t >= 27) & (np.asarray(umidade, dtype=float) >= 40)
+        frio = (t <= 10) & (np.asarray(vento, dtype=float) > 4.8)
+        return np.where(calor, indice_calor(t, umidade), np.where(frio, sensacao_vento(t, vento), t))
+
+# Série das últimas 24 h até fim numa grade de PASSO. df: colunas Timestamp, Precip
+# e as de VARIAVEIS presentes. Índice: instantes da grade (fuso de Brasília).
+def processar(df, fim, passo=PASSO, janela=JANELA):
+    fim = pd.Timestamp(fim).tz_convert(FUSO).floor(passo)
+    grade = pd.date_range(fim - janela, fim, freq=passo).as_unit('ns')
+    serie = pd.DataFrame(index=grade)
+    df = df.dropna(subset=['Timestamp'])
+    tempos = pd.DatetimeIndex(pd.to_datetime(df['Timestamp'], utc=True)).tz_convert(FUSO).as_unit('ns')
+    ordem = np.argsort(tempos.asi8, kind='stable')
+    tempos, df = tempos[ordem], df.iloc[ordem]
+    t, g, p = tempos.asi8, grade.asi8, passo.value  # ns
+
+    # Leitura mais próxima de cada ponto da grade. É lacuna o ponto que cai entre
+    # duas leituras separadas por mais de LACUNA, ou a mais de um passo das pontas.
+    if len(t):
+        posicao = np.searchsorted(t, g)
+        direita = np.clip(posicao, 0, len(t) - 1)
+        esquerda = np.clip(posicao - 1, 0, len(t) - 1)
+        mais_proxima = np.where(np.abs(t[esquerda] - g) <= np.abs(t[direita] - g), esquerda, direita)
+        ponta = (posicao == 0) | (posicao == len(t))
+        lacuna = np.where(ponta, np.abs(t[mais_proxima] - g) > p, t[direita] - t[esquerda] > LACUNA.value)
+    else:
+        mais_proxima, lacuna = np.zeros(len(g), dtype=int), np.ones(len(g), dtype=bool)
+    serie['lacuna'] = lacuna
+    for coluna in VARIAVEIS:
+        if coluna in df and len(t):
+            valores = pd.to_numeric(df[coluna], errors='coerce').to_numpy(dtype=float)[mais_proxima]
+            serie[coluna] = np.where(lacuna, np.nan, valores)
+        else:
+            serie[coluna] = np.nan
+
+    # Chuva por intervalo da grade e taxa (mm/h) pelo tempo coberto pelas leituras
+    chuva, cobertura = np.zeros(len(g)), np.zeros(len(g))
+    if len(t) > 1:
+        incrementos = historico.incrementos_chuva(tempos, df['Precip'])
+        horas = np.diff(t, prepend=t[0]) / 3.6e12
+        intervalo = np.round((t - g[0]) / p).astype(int)
+        dentro = (intervalo >= 0) & (intervalo < len(g)) & (horas > 0)
+        chuva = np.bincount(intervalo[dentro], weights=incrementos[dentro], minlength=len(g))
+        cobertura = np.bincount(intervalo[dentro], weights=horas[dentro], minlength=len(g))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        serie['chuva'] = chuva
+        serie['taxa_chuva'] = np.where(cobertura > 0, chuva / cobertura, np.nan)
+    por_hora = int(pd.Timedelta(hours=1) / passo)
+    serie['chuva_1h'] = _soma_movel(chuva, por_hora)
+    serie['chuva_3h'] = _soma_movel(chuva, 3 * por_hora)
+
+    # Tendência de pressão: diferença para 3 h antes (NaN se algum dos lados é lacuna)
+    pressao = serie['Pressure'].to_numpy()
+    tendencia = np.full(len(g), np.nan)
+    tendencia[3 * por_hora:] = pressao[3 * por_hora:] - pressao[:-3 * por_hora]
+    serie['tendencia_pressao'] = tendencia
+
+    # Vento médio vetorial da última hora (direção de onde sopra, em graus)
+    velocidade = serie['Wind Speed'].to_numpy()
+    direcao = np.radians(serie['Wind Dir'].to_numpy())
+    validos = ~np.isnan(velocidade) & ~np.isnan(direcao)
+    n = _soma_movel(validos.astype(float), por_hora)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        u = _soma_movel(np.where(validos, -velocidade * np.sin(direcao), 0), por_hora) / n
+        v = _soma_movel(np.where(validos, -velocidade * np.cos(direcao), 0), por_hora) / n
+    serie['vento_medio'] = np.hypot(u, v)
+    serie['direcao_media'] = np.degrees(np.arctan2(-u, -v)) % 360
+
+    serie['sensacao'] = sensacao_termica(serie['Temperature'], serie['Humidity'], serie['Wind Speed'])
+    return serie
@@ -0,0 +1,150 @@
+# Atualização completa dos cinco produtos em paralelo
+#
+# Os produtos (graph.png, extremes_graph.png, mapa.png, previsao.png e radar.png/radar_parana.png)
+# gastam quase todo o tempo desenhando com matplotlib/cartopy, e em sequência a
+# atualização leva a soma de todos eles. Aqui:
+#  1. as entradas de rede de todos os produtos são baixadas de uma vez, em
+#     threads, para o cache HTTP em disco do api_clima (as observações atuais
+#     entram no cache por TTL_OBSERVACOES segundos, só durante este serviço);
+#  2. cada produto roda como "python script" num processo de um
+#     ProcessPoolExecutor. Os processos são criados limpos (spawn, sem herdar
+#     sessões HTTP nem figuras abertas) e o inicializador importa o agendador,
+#     que escolhe o backend Agg e carrega as bibliotecas pesadas antes do
+#     primeiro produto. Os scripts encontram suas respostas no cache.
+# Os produtos mais demorados na execução anterior começam primeiro e o extremos
+# só começa depois do graph, cujo histórico ele lê. Com um processo por produto
+# (ou quatro núcleos), a atualização leva mais ou menos o tempo do mais lento.
+# As figuras são gravadas com renderizacao.salvar_figura (temporário + rename),
+# de modo que o index.html nunca serve um PNG pela metade.
+#
+# Uso: python servico_render.py
+#      python servico_render.py --produtos graph mapa radar --processos 2
+import os
+
+# Maior que uma atualização completa e menor que o intervalo entre duas (15 min).
+# Precisa valer antes de o api_clima ser importado, aqui e nos processos.
+TTL_OBSERVACOES = 5 * 60
+os.environ.setdefault('WU_TTL_OBSERVACOES', str(TTL_OBSERVACOES))
+
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime
+import pytz
+import requests
+import api_clima
+import controle_qualidade
+import qualidade_ar
+import registro_estacoes
+
+brasilia_tz = pytz.timezone("America/Sao_Paulo")
+
+PRODUTOS = ['graph', 'radar', 'mapa', 'previsao', 'extremos']  # Os mesmos do agendador.PRODUTOS
+DEPENDENCIAS = {'extremos': 'graph'}  # O extremes.py lê o histórico que o atualizaCSV.py grava
+ESTACAO = "ICURITIB28"  # atualizaCSV.py
+LATITUDE, LONGITUDE = -25.45, -49.23  # previsaoTempo.py
+CACHE_DIR = os.getenv('SERVICO_RENDER_DIR', os.path.join('.cache', 'servico_render'))
+ARQUIVO_DURACOES = os.path.join(CACHE_DIR, 'duracoes.json')
+
+# Requisições (função e argumentos) que cada produto fará, nas mesmas formas dos
+# scripts, para que a chave no cache seja a mesma. O extremos usa o histórico local.
+def entradas(nomes, agora):
+    tarefas = []
+    if 'graph' in nomes:
+        tarefas.append((api_clima.observacao_atual, ESTACAO))
+    if 'mapa' in nomes:  # Mesmas estações que o mapa_estacoes.py vai consultar
+        registro = registro_estacoes.obter_registro()
+        estacoes = registro_estacoes.selecionar(registro, agora.hour).index
+        tarefas += [(api_clima.observacao_atual, e) for e in controle_qualidade.ControleQualidade().a_buscar(estacoes, agora)]
+    if 'previsao' in nomes:
+        tarefas.append((api_clima.previsao_5dias, LATITUDE, LONGITUDE))
+        tarefas.append((api_clima.qualidade_ar, LATITUDE, LONGITUDE, ','.join(qualidade_ar.POLUENTES)))
+    if 'radar' in nomes:
+        tarefas += [(api_clima.mapas_rainviewer,), (api_clima.tabela_cores_rainviewer,)]
+    return list(dict.fromkeys(tarefas))  # A estação do graph também está no mapa
+
+# Baixa as entradas em paralelo. Uma falha aqui só é registrada: o produto tenta
+# de novo por conta própria.
+def baixar_entradas(nomes, agora, max_conexoes=api_clima.MAX_CONEXOES):
+    tarefas = entradas(nomes, agora)
+    with ThreadPoolExecutor(max_workers=max_conexoes) as executor:
+        futuros = [executor.submit(tarefa[0], *tarefa[1:]) for tarefa in tarefas]
+    falhas = 0
+    for futuro in futuros:
+        try:
+            futuro.result()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"Entrada não baixada: {e}")
+            falhas += 1
+    return len(tarefas), falhas
+
+# Inicializador dos processos: importar o agendador carrega matplotlib (Agg),
+# pandas, geopandas, contextily e cartopy uma vez por processo
+def _preparar():
+    import agendador
+
+def _rodar(nome):
+    import agendador
+    inicio = time.perf_counter()
+    situacao = agendador.executar(nome)
+    return situacao, time.perf_counter() - inicio
+
+def ler_duracoes(arquivo=ARQUIVO_DURACOES):
+    try:
+        with open(arquivo) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def salvar_duracoes(duracoes, arquivo=ARQUIVO_DURACOES):
+    os.makedirs(os.path.dirname(arquivo) or '.', exist_ok=True)
+    temporario = f"{arquivo}.{os.getpid()}.tmp"
+    with open(temporario, 'w') as f:
+        json.dump(duracoes, f)
+    os.replace(temporario, arquivo)
+
+# Roda os produtos no pool, os mais demorados (ou nunca medidos) primeiro, e os
+# dependentes assim que o produto de que dependem termina. Devolve a situação de cada um.
+def renderizar(nomes, processos):
+    duracoes = ler_duracoes()
+    ordem = sorted(nomes, key=lambda nome: -duracoes.get(nome, float('inf')))
+    esperando = [nome for nome in ordem if DEPENDENCIAS.get(nome) in nomes]
+    situacoes = {}
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=processos, mp_context=contexto, initializer=_preparar) as executor:
+        futuros = {executor.submit(_rodar, nome): nome for nome in ordem if nome not in esperando}
+        while futuros:
+            feitos, _ = wait(futuros, return_when=FIRST_COMPLETED)
+            for futuro in feitos:
+                nome = futuros.pop(futuro)
+                try:
+                    situacoes[nome], duracoes[nome] = futuro.result()
+                except Exception as e:  # O processo morreu (falta de memória, sinal)
+                    print(f"{nome}: processo encerrado ({e})", flush=True)
+                    situacoes[nome] = 'erro'
+                for dependente in [d for d in esperando if DEPENDENCIAS[d] == nome]:
+                    esperando.remove(dependente)
+                    futuros[executor.submit(_rodar, dependente)] = dependente
+    salvar_duracoes(duracoes)
+    return situacoes
+
+def principal(nomes, processos):
+    inicio = time.perf_counter()
+    total, falhas = baixar_entradas(nomes, datetime.now(brasilia_tz))
+    print(f"{total - falhas} de {total} entradas baixadas em {time.perf_counter() - inicio:.1f} s", flush=True)
+    situacoes = renderizar(nomes, processos)
+    print(f"Atualização completa em {time.perf_counter() - inicio:.1f} s", flush=True)
+    return situacoes
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Atualiza os produtos do site de uma vez, desenhando em paralelo.")
+    parser.add_argument('--produtos', nargs='+', choices=PRODUTOS, default=PRODUTOS)
+    parser.add_argument('--processos', type=int, default=None, help="padrão: um por produto, até o número de núcleos")
+    args = parser.parse_args()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))  # Os scripts usam caminhos relativos
+    processos = args.processos or min(len(args.produtos), os.cpu_count() or 1)
+    situacoes = principal(args.produtos, processos)
+    sys.exit(0 if all(s != 'erro' for s in situacoes.values()) else 1)
@@ -0,0 +1,72 @@
+# Servidor HTTP falso local para os testes que usam o api_clima
+import json
+import os
+import sys
+import threading
+import time
+import http.server
+from urllib.parse import urlparse, parse_qs
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_clima
+
+class ServidorFalso:
+    # responder(caminho, parametros) -> (status, corpo); corpo dict vira JSON e
+    # bytes/str vão como estão. Cada resposta espera latencia segundos.
+    def __init__(self, responder, latencia=0.0):
+        self.responder = responder
+        self.latencia = latencia
+        self.requisicoes = []
+        servidor = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                parametros = {k: v[0] for k, v in parse_qs(url.query).items()}
+                servidor.requisicoes.append((url.path, parametros))
+                time.sleep(servidor.latencia)
+                status, corpo = servidor.responder(url.path, parametros)
+                if isinstance(corpo, dict):
+                    corpo = json.dumps(corpo)
+                corpo = corpo.encode() if isinstance(corpo, str) else (corpo or b'')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+        self.http = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.http.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.http.server_address[1]}"
+        threading.Thread(target=self.http.serve_forever, daemon=True).start()
+
+    def fechar(self):
+        self.http.shutdown()
+        self.http.server_close()
+
+# Fábrica de servidores falsos; o api_clima passa a usar o servidor como base do
+# WU, com uma sessão nova e um cache HTTP no diretório temporário do teste
+@pytest.fixture
+def servidor_falso(monkeypatch, tmp_path):
+    servidores = []
+
+    def criar(responder, latencia=0.0):
+        servidor = ServidorFalso(responder, latencia)
+        servidores.append(servidor)
+        monkeypatch.setattr(api_clima, 'WU_API_BASE', servidor.url)
+        return servidor
+
+    monkeypatch.setattr(api_clima, '_sessao', None)
+    monkeypatch.setattr(api_clima, '_cache', None)
+    monkeypatch.setenv('API_KEY', 'teste')
+    api_clima.usar_cache(str(tmp_path / 'cache_http'))
+    yield criar
+    for servidor in servidores:
+        servidor.fechar()
@@ -0,0 +1,41 @@
+import time
+import numpy as np
+import busca_estacoes
+
+ESTACOES = [f"IFALSA{i}" for i in range(12)]
+LATENCIA = 0.2  # s por requisição
+
+def _responder(caminho, parametros):
+    estacao = parametros['stationId']
+    if estacao == 'IFALSA3':  # Estação offline: o WU responde 204 sem conteúdo
+        return 204, b''
+    i = int(estacao[len('IFALSA'):])
+    return 200, {'observations': [{'stationID': estacao, 'lat': -25.4 - i / 100, 'lon': -49.2, 'solarRadiation': 100.0 + i,
+                                   'metric': {'temp': 15.0 + i}}]}
+
+def test_busca_em_paralelo_e_mais_rapida_e_igual_a_serial(servidor_falso):
+    servidor = servidor_falso(_responder, latencia=LATENCIA)
+
+    inicio = time.perf_counter()
+    serial = busca_estacoes.buscar_estacoes(ESTACOES, 'agora', max_conexoes=1)
+    tempo_serial = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    paralela = busca_estacoes.buscar_estacoes(ESTACOES, 'agora', max_conexoes=len(ESTACOES))
+    tempo_paralelo = time.perf_counter() - inicio
+
+    assert tempo_serial >= len(ESTACOES) * LATENCIA
+    assert tempo_paralelo < 3 * LATENCIA  # Perto de uma requisição lenta, não da soma
+    assert tempo_paralelo < tempo_serial / 4
+    assert paralela.equals(serial)
+    assert len(servidor.requisicoes) == 2 * len(ESTACOES)
+
+def test_dataframe_na_ordem_das_estacoes_com_offline_em_nan(servidor_falso):
+    servidor_falso(_responder)
+    dados = busca_estacoes.buscar_estacoes(ESTACOES, 'agora')
+    assert list(dados['Estacao']) == ESTACOES
+    assert np.isnan(dados.loc[3, 'Temperatura'])
+    assert dados.loc[5, 'Temperatura'] == 20.0
+    assert dados.loc[5, 'Latitude'] == -25.45
+    assert dados.loc[5, 'Radiacao'] == 105.0
+    assert (dados['Hora'] == 'agora').all()
@@ -0,0 +1,25 @@
+import os
+import numpy as np
+import interpolacao
+
+def test_cache_descarta_os_menos_usados(monkeypatch, tmp_path):
+    monkeypatch.setattr(interpolacao, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(interpolacao, '_memoria', {})
+    rng = np.random.default_rng(0)
+    x, y = rng.uniform(0, 20000, 10), rng.uniform(0, 20000, 10)
+    conjuntos = [(x + i * interpolacao.RESOLUCAO, y) for i in range(4)]  # Grades do mesmo tamanho
+
+    arquivos = []
+    for i, conjunto in enumerate(conjuntos[:3]):
+        interpolacao.obter_interpolador(*conjunto)
+        novo, = set(tmp_path.iterdir()) - set(arquivos)
+        os.utime(novo, (1000 + i, 1000 + i))
+        arquivos.append(novo)
+    monkeypatch.setattr(interpolacao, 'TAMANHO_MAX', int(os.path.getsize(arquivos[0]) * 3.5))
+
+    # O primeiro, lido do disco, tem o acesso renovado; o quarto tira o segundo
+    interpolacao._memoria.clear()
+    interpolacao.obter_interpolador(*conjuntos[0])
+    interpolacao.obter_interpolador(*conjuntos[3])
+    assert arquivos[0].exists() and not arquivos[1].exists() and arquivos[2].exists()
+    assert len(list(tmp_path.iterdir())) == 3
@@ -0,0 +1,18 @@
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import contextily as ctx
+import mapa_base
+
+def test_mapa_base_escreve_a_atribuicao(monkeypatch):
+    fonte = ctx.providers.CartoDB.Positron
+    imagem = np.zeros((4, 4, 3), dtype=np.uint8)
+    monkeypatch.setattr(mapa_base, 'obter_mapa_base', lambda *args: (imagem, (0, 10, 0, 10)))
+    fig, ax = plt.subplots()
+    ax.axis((0, 10, 0, 10))
+    mapa_base.desenhar_mapa_base(ax, source=fonte)
+    textos = [texto.get_text() for texto in ax.texts]
+    plt.close(fig)
+    assert fonte['attribution'] in textos
+    assert 'OpenStreetMap' in fonte['attribution'] and 'CARTO' in fonte['attribution']
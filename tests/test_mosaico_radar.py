@@ -0,0 +1,59 @@
+import io
+import numpy as np
+from PIL import Image
+import api_clima
+import mosaico_radar
+
+TAMANHO = 512
+
+# Tile opaco com a sua posição nas cores: vermelho = x, verde = y (módulo 256)
+def _tile(x, y):
+    imagem = np.zeros((TAMANHO, TAMANHO, 4), dtype=np.uint8)
+    imagem[..., 0], imagem[..., 1], imagem[..., 3] = x % 256, y % 256, 255
+    arquivo = io.BytesIO()
+    Image.fromarray(imagem).save(arquivo, 'PNG')
+    return arquivo.getvalue()
+
+def _servidor(servidor_falso, monkeypatch, faltando=()):
+    def responder(caminho, _):
+        _, x, y = map(int, caminho.split('/')[-5:-2])
+        if (x, y) in faltando:
+            return 404, b''
+        return 200, _tile(x, y)
+    servidor = servidor_falso(responder)
+    monkeypatch.setattr(api_clima, 'RAINVIEWER_TILES', servidor.url)
+    return servidor
+
+def test_vistas_baixam_cada_tile_uma_vez(servidor_falso, monkeypatch):
+    servidor = _servidor(servidor_falso, monkeypatch)
+    vistas = {
+        'oeste': {'extensao': (-50.5, -49.0, -26.0, -25.0), 'zoom': 7},
+        'leste': {'extensao': (-49.5, -48.0, -26.0, -25.0), 'zoom': 7},
+    }
+    mosaicos = mosaico_radar.montar_vistas('/v2/radar/teste', vistas, TAMANHO)
+
+    esperados = set(mosaicos['oeste'].tiles) | set(mosaicos['leste'].tiles)
+    pedidos = [tuple(map(int, caminho.split('/')[-4:-2])) for caminho, _ in servidor.requisicoes]
+    assert len(pedidos) == len(set(pedidos)) == len(esperados)
+    assert len(set(mosaicos['oeste'].tiles) & set(mosaicos['leste'].tiles)) > 0
+
+def test_recorte_na_projecao_do_mapa(servidor_falso, monkeypatch):
+    extensao = (-49.0, -46.5, -26.6, -24.2)  # 2 x 2 tiles
+    faltando = {mosaico_radar.tiles(extensao, 7, TAMANHO)[0]}
+    _servidor(servidor_falso, monkeypatch, faltando)
+    mosaico = mosaico_radar.montar_vistas('/v2/radar/teste', {'curitiba': {'extensao': extensao, 'zoom': 7}}, TAMANHO)['curitiba']
+    recorte = mosaico.em_plate_carree()
+    assert recorte.shape == mosaico.imagem.shape
+
+    # Cada linha (e coluna) do recorte vem do tile que contém a sua latitude (longitude)
+    lon_min, lon_max, lat_min, lat_max = extensao
+    linhas, colunas = recorte.shape[:2]
+    lats = lat_max - (np.arange(linhas) + 0.5) * (lat_max - lat_min) / linhas
+    lons = lon_min + (np.arange(colunas) + 0.5) * (lon_max - lon_min) / colunas
+    _, py = mosaico_radar._pixels(lon_max, lats, 7, TAMANHO)
+    px, _ = mosaico_radar._pixels(lons, lat_min, 7, TAMANHO)
+    np.testing.assert_array_equal(recorte[:, -1, 1], (py // TAMANHO).astype(int) % 256)
+    np.testing.assert_array_equal(recorte[-1, :, 0], (px // TAMANHO).astype(int) % 256)
+
+    # O tile que faltou fica transparente
+    assert recorte[0, 0, 3] == 0 and recorte[-1, -1, 3] == 255
@@ -0,0 +1,27 @@
+import os
+import numpy as np
+import quadros_radar
+
+def test_quadro_ilegivel_e_produzido_de_novo(monkeypatch, tmp_path):
+    monkeypatch.setattr(quadros_radar, 'CACHE_DIR', str(tmp_path))
+    produzidos = []
+
+    def produzir(quadro):
+        produzidos.append(quadro)
+        return np.full((4, 4, 4), len(quadro), dtype=np.uint8)
+
+    imagens, novos = quadros_radar.obter_quadros(['a', 'bb'], produzir=produzir)
+    assert novos == 2 and [int(i[0, 0, 0]) for i in imagens] == [1, 2]
+
+    # Arquivo truncado (como o de uma gravação interrompida) e um temporário esquecido
+    arquivo = quadros_radar._arquivo('bb')
+    with open(arquivo, 'r+b') as f:
+        f.truncate(os.path.getsize(arquivo) - 10)
+    open(arquivo + '.123.tmp', 'wb').close()
+
+    imagens, novos = quadros_radar.obter_quadros(['a', 'bb'], produzir=produzir)
+    assert novos == 1 and produzidos == ['a', 'bb', 'bb']
+    np.testing.assert_array_equal(imagens[1], np.full((4, 4, 4), 2, dtype=np.uint8))
+
+    quadros_radar.descartar_outros(['bb'])
+    assert sorted(os.listdir(tmp_path)) == [os.path.basename(arquivo)]
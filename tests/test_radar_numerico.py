@@ -0,0 +1,55 @@
+import os
+import numpy as np
+import pytest
+from PIL import Image
+import radar_numerico
+
+DADOS = os.path.join(os.path.dirname(__file__), 'dados')
+LAT, LON, ZOOM = -25.426, -49.304, 7  # Barigui
+
+# radar_esquema4.png (512x512, zoom 7, centrada no Barigui), no esquema 4 de cores_rainviewer.csv:
+# disco de 10 km com 50 dBZ, anel até 20 km com 30 dBZ (cores com ruído de ±3),
+# canto superior esquerdo (100x100) com a cor repetida de 70 e 75 dBZ, o resto transparente
+@pytest.fixture(scope='module')
+def grade():
+    with open(os.path.join(DADOS, 'cores_rainviewer.csv')) as f:
+        decodificador = radar_numerico.DecodificadorRadar(*radar_numerico.ler_paleta(f.read(), 4))
+    imagem = np.array(Image.open(os.path.join(DADOS, 'radar_esquema4.png')))
+    return radar_numerico.GradeRadar.centrada(decodificador.decodificar(imagem), LAT, LON, ZOOM)
+
+def test_paleta_do_esquema(grade):
+    with open(os.path.join(DADOS, 'cores_rainviewer.csv')) as f:
+        dbz, cores = radar_numerico.ler_paleta(f.read(), 4)
+    assert len(dbz) == len(cores) == 18
+    assert list(cores[dbz == 50][0]) == [0xff, 0x96, 0x00, 0xff]
+
+def test_decodificacao_da_imagem(grade):
+    dbz = grade.dbz
+    assert dbz.shape == (512, 512) and dbz.dtype == np.float32
+    assert dbz[256, 256] == 50
+    assert dbz[256, 256 + 27] == 30  # ~15 km do centro, no anel com ruído
+    assert dbz[50, 50] == 72.5  # Cor repetida: dBZ médio das faixas
+    assert np.isnan(dbz[400, 400])  # Transparente: sem eco
+    assert set(np.unique(dbz[np.isfinite(dbz)])) == {30, 50, 72.5}
+
+def test_georreferenciamento(grade):
+    lons, lats = grade.coordenadas()
+    assert lats[255:257, 255:257].mean() == pytest.approx(LAT, abs=0.01)
+    assert lons[255:257, 255:257].mean() == pytest.approx(LON, abs=0.01)
+    assert lats[0, 0] > LAT > lats[-1, 0]
+    assert lons[0, 0] < LON < lons[0, -1]
+    assert lons[0, 1] - lons[0, 0] == pytest.approx(611.4962 / radar_numerico.mapa_base.RAIO_TERRA * 180 / np.pi, rel=1e-3)
+
+def test_estatisticas_em_torno_do_barigui(grade):
+    perto = grade.estatisticas(LAT, LON, 5)
+    assert perto['cobertura'] == 1.0
+    assert perto['dbz_maximo'] == 50
+    assert perto['taxa_maxima'] == pytest.approx(float(radar_numerico.taxa_chuva(50)))
+
+    anel = grade.estatisticas(LAT, LON, 15)
+    assert anel['cobertura'] == 1.0
+    assert float(radar_numerico.taxa_chuva(30)) < anel['taxa_media'] < float(radar_numerico.taxa_chuva(50))
+
+    longe = grade.estatisticas(LAT, LON, 40)
+    assert longe['cobertura'] == pytest.approx((20 / 40) ** 2, abs=0.03)
+    assert longe['dbz_maximo'] == 50
@@ -0,0 +1,99 @@
+import os
+from datetime import datetime, timedelta, timezone
+import pandas as pd
+import pytest
+import climatologia
+import historico
+import recuperar_lacunas
+
+ESTACAO = 'IFALSA1'
+DIAS = 4
+
+@pytest.fixture
+def api_falsa(servidor_falso, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    falhar = set()  # Datas (YYYYMMDD) que respondem JSON inválido, como numa queda no meio da execução
+
+    def responder(caminho, parametros):
+        data = parametros['date']
+        if data in falhar:
+            return 200, 'não é JSON'
+        dia = datetime.strptime(data, '%Y%m%d')
+        if caminho.endswith('/daily'):
+            return 200, {'observations': [{'metric': {'tempLow': 10.0 + dia.day % 5, 'tempHigh': 25.0,
+                                                      'tempAvg': 17.0, 'precipTotal': 1.5}}]}
+        inicio = dia.replace(tzinfo=timezone(timedelta(hours=-3)))
+        observacoes = [{'obsTimeUtc': (inicio + timedelta(minutes=5 * i)).astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                        'humidityAvg': 80, 'solarRadiationHigh': 0, 'uvHigh': 0, 'winddirAvg': 90,
+                        'metric': {'tempAvg': 15 + i / 100, 'precipTotal': i / 288, 'dewptAvg': 12,
+                                   'windspeedAvg': 3, 'windgustHigh': 5, 'pressureMax': 1015}}
+                       for i in range(288)]
+        return 200, {'observations': observacoes}
+
+    servidor = servidor_falso(responder)
+    servidor.falhar = falhar
+    return servidor
+
+def _recuperar(desde):
+    recuperar_lacunas.principal(desde, station_id=ESTACAO, por_minuto=60000, arquivo_progresso='progresso.json')
+
+def _estado():
+    diario = climatologia.Climatologia().diario
+    observacoes = historico.ArmazemParticionado(f'historico/{ESTACAO}').ler(pd.Timestamp('2000-01-01', tz='UTC'))
+    return diario, observacoes
+
+def _datas(servidor, tipo):
+    return sorted(p['date'] for caminho, p in servidor.requisicoes if caminho.endswith(tipo))
+
+def test_retoma_do_ponto_de_controle_sem_duplicar(api_falsa):
+    hoje = datetime.now(recuperar_lacunas.brasilia_tz).date()
+    desde = hoje - timedelta(days=DIAS)
+    dias = [(desde + timedelta(days=i)).strftime('%Y%m%d') for i in range(DIAS)]
+
+    # Primeira execução interrompida: um dia falha e não entra no progresso
+    api_falsa.falhar.add(dias[1])
+    _recuperar(desde)
+    diario, observacoes = _estado()
+    assert len(diario) == DIAS - 1
+    assert _datas(api_falsa, '/daily') == dias
+
+    # Segunda execução: só o dia que falhou (e o de hoje, que ainda muda) é pedido de novo
+    api_falsa.falhar.clear()
+    api_falsa.requisicoes.clear()
+    _recuperar(desde)
+    diario, observacoes = _estado()
+    assert _datas(api_falsa, '/daily') == [dias[1]]
+    assert set(_datas(api_falsa, '/all')) <= {dias[1], hoje.strftime('%Y%m%d')}
+    assert len(diario) == DIAS
+    assert diario['Date'].is_unique
+    assert observacoes['Timestamp'].is_unique
+    assert observacoes['Timestamp'].is_monotonic_increasing
+
+    # Sem o arquivo de progresso tudo é baixado de novo, mas nada é duplicado
+    tamanho_diario, tamanho_observacoes = len(diario), len(observacoes)
+    os.remove('progresso.json')
+    _recuperar(desde)
+    diario, observacoes = _estado()
+    assert len(diario) == tamanho_diario
+    assert observacoes['Timestamp'].is_unique
+    assert len(observacoes) >= tamanho_observacoes
+
+def test_lacunas_e_dias_afetados():
+    fuso = historico.FUSO
+    tempos = pd.Series(pd.to_datetime(['2026-03-01 10:00', '2026-03-01 10:15', '2026-03-01 13:00']).tz_localize(fuso))
+
+    class Armazem:
+        coluna_tempo = 'Timestamp'
+        def vazio(self):
+            return False
+        def ler(self, inicio, fim):
+            return pd.DataFrame({'Timestamp': tempos})
+
+    desde = pd.Timestamp('2026-03-01 09:50', tz=fuso)
+    ate = pd.Timestamp('2026-03-02 01:00', tz=fuso)
+    intervalos = recuperar_lacunas.lacunas(Armazem(), desde, ate)
+    assert [(str(a), str(b)) for a, b in intervalos] == [
+        ('2026-03-01 10:15:00-03:00', '2026-03-01 13:00:00-03:00'),
+        ('2026-03-01 13:00:00-03:00', '2026-03-02 01:00:00-03:00'),
+    ]
+    assert [str(d) for d in recuperar_lacunas.dias_das_lacunas(intervalos)] == ['2026-03-01', '2026-03-02']
@@ -1,59 +1,44 @@
-import requests
-import numpy as np
-import matplotlib.pyplot as plt
-from PIL import Image
-from io import BytesIO
-import cartopy.crs as ccrs
-import cartopy.feature as cfeature
-import cartopy.io.shapereader as shpreader
-from cartopy.geodesic import Geodesic
 from datetime import datetime
+import os
 import pytz
-from geopy.distance import geodesic
-import matplotlib.colors as mcolors
-
-# Definições do mapa
+import requests
+import sys
+import api_clima
+import fundo_radar
+import mosaico_radar
+import quadros_radar
+import radar_numerico
+import renderizacao
+
+# Definições dos mapas. Os dois mapas saem do mesmo quadro, montados numa única
+# passada de tiles pelo mosaico_radar, com o radar cobrindo exatamente a extensão
+# (centro ± delta, em graus) de cada mapa.
 LAT_CENTRO, LON_CENTRO = -25.426, -49.304  # Estação Parque Barigui
-ZOOM = 7  # Define o zoom do radar e do mapa
-SIZE = 512  # Resolução do radar
-COLOR_SCHEME = 4  # Paleta de cores do radar
-OPTIONS = "1_1"  # Remove fundo preto do radar
-
-# Tabela de conversão: Zoom → Resolução (m/pixel)
-zoom_to_resolution = {
-    0: 78271.517, 1: 39135.7585, 2: 19567.8792, 3: 9783.9396,
-    4: 4891.9698, 5: 2445.9849, 6: 1222.9925, 7: 611.4962,
-    8: 305.7481, 9: 152.8741, 10: 76.437
+ZOOM = 7  # Zoom dos tiles do radar de Curitiba (resolução de ~611 m/pixel)
+SIZE = 512  # Tamanho dos tiles do radar
+QUADROS_ANIMACAO = int(os.getenv('RADAR_ANIMACAO', 0))  # Quadros passados em radar_animado.gif (0 = sem animação)
+CODIGO = [__file__, mosaico_radar.__file__]  # Código que monta o radar, nas impressões digitais (o do fundo está na chave_fundo)
+
+VISTAS = {
+    'radar.png': {'centro': (LAT_CENTRO, LON_CENTRO), 'delta': (1.18, 1.18), 'zoom': ZOOM,
+                  'fundo': {'titulo': "Radar de Chuvas - Curitiba e região", 'raio_km': 30, 'escala_km': 20}},
+    'radar_parana.png': {'centro': (-24.6, -51.3), 'delta': (2.2, 3.4), 'zoom': ZOOM - 1,
+                         'fundo': {'titulo': "Radar de Chuvas - Paraná", 'raio_km': 0, 'escala_km': 100}},
 }
 
-# Aproximadamente quantos metros há em 1 grau de latitude
-METROS_POR_GRAU = 111320
-
-# Obter a resolução correspondente ao zoom selecionado (metros/pixel)
-resolucao_metros = zoom_to_resolution.get(ZOOM, 1222.9925)
+# Extensão (lon_min, lon_max, lat_min, lat_max) e zoom da vista, para o mosaico
+def vista_mosaico(vista):
+    (lat, lon), (delta_lat, delta_lon) = vista['centro'], vista['delta']
+    return {'extensao': (lon - delta_lon, lon + delta_lon, lat - delta_lat, lat + delta_lat), 'zoom': vista['zoom']}
 
-# Calcular quantos graus aproximadamente representam a resolução do radar
-resolucao_graus = resolucao_metros / METROS_POR_GRAU
+def chave_fundo(vista):
+    return fundo_radar.chave_camadas(*vista['centro'], *vista['delta'], **vista['fundo'])
 
-# Ajustar a extensão do mapa com base na resolução
-grau_extensao = resolucao_graus * 215  # Assumindo imagem de 256x256 pixels
-delta_lat, delta_lon = grau_extensao, grau_extensao
-
-# Definição da paleta de cores da chuva usada pelo RainViewer
-rain_colors = [
-    (0, "white"),         # Sem precipitação
-    (0.1, "lightblue"),   # Chuva fraca
-    (0.3, "blue"),        # Chuva moderada
-    (0.5, "yellow"),      # Chuva forte
-    (0.7, "orange"),      # Chuva muito forte
-    (0.9, "red"),         # Tempestade
-    (1.0, "purple")       # Chuva extrema
-]
+def camadas(vista):
+    return fundo_radar.obter_camadas(*vista['centro'], *vista['delta'], **vista['fundo'])
 
 # Obtém o timestamp mais recente da API
-rainviewer_url = "https://api.rainviewer.com/public/weather-maps.json"
-response = requests.get(rainviewer_url)
-data = response.json()
+data = api_clima.mapas_rainviewer()
 
 if "radar" in data and "past" in data["radar"]:
     latest_timestamp = data["radar"]["past"][-1]["time"]
@@ -62,123 +47,69 @@ else:
     raise ValueError("Não foi possível obter o timestamp mais recente.")
 
 # Converter o timestamp UTC para o fuso horário de Brasília
-utc_time = datetime.utcfromtimestamp(latest_timestamp)
-brt_time = utc_time.replace(tzinfo=pytz.utc).astimezone(pytz.timezone("America/Sao_Paulo"))
-timestamp_brasilia = brt_time.strftime("%d/%b/%Y - %H:%M")
-
-# Constrói a URL da imagem de radar
-radar_image_url = f"https://tilecache.rainviewer.com{path}/{SIZE}/{ZOOM}/{LAT_CENTRO}/{LON_CENTRO}/{COLOR_SCHEME}/{OPTIONS}.png"
-
-# Baixa a imagem de radar
-response = requests.get(radar_image_url)
-if response.status_code == 200:
-    radar_image = Image.open(BytesIO(response.content))
-else:
-    raise ValueError("Erro ao baixar a imagem de radar.")
-
-# Criar o mapa com Cartopy
-fig, ax = plt.subplots(figsize=(10, 8), subplot_kw={'projection': ccrs.PlateCarree()})
-ax.set_extent([LON_CENTRO - delta_lon, LON_CENTRO + delta_lon, LAT_CENTRO - delta_lat, LAT_CENTRO + delta_lat], crs=ccrs.PlateCarree())
-
-# Adicionar camadas geográficas
-ax.add_feature(cfeature.LAND, facecolor='lightgray')
-ax.add_feature(cfeature.OCEAN, facecolor='lightblue')
-ax.add_feature(cfeature.COASTLINE, linewidth=0.8)
-ax.add_feature(cfeature.BORDERS, linewidth=1.5)
-
-# Adicionar fronteiras estaduais com mais destaque
-ax.add_feature(cfeature.NaturalEarthFeature(category='cultural',
-                                            name='admin_1_states_provinces_lines',
-                                            scale='10m',
-                                            facecolor='none',
-                                            edgecolor='black',
-                                            linewidth=1.2))
-
-# Adicionar estradas principais
-ax.add_feature(cfeature.NaturalEarthFeature(category='cultural',
-                                            name='roads',
-                                            scale='10m',
-                                            facecolor='none',
-                                            edgecolor='gray',
-                                            linewidth=0.8))
-
-# Adicionar áreas urbanas ao mapa
-ax.add_feature(cfeature.NaturalEarthFeature(category='cultural',
-                                            name='urban_areas',
-                                            scale='10m',
-                                            facecolor='dimgrey',  # Cor cinza escuro
-                                            alpha=0.5))  # Transparência para não cobrir tudo
-
-# Adicionar imagem de radar sobre o mapa
-ax.imshow(np.array(radar_image), extent=[LON_CENTRO-delta_lon, LON_CENTRO+delta_lon, LAT_CENTRO-delta_lat, LAT_CENTRO+delta_lat], 
-          transform=ccrs.PlateCarree(), alpha=0.6)
-
-# Adicionar cidades importantes
-shapefile = shpreader.natural_earth(resolution='10m', category='cultural', name='populated_places')
-reader = shpreader.Reader(shapefile)
-
-for city in reader.records():
-    lat, lon = city.geometry.y, city.geometry.x
-    nome = city.attributes['NAME']
-    pop = city.attributes['POP_MAX']  # População da cidade
-
-    # Exibir cidades com população relevante dentro da área do mapa
-    if (LAT_CENTRO-delta_lat+0.1 <= lat <= LAT_CENTRO+delta_lat-0.1) and (LON_CENTRO-delta_lon+0.1 <= lon <= LON_CENTRO+delta_lon-0.1) and pop > 100000:
-        ax.scatter(lon, lat, color='red', s=30, transform=ccrs.PlateCarree(), label=nome)
-        ax.text(lon, lat + 0.02, nome, fontsize=9, color='black', transform=ccrs.PlateCarree(), ha='center')
-
-# Adicionar círculo de 30 km ao redor do centro
-geod = Geodesic()
-circle = geod.circle(lon=LON_CENTRO, lat=LAT_CENTRO, radius=30000, n_samples=100)
-circle_lons, circle_lats = zip(*circle)
-
-ax.plot(circle_lons, circle_lats, color='black', linewidth=1.5, transform=ccrs.PlateCarree(), linestyle='dashed', alpha=0.8)
-
-# Ajuste automático da escala de distâncias
-#escala_km = int((resolucao_metros * 50) / 1000)  # Baseado na resolução do zoom
-# Ponto inicial da escala de distância
-scale_start = (LAT_CENTRO - delta_lat * 0.85, LON_CENTRO - delta_lon * 0.7)
-
-# Ponto final a 20 km de distância para a escala
-scale_end = geodesic(kilometers=20).destination(scale_start, 90)  # 90° = direção leste
-
-# Desenhar a escala corretamente
-ax.plot([scale_start[1], scale_end.longitude], [scale_start[0], scale_end.latitude],
-        color='black', linewidth=3, transform=ccrs.PlateCarree())
-
-ax.text((scale_start[1] + scale_end.longitude) / 2, scale_start[0] - 0.08,
-        "20 km", fontsize=14, color='black', ha='center', transform=ccrs.PlateCarree())
-
-# Adicionar horário no canto inferior direito
-ax.text(LON_CENTRO+delta_lon*0.8, LAT_CENTRO+delta_lat*0.91, timestamp_brasilia, fontsize=14, color='black', ha='right')
-ax.text(LON_CENTRO+delta_lon*0.8, LAT_CENTRO+delta_lat*0.83, "Fonte: RainViewer", fontsize=14, color='black', ha='right')
-#ax.scatter(LON_CENTRO, LAT_CENTRO, color='blue', s=70, transform=ccrs.PlateCarree(), label=nome)
-#ax.text(LON_CENTRO, LAT_CENTRO - 0.04, "Barigui", fontsize=12, color='black', transform=ccrs.PlateCarree(), ha='center')
-
-# Criar colormap personalizado
-colors = [cor for _, cor in rain_colors]  # Pegamos apenas as cores da lista
-positions = [pos for pos, _ in rain_colors]  # Pegamos as posições da lista
-
-# Criar o colormap corretamente
-cmap = mcolors.LinearSegmentedColormap.from_list("rain_cmap", list(zip(positions, colors)))
-
-# Normalizar valores
-norm = mcolors.Normalize(vmin=0, vmax=1)
-
-# Criar a barra de cores discreta
-cbar_ax = fig.add_axes([0.85, 0.3, 0.015, 0.4])  # Mais estreito e menor altura
-cbar = plt.colorbar(plt.cm.ScalarMappable(norm=norm, cmap=cmap), cax=cbar_ax)
-
-# Ajustar fonte e espaçamento para um estilo mais discreto
-cbar.set_label("Intensidade da chuva", fontsize=16)  # Fonte menor
-cbar.set_ticks([0.2, 0.5, 0.8, 1])  # Menos marcações
-cbar.set_ticklabels(["", "", "", ""])  # Labels curtos
-cbar.outline.set_visible(False)  # Remove a borda para ficar mais clean
-
-# Mostrar o mapa
-# Ajustar título para ficar no topo
-fig.suptitle("Radar de Chuvas - Curitiba e região", fontsize=16)
-plt.subplots_adjust(top=0.95)  # Reduz o espaço superior
-
-plt.savefig('radar.png')
-plt.close(fig)
+def hora_brasilia(timestamp):
+    utc_time = datetime.utcfromtimestamp(timestamp)
+    brt_time = utc_time.replace(tzinfo=pytz.utc).astimezone(pytz.timezone("America/Sao_Paulo"))
+    return brt_time.strftime("%d/%b/%Y - %H:%M")
+
+# Animação de Curitiba com os últimos QUADROS_ANIMACAO quadros, seguidos do nowcast,
+# em radar_animado.gif. Só os quadros novos são montados; os demais vêm do cache de
+# quadros. Cada quadro monta seus poucos tiles em sequência e os quadros, em paralelo.
+if QUADROS_ANIMACAO > 0:
+    curitiba = VISTAS['radar.png']
+    quadros = data["radar"]["past"][-QUADROS_ANIMACAO:] + data["radar"].get("nowcast", [])
+    caminhos = [quadro["path"] for quadro in quadros]
+    digest_animacao = renderizacao.impressao_digital(caminhos, vista_mosaico(curitiba), SIZE, chave_fundo(curitiba), script=CODIGO)
+    if renderizacao.inalterado('radar_animado.gif', digest_animacao):
+        print("Animação sem novos quadros; radar_animado.gif mantido.")
+    else:
+        parametros = renderizacao.impressao_digital(vista_mosaico(curitiba), SIZE, script=mosaico_radar.__file__)[:12]
+
+        def chave(caminho):
+            return f"{caminho}|{parametros}"
+
+        def recorte(caminho):
+            return mosaico_radar.montar_vistas(caminho, {'curitiba': vista_mosaico(curitiba)}, SIZE, max_conexoes=1)['curitiba'].em_plate_carree()
+
+        radares, baixados = quadros_radar.obter_quadros(caminhos, produzir=recorte, chave=chave)
+        quadros_radar.descartar_outros([chave(caminho) for caminho in caminhos])
+        ultimo_passado = data["radar"]["past"][-1]["time"]
+        textos = [hora_brasilia(quadro["time"]) + (" (previsão)" if quadro["time"] > ultimo_passado else "") for quadro in quadros]
+        camadas_animacao = camadas(curitiba)
+        fundo_radar.salvar_animacao(fundo_radar.compor_quadros(camadas_animacao, radares), camadas_animacao, textos, 'radar_animado.gif')
+        renderizacao.registrar('radar_animado.gif', digest_animacao)
+        print(f"Animação com {len(quadros)} quadros ({baixados} montados).")
+
+# Mesmo quadro de radar e mesmos parâmetros: a figura atual já está correta
+digests = {arquivo: renderizacao.impressao_digital(path, latest_timestamp, vista_mosaico(vista), SIZE, chave_fundo(vista), script=CODIGO)
+           for arquivo, vista in VISTAS.items()}
+pendentes = [arquivo for arquivo in VISTAS if not renderizacao.inalterado(arquivo, digests[arquivo])]
+if not pendentes:
+    print("Radar sem novos dados; " + ", ".join(VISTAS) + " mantidos.")
+    sys.exit(0)
+
+timestamp_brasilia = hora_brasilia(latest_timestamp)
+
+# Mosaicos das vistas a atualizar, numa única passada (tiles em comum baixados uma vez)
+mosaicos = mosaico_radar.montar_vistas(path, {arquivo: vista_mosaico(VISTAS[arquivo]) for arquivo in pendentes}, SIZE)
+
+for arquivo in pendentes:
+    vista, mosaico = VISTAS[arquivo], mosaicos[arquivo]
+
+    # Chuva a partir das cores do mosaico, georreferenciado exatamente: num raio de
+    # raio_km do centro ou, sem círculo, em toda a vista
+    try:
+        grade = radar_numerico.GradeRadar(radar_numerico.decodificador(mosaico_radar.COLOR_SCHEME).decodificar(mosaico.imagem), mosaico.transformacao)
+        lon_min, lon_max, lat_min, lat_max = mosaico.extensao
+        raio = vista['fundo']['raio_km'] or radar_numerico.distancia_km(lat_min, lon_min, lat_max, lon_max) / 2
+        resumo = grade.estatisticas(*vista['centro'], raio_km=raio)
+        print(f"{arquivo}: chuva em {raio:.0f} km: {resumo['cobertura']:.0%} da área, média {resumo['taxa_media']:.1f} mm/h, máxima {resumo['taxa_maxima']:.1f} mm/h")
+    except (requests.RequestException, ValueError) as e:
+        print(f"Resumo numérico do radar indisponível: {e}")
+
+    # Camadas fixas do mapa (renderizadas com o cartopy só na primeira vez) e o
+    # radar, reamostrado para a projeção do mapa, composto entre elas
+    camadas_vista = camadas(vista)
+    imagem = fundo_radar.compor(camadas_vista, mosaico.em_plate_carree())
+    fundo_radar.salvar(imagem, camadas_vista, timestamp_brasilia, arquivo)
+    renderizacao.registrar(arquivo, digests[arquivo])